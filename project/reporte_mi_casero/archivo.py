@@ -0,0 +1,99 @@
+"""
+Consulta, extracción, reenvío y poda del archivo de reportes (`utils/archivo_reportes.py`).
+
+    python archivo.py --listar --desde 01/08/2025 --hasta 31/08/2025
+    python archivo.py --extraer 20250801_200000 --reporte reporte_diario.general --destino ./extraido
+    python archivo.py --reenviar 20250801_200000 --reporte reporte_diario.general --a ana@empresa.com
+    python archivo.py --podar --retencion-dias 180
+    python archivo.py --estadisticas
+
+`--reenviar` reconstruye el mensaje archivado (cuerpo con sus gráficos y adjuntos) sin consultar
+SQL Server ni Google Sheets; sin `--a` va a los destinatarios originales.
+"""
+import argparse
+import os
+
+from config.config import ARCHIVO_CONFIG, SENDER_EMAIL, PASSWORD, SMTP_SERVER, SMTP_PORT
+from service.email_service import enviar_mensaje_con_reintentos
+from utils.archivo_reportes import ArchivoReportes
+from utils.fechas import normalizar_fecha
+from utils.logs import main_loger
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def parsear_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Archivo histórico de reportes enviados")
+    accion = parser.add_mutually_exclusive_group(required=True)
+    accion.add_argument("--listar", action="store_true", help="Ejecuciones archivadas (por fecha)")
+    accion.add_argument("--extraer", metavar="RUN_ID", help="Escribe los archivos de una ejecución en --destino")
+    accion.add_argument("--reenviar", metavar="RUN_ID", help="Reenvía el mensaje archivado de --reporte")
+    accion.add_argument("--podar", action="store_true", help="Borra lo anterior a la retención y los objetos sin uso")
+    accion.add_argument("--estadisticas", action="store_true", help="Bytes referenciados frente a bytes en disco")
+    parser.add_argument("--directorio", default=ARCHIVO_CONFIG['directorio'], help="Directorio del archivo")
+    parser.add_argument("--desde", help="Primera fecha (dd/mm/YYYY o YYYY-MM-DD)")
+    parser.add_argument("--hasta", help="Última fecha, inclusive")
+    parser.add_argument("--reporte", default="reporte_diario", help="Reporte (p. ej. reporte_diario.general)")
+    parser.add_argument("--destino", default="./extraido", help="Directorio de salida de --extraer")
+    parser.add_argument("--a", nargs="+", metavar="EMAIL", help="Destinatarios de --reenviar")
+    parser.add_argument("--retencion-dias", type=int, default=ARCHIVO_CONFIG['retencion_dias'])
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parsear_argumentos(argv)
+    main_loger()
+    archivo = ArchivoReportes(args.directorio, ARCHIVO_CONFIG['nivel_compresion'], ARCHIVO_CONFIG['particiones'])
+
+    if args.listar:
+        df = archivo.buscar(normalizar_fecha(args.desde) if args.desde else None,
+                            normalizar_fecha(args.hasta) if args.hasta else None,
+                            args.reporte)
+        if df.empty:
+            print("ℹ️ No hay ejecuciones archivadas en el rango.")
+        else:
+            df['MB'] = df.pop('bytes') / 1e6
+            print(df.drop(columns=['datos']).to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+        return 0
+
+    if args.extraer:
+        archivos = archivo.archivos(args.extraer, args.reporte)
+        if not archivos:
+            print(f"❌ No hay archivos de '{args.reporte}' en la ejecución {args.extraer}.")
+            return 1
+        for nombre in archivos:
+            ruta = os.path.join(args.destino, args.extraer, args.reporte, nombre)
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            with open(ruta, "wb") as f:
+                f.write(archivo.leer(args.extraer, args.reporte, nombre))
+        print(f"✅ {len(archivos)} archivos extraídos en {os.path.join(args.destino, args.extraer, args.reporte)}")
+        return 0
+
+    if args.reenviar:
+        mensaje = archivo.reconstruir_mensaje(args.reenviar, args.reporte)
+        destinatarios = args.a or [d.strip() for d in mensaje["To"].split(",") if d.strip()]
+        mensaje.replace_header("To", ", ".join(destinatarios))
+        mensaje.replace_header("From", SENDER_EMAIL)
+        ok = enviar_mensaje_con_reintentos(mensaje, destinatarios, SENDER_EMAIL, PASSWORD,
+                                           smtp_server=SMTP_SERVER, smtp_port=SMTP_PORT)
+        print(f"{'✅' if ok else '❌'} Reenvío de '{args.reporte}' ({args.reenviar}) a {len(destinatarios)} destinatarios")
+        return 0 if ok else 1
+
+    if args.podar:
+        resultado = archivo.podar(args.retencion_dias)
+        print(f"🧹 {resultado['ejecuciones']} ejecuciones y {resultado['objetos']} objetos borrados "
+              f"({resultado['bytes_liberados'] / 1e6:,.2f} MB)")
+        return 0
+
+    estadisticas = archivo.estadisticas()
+    proporcion = estadisticas['bytes_referenciados'] / max(estadisticas['bytes_en_disco'], 1)
+    print(f"🗄️ {estadisticas['ejecuciones']} ejecuciones, {estadisticas['objetos']} objetos: "
+          f"{estadisticas['bytes_referenciados'] / 1e6:,.2f} MB referenciados en "
+          f"{estadisticas['bytes_en_disco'] / 1e6:,.2f} MB de disco ({proporcion:,.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,197 @@
+"""
+Backfill histórico: genera el reporte de cada día de un rango y lo guarda en disco, sin enviar correos.
+
+    python backfill.py --desde 01/08/2025 --hasta 31/08/2025 --procesos 4
+
+Por día se escribe <directorio>/<AAAA-MM-DD>/ con reporte.html (el cuerpo del correo),
+los gráficos en PNG y el bundle de snapshots de sus fuentes (manifest.json + Parquet),
+reproducible con `python main.py --replay <AAAA-MM-DD>` apuntando SNAPSHOTS_CONFIG al mismo directorio.
+
+Se comparte entre todos los días: un pool de conexiones a la base de datos, una sola lectura
+y transformación del formulario de Google Sheets y una sola ejecución del SP semanal.
+La tabla de quiebres de stock de cada día sale de una sola pasada incremental sobre el rango.
+Las consultas por día corren en hilos; la transformación y el render corren en un pool de
+procesos cuyos trabajadores reciben los datos compartidos una vez y mantienen Kaleido caliente.
+"""
+import argparse
+import base64
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from service.conect_db import ReporteExecutor, crear_backend
+from service.almacen_local import crear_almacen
+from service.fuentes import FuenteProduccion, BundleSnapshots
+from config.config import (GOOGLE_SHEET_CREDENTIALS, ACCESOS_SHEET_GOOGLE, REPORTES_CONFIG, DB_CONFIG, DB_BACKEND,
+                           ALMACEN_LOCAL_CONFIG, METRICAS_CONFIG, SNAPSHOTS_CONFIG, BACKFILL_CONFIG, QUIEBRES_CONFIG)
+from utils.logs import main_loger
+from data.transformar import transformar_df_sheet_google, preparar_df_sheet_google
+from data.quiebres_stock import EstadoQuiebres
+from components.generar_tablas_html import tabla_html
+from validators.validator_data import DatosInvalidosError
+from utils.fechas import normalizar_fecha, formatear_fecha
+from utils.metricas import metricas, medir_etapa
+from utils.convertir_img_base64 import calentar_kaleido
+from main import generar_cuerpo_reporte
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Datos compartidos por todos los días, cargados una vez por proceso trabajador
+_COMPARTIDO: Dict[str, Any] = {}
+
+
+def rango_fechas(desde: date, hasta: date) -> List[date]:
+    if hasta < desde:
+        raise ValueError(f"Rango de fechas inválido: {formatear_fecha(desde)} > {formatear_fecha(hasta)}")
+    return [desde + timedelta(days=d) for d in range((hasta - desde).days + 1)]
+
+
+def _inicializar_trabajador(directorio, compresion, df_sheet, df_sheet_preparado, df_resumen_unidades, df_semanal_vs_ppto,
+                            tablas_quiebres):
+    # El primer render arranca Kaleido; se hace mientras corren las consultas
+    calentar_kaleido()
+    _COMPARTIDO.update(
+        directorio=directorio,
+        compresion=compresion,
+        df_sheet=df_sheet,
+        df_sheet_preparado=df_sheet_preparado,
+        df_resumen_unidades=df_resumen_unidades,
+        df_semanal_vs_ppto=df_semanal_vs_ppto,
+        tablas_quiebres=tablas_quiebres,
+    )
+
+
+def tablas_quiebres_por_dia(df_resumen_unidades, fechas: List[date]) -> Dict[date, str]:
+    """ HTML de la tabla de quiebres de cada fecha, avanzando un único estado día a día (O(SKUs) por día) """
+    estado = EstadoQuiebres(QUIEBRES_CONFIG['ventanas'], QUIEBRES_CONFIG['umbral'], QUIEBRES_CONFIG['ventana_demanda'])
+    tablas = {}
+    for fecha in sorted(fechas):
+        estado.actualizar(df_resumen_unidades, hasta=fecha)
+        df_quiebres = estado.tabla(top=QUIEBRES_CONFIG['top'])
+        tablas[fecha] = tabla_html(df_quiebres) if not df_quiebres.empty else ""
+    return tablas
+
+
+def _obtener_dia(fuente: FuenteProduccion, fecha: date) -> Dict[str, Any]:
+    """ Consultas del día (en un hilo del proceso principal, con el pool de conexiones compartido) """
+    fecha_sp = formatear_fecha(fecha)
+    return {
+        'ventas_x_sku': fuente.obtener_reporte('ventas_x_sku', fecha=fecha_sp),
+        'ventas_x_categoria': fuente.obtener_reporte('ventas_x_categoria', fecha=fecha_sp),
+        'ventas_comparativo_x_semana_x_dia': fuente.obtener_reporte('ventas_comparativo_x_semana_x_dia', fecha=fecha_sp),
+    }
+
+
+def renderizar_dia(fecha: date, dfs_dia: Dict[str, Any]) -> Dict[str, Any]:
+    """ Transforma, renderiza y guarda el reporte de un día (en un proceso trabajador) """
+    inicio = time.perf_counter()
+    fecha_sp = formatear_fecha(fecha)
+    bundle = BundleSnapshots(_COMPARTIDO['directorio'], fecha.isoformat(), compresion=_COMPARTIDO['compresion'])
+    bundle.registrar_fecha(fecha)
+    # El snapshot se graba antes de transformar (format_table renombra columnas en el mismo DataFrame)
+    for nombre, df in dfs_dia.items():
+        bundle.guardar(df, "reporte", nombre, fecha=fecha_sp)
+    bundle.guardar(_COMPARTIDO['df_semanal_vs_ppto'], "reporte", 'ventas_semanal_vs_ppto')
+    bundle.guardar(_COMPARTIDO['df_sheet'], "sheet", 'form_mov_pollos')
+
+    dataframes = {**dfs_dia, 'ventas_semanal_vs_ppto': _COMPARTIDO['df_semanal_vs_ppto'], 'form_mov_pollos': _COMPARTIDO['df_sheet']}
+    try:
+        cuerpo_mensaje, (grafico_ventas_comp_semanas_bas64, grafico_ventas_comp_sem_ppto_bas64) = generar_cuerpo_reporte(
+            dataframes, fecha,
+            df_ventas_unidades_google=_COMPARTIDO['df_sheet_preparado'],
+            df_resumen_unidades=_COMPARTIDO['df_resumen_unidades'],
+            tabla_quiebres_html=_COMPARTIDO['tablas_quiebres'][fecha]
+        )
+    except DatosInvalidosError as e:
+        return {"fecha": fecha, "estado": "invalido", "detalle": str(e), "segundos": time.perf_counter() - inicio}
+
+    with open(os.path.join(bundle.ruta, "reporte.html"), "wb") as f:
+        f.write(cuerpo_mensaje)
+    for archivo, imagen in (("grafico_ventas_semanales.png", grafico_ventas_comp_semanas_bas64),
+                            ("grafico_ventas_vs_ppto.png", grafico_ventas_comp_sem_ppto_bas64)):
+        with open(os.path.join(bundle.ruta, archivo), "wb") as f:
+            f.write(base64.b64decode(imagen))
+    return {"fecha": fecha, "estado": "ok", "detalle": bundle.ruta, "segundos": time.perf_counter() - inicio}
+
+
+def ejecutar_backfill(desde: date, hasta: date, directorio: str, procesos: int, hilos_db: int) -> List[Dict[str, Any]]:
+    fechas = rango_fechas(desde, hasta)
+    executor = ReporteExecutor(db_config=DB_CONFIG, reportes_config=REPORTES_CONFIG,
+                               backend=crear_backend(DB_BACKEND, DB_CONFIG, tamanio_pool=hilos_db),
+                               almacen=crear_almacen(ALMACEN_LOCAL_CONFIG))
+    fuente = FuenteProduccion(executor, GOOGLE_SHEET_CREDENTIALS, ACCESOS_SHEET_GOOGLE)
+    resultados = []
+    try:
+        # Fuentes compartidas: se leen y transforman una sola vez para todo el rango
+        with medir_etapa("backfill.compartido") as etapa:
+            df_sheet = fuente.obtener_sheet('form_mov_pollos')
+            df_sheet_preparado = preparar_df_sheet_google(df_sheet)
+            df_resumen_unidades = transformar_df_sheet_google(df_sheet_preparado)
+            df_semanal_vs_ppto = fuente.obtener_reporte('ventas_semanal_vs_ppto')
+            tablas_quiebres = tablas_quiebres_por_dia(df_resumen_unidades, fechas)
+            etapa.anotar(filas=len(df_sheet) + len(df_semanal_vs_ppto))
+
+        with medir_etapa("backfill.dias") as etapa, \
+                ThreadPoolExecutor(max_workers=hilos_db) as hilos, \
+                ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador,
+                                    initargs=(directorio, SNAPSHOTS_CONFIG['compresion'], df_sheet, df_sheet_preparado,
+                                              df_resumen_unidades, df_semanal_vs_ppto, tablas_quiebres)) as pool:
+            # Cada día pasa al pool de procesos apenas terminan sus consultas
+            consultas = {hilos.submit(_obtener_dia, fuente, f): f for f in fechas}
+            renders = {}
+            for futuro in as_completed(consultas):
+                fecha = consultas[futuro]
+                try:
+                    renders[pool.submit(renderizar_dia, fecha, futuro.result())] = fecha
+                except Exception as e:
+                    logger.error(f"❌ Error obteniendo datos del {formatear_fecha(fecha)}: {e}")
+                    resultados.append({"fecha": fecha, "estado": "error", "detalle": str(e), "segundos": 0.0})
+            for futuro in as_completed(renders):
+                fecha = renders[futuro]
+                try:
+                    resultados.append(futuro.result())
+                except Exception as e:
+                    logger.error(f"❌ Error generando el reporte del {formatear_fecha(fecha)}: {e}")
+                    resultados.append({"fecha": fecha, "estado": "error", "detalle": str(e), "segundos": 0.0})
+            etapa.anotar(filas=len(fechas))
+    finally:
+        fuente.cerrar()
+    return sorted(resultados, key=lambda r: r["fecha"])
+
+
+def parsear_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill histórico del reporte diario (sin envío de correo)")
+    parser.add_argument("--desde", required=True, help="Primera fecha (dd/mm/YYYY o YYYY-MM-DD)")
+    parser.add_argument("--hasta", required=True, help="Última fecha, inclusive")
+    parser.add_argument("--directorio", default=BACKFILL_CONFIG['directorio'], help="Directorio de salida")
+    parser.add_argument("--procesos", type=int, default=BACKFILL_CONFIG['procesos'],
+                        help="Procesos para transformación y render")
+    parser.add_argument("--hilos-db", type=int, default=BACKFILL_CONFIG['hilos_db'],
+                        help="Consultas simultáneas (tamaño del pool de conexiones)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parsear_argumentos(argv)
+    main_loger()
+    metricas.configurar(habilitado=METRICAS_CONFIG['habilitado'], usar_tracemalloc=False)
+    inicio = time.perf_counter()
+    try:
+        resultados = ejecutar_backfill(normalizar_fecha(args.desde), normalizar_fecha(args.hasta),
+                                       args.directorio, args.procesos, args.hilos_db)
+    finally:
+        metricas.exportar(METRICAS_CONFIG['directorio'])
+    for r in resultados:
+        icono = "✅" if r["estado"] == "ok" else "❌"
+        print(f"{icono} {formatear_fecha(r['fecha'])} {r['estado']:<8} {r['segundos']:6.1f}s  {r['detalle']}")
+    correctos = sum(r["estado"] == "ok" for r in resultados)
+    print(f"ℹ️ Backfill: {correctos}/{len(resultados)} días generados en {time.perf_counter() - inicio:.1f}s")
+    return 0 if correctos == len(resultados) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
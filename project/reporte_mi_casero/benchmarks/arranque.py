@@ -0,0 +1,163 @@
+"""
+Benchmark de arranque: mide con `python -X importtime` cuánto tarda en importarse cada punto
+de entrada y verifica que no cargue dependencias pesadas que solo se usan más adelante.
+Además corre `main.py` de punta a punta sobre dos bundles sintéticos de `--replay`: uno que
+falla en la validación (camino de falla rápida) y uno válido con `--dry-run` (genera el
+reporte completo sin enviarlo).
+
+Uso (desde project/reporte_mi_casero):
+
+    python -m benchmarks.arranque --presupuesto-ms 600 --repeticiones 5
+
+Por módulo reporta la mediana del tiempo acumulado de import, los paquetes más pesados y
+los módulos prohibidos que se hayan cargado; por camino, la mediana del tiempo total del
+proceso. Sale con código 1 si algo supera su presupuesto o carga al arrancar plotly,
+kaleido, gspread, google-auth o pyodbc (que deben cargarse recién en el primer gráfico,
+lectura de Sheets o conexión a SQL Server). pandas se importa siempre: todos los caminos
+arman DataFrames, y su import es el piso del presupuesto (se muestra aparte).
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from typing import Dict, List, Tuple
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_PROYECTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS_PROHIBIDOS = ("plotly", "kaleido", "gspread", "google.oauth2", "google.auth", "pyodbc")
+_LINEA = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+# Corre main.py sobre un bundle con el estado (checkpoints, quiebres, adjuntos, caché) en un directorio temporal
+_SCRIPT_EJECUCION = """
+import os, sys
+import main
+base, run_id = sys.argv[1], sys.argv[2]
+main.SNAPSHOTS_CONFIG['directorio'] = os.path.join(base, 'snapshots')
+main.CHECKPOINTS_CONFIG['directorio'] = os.path.join(base, 'checkpoints')
+main.QUIEBRES_CONFIG['directorio'] = os.path.join(base, 'quiebres')
+main.EXPORTACION_CONFIG['directorio'] = os.path.join(base, 'adjuntos')
+main.PLANTILLA_CONFIG['directorio_cache'] = os.path.join(base, 'fragmentos')
+exito = main.main(['--replay', run_id, '--dry-run'])
+print('MODULOS=' + ','.join(sorted(sys.modules)))
+sys.exit(0 if exito else 1)
+"""
+
+# Camino: (run_id del bundle, código de salida esperado, módulos prohibidos)
+CAMINOS = {
+    "falla_validacion": ("falla_validacion", 1, MODULOS_PROHIBIDOS),
+    # El dry-run genera los gráficos (plotly/Kaleido) pero en reproducción no toca Sheets ni SQL Server
+    "dry_run": ("dry_run", 0, ("gspread", "google.oauth2", "google.auth", "pyodbc")),
+}
+
+
+def medir_import(modulo: str) -> Tuple[float, Dict[str, float], List[str]]:
+    """ (ms acumulados de `modulo`, ms acumulados por paquete de primer nivel, módulos cargados) """
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=DIRECTORIO_PROYECTO, capture_output=True, text=True
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(f"No se pudo importar '{modulo}':\n{proceso.stderr[-2000:]}")
+    total = 0.0
+    por_paquete: Dict[str, float] = {}
+    cargados: List[str] = []
+    for linea in proceso.stderr.splitlines():
+        coincidencia = _LINEA.match(linea)
+        if not coincidencia:
+            continue
+        _, acumulado, sangria, nombre = coincidencia.groups()
+        cargados.append(nombre)
+        raiz = nombre.split(".")[0]
+        # El tiempo acumulado de un paquete incluye sus submódulos: se toma el mayor visto
+        por_paquete[raiz] = max(por_paquete.get(raiz, 0.0), int(acumulado) / 1000)
+        if nombre == modulo:
+            total = int(acumulado) / 1000
+    return total, por_paquete, cargados
+
+
+def preparar_bundles(directorio: str) -> None:
+    """ Bundles sintéticos de CAMINOS: fuentes válidas, y las mismas con el SP de ventas por SKU vacío """
+    from benchmarks.generadores import generar_fuentes
+    from service.fuentes import BundleSnapshots
+
+    fecha = date.today()
+    fuentes = generar_fuentes(1, fecha=fecha)
+    for run_id, vaciar in (("dry_run", None), ("falla_validacion", "ventas_x_sku")):
+        bundle = BundleSnapshots(os.path.join(directorio, "snapshots"), run_id)
+        bundle.registrar_fecha(fecha)
+        for nombre, df in fuentes.items():
+            df = df.head(0) if nombre == vaciar else df
+            bundle.guardar(df, "sheet" if nombre == "form_mov_pollos" else "reporte", nombre)
+
+
+def medir_camino(directorio: str, camino: str) -> Tuple[float, List[str]]:
+    """ (ms del proceso completo, módulos prohibidos cargados) de correr main.py en `camino` """
+    run_id, codigo_esperado, prohibidos = CAMINOS[camino]
+    inicio = time.perf_counter()
+    proceso = subprocess.run([sys.executable, "-c", _SCRIPT_EJECUCION, directorio, run_id],
+                             cwd=DIRECTORIO_PROYECTO, capture_output=True, text=True)
+    ms = (time.perf_counter() - inicio) * 1000
+    if proceso.returncode != codigo_esperado or "MODULOS=" not in proceso.stdout:
+        raise RuntimeError(f"El camino '{camino}' terminó con código {proceso.returncode} "
+                           f"(se esperaba {codigo_esperado}):\n{proceso.stderr[-2000:]}")
+    cargados = proceso.stdout.rsplit("MODULOS=", 1)[1].strip().split(",")
+    return ms, sorted({n for n in cargados for p in prohibidos if n == p or n.startswith(p + ".")})
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Tiempo de arranque de los puntos de entrada (python -X importtime)")
+    parser.add_argument("--modulos", nargs="+", default=["main", "daemon", "backfill", "multitienda"])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--presupuesto-ms", type=float, default=600.0, help="Máximo de la mediana de import por módulo")
+    parser.add_argument("--presupuesto-falla-ms", type=float, default=900.0,
+                        help="Máximo de la mediana del proceso que falla en la validación")
+    parser.add_argument("--presupuesto-dry-run-ms", type=float, default=5000.0,
+                        help="Máximo de la mediana del proceso con --dry-run")
+    parser.add_argument("--sin-caminos", action="store_true", help="Mide solo los imports")
+    parser.add_argument("--top", type=int, default=8, help="Paquetes más pesados a mostrar")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    fallas = 0
+    piso = statistics.median(medir_import("pandas")[0] for _ in range(args.repeticiones))
+    print(f"   {'pandas':<12} {piso:8.1f} ms (piso: lo importan todos los puntos de entrada)")
+    for modulo in args.modulos:
+        mediciones = [medir_import(modulo) for _ in range(args.repeticiones)]
+        mediana = statistics.median(m[0] for m in mediciones)
+        por_paquete, cargados = mediciones[-1][1], mediciones[-1][2]
+        prohibidos = sorted({n for n in cargados for p in MODULOS_PROHIBIDOS if n == p or n.startswith(p + ".")})
+        ok = mediana <= args.presupuesto_ms and not prohibidos
+        fallas += not ok
+        print(f"{'✅' if ok else '❌'} {modulo:<12} {mediana:8.1f} ms (presupuesto {args.presupuesto_ms:.0f} ms)")
+        pesados = sorted(((p, ms) for p, ms in por_paquete.items() if p != modulo), key=lambda x: -x[1])[:args.top]
+        print("   " + ", ".join(f"{p} {ms:.0f} ms" for p, ms in pesados))
+        if prohibidos:
+            print(f"   cargados al arrancar: {', '.join(prohibidos[:10])}{' ...' if len(prohibidos) > 10 else ''}")
+    if args.sin_caminos:
+        return 1 if fallas else 0
+
+    presupuestos = {"falla_validacion": args.presupuesto_falla_ms, "dry_run": args.presupuesto_dry_run_ms}
+    with tempfile.TemporaryDirectory(prefix="arranque_") as directorio:
+        preparar_bundles(directorio)
+        for camino, presupuesto in presupuestos.items():
+            mediciones = [medir_camino(directorio, camino) for _ in range(args.repeticiones)]
+            mediana = statistics.median(m[0] for m in mediciones)
+            prohibidos = mediciones[-1][1]
+            ok = mediana <= presupuesto and not prohibidos
+            fallas += not ok
+            print(f"{'✅' if ok else '❌'} {camino:<16} {mediana:8.1f} ms (presupuesto {presupuesto:.0f} ms, proceso completo)")
+            if prohibidos:
+                print(f"   cargados: {', '.join(prohibidos[:10])}{' ...' if len(prohibidos) > 10 else ''}")
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Prueba de carga de la capa de extracción (`ReporteExecutor`) sobre el backend SQLite.
+
+Uso (desde project/reporte_mi_casero):
+
+    python -m benchmarks.carga_db --dias 90 365 --tickets-por-dia 400 --hilos 1 4 --consultas 200
+
+Crea una base SQLite temporal con líneas de venta sintéticas, ejecuta cada reporte de
+`REPORTES_CONFIG` de forma repetida (con 1..N hilos, una conexión por hilo) y reporta
+consultas por segundo y latencias p50/p95 por reporte.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, List
+import logging
+
+from benchmarks.generadores import generar_lineas_venta, generar_presupuesto_semanal
+from config.config import REPORTES_CONFIG
+from service.conect_db import ReporteExecutor, BackendSQLite, crear_base_sqlite
+from service.consultas_sqlite import CONSULTAS_SQLITE
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def medir_reporte(executor: ReporteExecutor, nombre: str, fechas: List[date], consultas: int, hilos: int) -> Dict[str, float]:
+    params = REPORTES_CONFIG[nombre]['params']
+
+    def _una(i: int) -> float:
+        kwargs = {'fecha': fechas[i % len(fechas)].strftime('%d/%m/%Y')} if 'fecha' in params else {}
+        t0 = time.perf_counter()
+        executor.ejecutar_reporte(nombre, **kwargs)
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        latencias = list(pool.map(_una, range(consultas)))
+    total = time.perf_counter() - t0
+    return {
+        "qps": consultas / total,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p95_ms": _percentil(latencias, 0.95) * 1000,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de ReporteExecutor sobre SQLite")
+    parser.add_argument("--dias", type=int, nargs="+", default=[90, 365])
+    parser.add_argument("--skus", type=int, default=80)
+    parser.add_argument("--tickets-por-dia", type=int, default=400)
+    parser.add_argument("--hilos", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--consultas", type=int, default=100)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    fecha_fin = date.today()
+    print(f"{'días':>6} {'líneas':>10} {'reporte':<36} {'hilos':>5} {'qps':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for n_dias in args.dias:
+            ruta = os.path.join(directorio, f"ventas_{n_dias}.sqlite")
+            lineas = generar_lineas_venta(n_dias, args.skus, args.tickets_por_dia, fecha_fin=fecha_fin)
+            crear_base_sqlite(ruta, lineas, generar_presupuesto_semanal(lineas))
+            fechas = [fecha_fin - timedelta(days=d) for d in range(min(n_dias, 30))]
+            backend = BackendSQLite(ruta, CONSULTAS_SQLITE)
+            executor = ReporteExecutor(db_config={}, reportes_config=REPORTES_CONFIG, backend=backend)
+            for nombre in REPORTES_CONFIG:
+                for hilos in args.hilos:
+                    r = medir_reporte(executor, nombre, fechas, args.consultas, hilos)
+                    print(f"{n_dias:>6} {len(lineas):>10} {nombre:<36} {hilos:>5} {r['qps']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+            backend.cerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
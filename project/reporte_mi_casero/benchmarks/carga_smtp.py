@@ -0,0 +1,93 @@
+"""
+Prueba de carga de la cola de envío (`ColaEnvios`) contra un sumidero SMTP local (aiosmtpd).
+
+Uso (desde project/reporte_mi_casero, requiere `pip install aiosmtpd`):
+
+    python -m benchmarks.carga_smtp --mensajes 40 --destinatarios 3 --sesiones 1 3 --latencia-ms 50
+
+Levanta un servidor SMTP en memoria que acepta todo (con una demora por mensaje que simula
+al servidor real), encola `--mensajes` reportes del tamaño de un correo real y los envía
+con 1..N sesiones. Reporta mensajes por segundo, latencia p50/p95 por mensaje y
+conexiones abiertas.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import logging
+
+from service.email_service import ColaEnvios, construir_mensaje
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class SumideroSMTP:
+    """ Handler de aiosmtpd que acepta todos los mensajes tras `latencia` segundos """
+
+    def __init__(self, latencia: float = 0.0):
+        self.latencia = latencia
+        self.mensajes = 0
+        self.destinatarios = 0
+        self.sesiones = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latencia)
+        self.mensajes += 1
+        self.destinatarios += len(envelope.rcpt_tos)
+        self.sesiones.add(session.peer)
+        return "250 OK"
+
+
+def _percentil(valores, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de ColaEnvios contra un sumidero SMTP local")
+    parser.add_argument("--mensajes", type=int, default=40)
+    parser.add_argument("--destinatarios", type=int, default=3, help="Destinatarios por mensaje")
+    parser.add_argument("--max-destinatarios", type=int, default=None, help="Máximo de destinatarios por parte")
+    parser.add_argument("--sesiones", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--mensajes-por-minuto", type=int, default=None)
+    parser.add_argument("--latencia-ms", type=float, default=50.0, help="Demora del servidor por mensaje")
+    parser.add_argument("--kb", type=int, default=300, help="Tamaño aproximado del cuerpo HTML")
+    parser.add_argument("--puerto", type=int, default=8025)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        print("❌ Falta aiosmtpd: pip install aiosmtpd")
+        return 1
+
+    cuerpo = "<p>📊 Reporte</p>" + "<td>1.234,56</td>" * (args.kb * 1024 // 17)
+    sumidero = SumideroSMTP(args.latencia_ms / 1000)
+    controlador = Controller(sumidero, hostname="127.0.0.1", port=args.puerto)
+    controlador.start()
+    print(f"{'sesiones':>8} {'mensajes':>8} {'ok':>4} {'msg/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'conexiones':>10}")
+    try:
+        for sesiones in args.sesiones:
+            sumidero.sesiones.clear()
+            cola = ColaEnvios("127.0.0.1", args.puerto, "reportes@local", "", sesiones=sesiones,
+                              mensajes_por_minuto=args.mensajes_por_minuto,
+                              max_destinatarios=args.max_destinatarios, usar_tls=False)
+            for i in range(args.mensajes):
+                destinatarios = [f"usuario{i}_{j}@local" for j in range(args.destinatarios)]
+                cola.agregar(construir_mensaje(cuerpo, destinatarios, f"Reporte {i}", "reportes@local"),
+                             destinatarios, etiqueta=f"reporte_{i}")
+            inicio = time.perf_counter()
+            resultados = cola.enviar()
+            total = time.perf_counter() - inicio
+            latencias = [r.latencia for r in resultados]
+            print(f"{sesiones:>8} {len(resultados):>8} {sum(r.ok for r in resultados):>4} {len(resultados) / total:>8.1f} "
+                  f"{statistics.median(latencias) * 1000:>8.1f} {_percentil(latencias, 0.95) * 1000:>8.1f} {len(sumidero.sesiones):>10}")
+    finally:
+        controlador.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
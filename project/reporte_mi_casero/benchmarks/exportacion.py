@@ -0,0 +1,56 @@
+"""
+Benchmark de la exportación de adjuntos (`components/exportar_tablas.py`) para tablas de SKU grandes.
+
+Uso (desde project/reporte_mi_casero):
+
+    python -m benchmarks.exportacion --filas 10000 100000 200000 --formatos xlsx pdf
+
+Por tamaño de tabla mide el tiempo de exportar y comprimir (sin tracemalloc, que lo distorsiona)
+y, en una segunda pasada, el pico de memoria de Python (tracemalloc) por encima de la tabla ya
+cargada. Con escritura fila a fila el pico debe quedar casi constante al crecer las filas.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import tracemalloc
+import logging
+
+from benchmarks.generadores import generar_ventas_x_sku
+from components.exportar_tablas import exportar_adjuntos
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Tiempo y pico de memoria de la exportación XLSX/PDF comprimida")
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000, 200_000])
+    parser.add_argument("--formatos", nargs="+", default=["xlsx", "pdf"], choices=["xlsx", "pdf"])
+    parser.add_argument("--sin-comprimir", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    directorio = tempfile.mkdtemp(prefix="exportacion_")
+    print(f"{'filas':>8} {'tabla MB':>9} " + " ".join(f"{f + ' s':>8}" for f in args.formatos)
+          + f" {'total s':>8} {'pico MB':>8} {'sin comp. MB':>12} {'adjunto MB':>10}")
+    try:
+        for filas in args.filas:
+            df = generar_ventas_x_sku(filas)
+            tablas = {"Ventas por SKU": df}
+            _, estadisticas = exportar_adjuntos(tablas, directorio, f"tiempo_{filas}", args.formatos,
+                                                comprimir=not args.sin_comprimir)
+            tracemalloc.start()
+            exportar_adjuntos(tablas, directorio, f"memoria_{filas}", args.formatos, comprimir=not args.sin_comprimir)
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            por_formato = " ".join(f"{estadisticas['segundos_por_formato'][f]:>8.2f}" for f in args.formatos)
+            print(f"{filas:>8} {df.memory_usage(deep=True).sum() / 1e6:>9.1f} {por_formato} {estadisticas['segundos']:>8.2f} "
+                  f"{pico / 1e6:>8.1f} {estadisticas['bytes_sin_comprimir'] / 1e6:>12.1f} {estadisticas['bytes'] / 1e6:>10.1f}")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# Generadores de datos sintéticos con la forma de las fuentes reales (Google Sheets y SPs)
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+import logging
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+CATEGORIAS_BASE = [
+    "Pollo Entero", "Presas", "Menudencia", "Embutidos", "Huevos", "Cerdo",
+    "Res", "Pavo", "Congelados", "Abarrotes", "Bebidas", "Otros"
+]
+
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+
+def nombres_sku(n_skus: int) -> List[str]:
+    """ Nombres de producto estables para una cantidad de SKUs """
+    return [f"SKU {i:04d}" for i in range(n_skus)]
+
+
+def generar_form_movimientos(
+    n_fechas: int = 60,
+    n_skus: int = 12,
+    filas_por_movimiento: int = 2,
+    fecha_fin: Optional[date] = None,
+    semilla: int = 0
+) -> pd.DataFrame:
+    """
+    Formulario de movimientos de pollos tal como lo devuelve `get_excel_stock_und`:
+    todas las celdas son strings, una fila por registro del formulario.
+
+    Por cada fecha se genera una fila de 'Stock inicial' y `filas_por_movimiento`
+    filas de 'Ingreso' y de 'Salida'. Cada fila informa unidades para todos los SKUs
+    (algunas celdas vacías, como en el formulario real).
+    """
+    rng = np.random.default_rng(semilla)
+    fecha_fin = fecha_fin or date.today()
+    fechas = [fecha_fin - timedelta(days=d) for d in range(n_fechas - 1, -1, -1)]
+    tipos = ["Stock inicial"] + ["Ingreso"] * filas_por_movimiento + ["Salida"] * filas_por_movimiento
+    n_filas = n_fechas * len(tipos)
+
+    columnas_fecha = np.repeat([f.strftime("%d/%m/%Y") for f in fechas], len(tipos))
+    columnas_tipo = np.tile(tipos, n_fechas)
+    datos = {
+        "Marca temporal": [f"{f} 08:{i % 60:02d}:00" for i, f in enumerate(columnas_fecha)],
+        "Fecha": columnas_fecha,
+        "Tipo de movimiento": columnas_tipo,
+    }
+    unidades = rng.integers(0, 40, size=(n_filas, n_skus)).astype(str).astype(object)
+    unidades[rng.random(size=(n_filas, n_skus)) < 0.1] = ""
+    for j, sku in enumerate(nombres_sku(n_skus)):
+        datos[f"Unidades - {sku}"] = unidades[:, j]
+    return pd.DataFrame(datos)
+
+
+def _fila_total(df: pd.DataFrame, columna_etiqueta: str) -> pd.DataFrame:
+    total = {c: None for c in df.columns}
+    total[columna_etiqueta] = "Total"
+    total["VentaSoles"] = df["VentaSoles"].sum()
+    total["Cantidad"] = df["Cantidad"].sum()
+    total["PrecioPonderado"] = total["VentaSoles"] / total["Cantidad"]
+    total["TicketProm"] = df["TicketProm"].mean()
+    total["partic"] = 100.0
+    return pd.DataFrame([total])
+
+
+def generar_ventas_x_sku(n_skus: int = 80, semilla: int = 0) -> pd.DataFrame:
+    """ Salida del SP de ventas por SKU del día """
+    rng = np.random.default_rng(semilla)
+    cantidad = rng.uniform(1, 300, n_skus).round(2)
+    precio = rng.uniform(5, 40, n_skus).round(2)
+    venta = (cantidad * precio).round(2)
+    horas = rng.integers(8 * 60, 21 * 60, n_skus)
+    df = pd.DataFrame({
+        "Categoria": rng.choice(CATEGORIAS_BASE, n_skus),
+        "ProductoNombre": nombres_sku(n_skus),
+        "PrecioPonderado": precio,
+        "VentaSoles": venta,
+        "Cantidad": cantidad,
+        "TicketProm": rng.uniform(10, 80, n_skus).round(2),
+        "AsientoCreadoEl_Hora": [f"{h // 60:02d}:{h % 60:02d}" for h in horas],
+        "partic": (venta / venta.sum() * 100).round(2),
+    })
+    return df
+
+
+def generar_ventas_x_categoria(n_categorias: int = 12, semilla: int = 0) -> pd.DataFrame:
+    """ Salida del SP de ventas por categoría del día (incluye la fila 'Total') """
+    rng = np.random.default_rng(semilla)
+    categorias = [CATEGORIAS_BASE[i % len(CATEGORIAS_BASE)] + ("" if i < len(CATEGORIAS_BASE) else f" {i}")
+                  for i in range(n_categorias)]
+    cantidad = rng.uniform(10, 2000, n_categorias).round(2)
+    precio = rng.uniform(5, 40, n_categorias).round(2)
+    venta = (cantidad * precio).round(2)
+    df = pd.DataFrame({
+        "Categoria": categorias,
+        "PrecioPonderado": precio,
+        "VentaSoles": venta,
+        "Cantidad": cantidad,
+        "TicketProm": rng.uniform(10, 80, n_categorias).round(2),
+        "partic": (venta / venta.sum() * 100).round(2),
+    })
+    return pd.concat([df, _fila_total(df, "Categoria")], ignore_index=True)
+
+
+def generar_ventas_semanal_vs_ppto(n_semanas: int = 52, fecha_fin: Optional[date] = None, semilla: int = 0) -> pd.DataFrame:
+    """ Salida del SP de ventas semanales vs presupuesto (una fila por semana ISO) """
+    rng = np.random.default_rng(semilla)
+    fecha_fin = fecha_fin or date.today()
+    lunes = [fecha_fin - timedelta(weeks=w, days=fecha_fin.weekday()) for w in range(n_semanas - 1, -1, -1)]
+    iso = [l.isocalendar() for l in lunes]
+    ppto = rng.uniform(80_000, 140_000, n_semanas).round(2)
+    real = (ppto * rng.uniform(0.8, 1.15, n_semanas)).round(2)
+    return pd.DataFrame({
+        "idPeriodo": [i[0] for i in iso],
+        "numSemana": [i[1] for i in iso],
+        "ImporteProyectadoSemana": ppto,
+        "VentaReal": real,
+        "PorcCumplimientoVenta": (real / ppto * 100).round(2),
+    })
+
+
+def generar_ventas_x_diasem(semilla: int = 0) -> pd.DataFrame:
+    """ Salida del SP comparativo semana actual vs anterior por día """
+    rng = np.random.default_rng(semilla)
+    anterior = rng.uniform(10_000, 25_000, 7).round(2)
+    actual = (anterior * rng.uniform(0.8, 1.2, 7)).round(2)
+    return pd.DataFrame({
+        "Dia": DIAS_SEMANA,
+        "VentaSemanaAnterior": anterior,
+        "VentaSemanaActual": actual,
+        "DiferenciaPorcentaje": ((actual - anterior) / anterior * 100).round(2),
+    })
+
+
+def generar_lineas_venta(
+    n_dias: int = 90,
+    n_skus: int = 80,
+    tickets_por_dia: int = 400,
+    lineas_por_ticket: int = 3,
+    fecha_fin: Optional[date] = None,
+    semilla: int = 0
+) -> pd.DataFrame:
+    """
+    Líneas de venta para la tabla `ventas` del backend SQLite (ver `crear_base_sqlite`):
+    fecha (ISO), hora, ticket, categoria, producto, cantidad y venta_soles.
+    """
+    rng = np.random.default_rng(semilla)
+    fecha_fin = fecha_fin or date.today()
+    skus = np.array(nombres_sku(n_skus))
+    categoria_sku = rng.choice(CATEGORIAS_BASE, n_skus)
+    precio_sku = rng.uniform(5, 40, n_skus).round(2)
+
+    n_tickets = n_dias * tickets_por_dia
+    n_lineas = n_tickets * lineas_por_ticket
+    dia = np.repeat(np.arange(n_dias), tickets_por_dia * lineas_por_ticket)
+    fechas = np.array([(fecha_fin - timedelta(days=n_dias - 1 - d)).isoformat() for d in range(n_dias)])
+    ticket = np.repeat(np.arange(n_tickets), lineas_por_ticket)
+    minuto = np.repeat(rng.integers(8 * 60, 21 * 60, n_tickets), lineas_por_ticket)
+    sku = rng.integers(0, n_skus, n_lineas)
+    cantidad = rng.uniform(0.2, 5, n_lineas).round(3)
+    return pd.DataFrame({
+        "fecha": fechas[dia],
+        "hora": [f"{m // 60:02d}:{m % 60:02d}" for m in minuto],
+        "ticket": ticket.astype(str),
+        "categoria": categoria_sku[sku],
+        "producto": skus[sku],
+        "cantidad": cantidad,
+        "venta_soles": (cantidad * precio_sku[sku]).round(2),
+    })
+
+
+def generar_presupuesto_semanal(lineas_venta: pd.DataFrame, semilla: int = 0) -> pd.DataFrame:
+    """ Presupuesto por semana ISO (tabla `presupuesto_semanal`) alrededor de la venta real de las líneas """
+    rng = np.random.default_rng(semilla)
+    fechas = pd.to_datetime(lineas_venta["fecha"])
+    iso = fechas.dt.isocalendar()
+    real = lineas_venta.groupby([iso["year"].to_numpy(), iso["week"].to_numpy()])["venta_soles"].sum()
+    return pd.DataFrame({
+        "anio": real.index.get_level_values(0).astype(int),
+        "semana": real.index.get_level_values(1).astype(int),
+        "importe_proyectado": (real.to_numpy() * rng.uniform(0.9, 1.1, len(real))).round(2),
+    })
+
+
+def generar_fuentes(escala: int = 1, fecha: Optional[date] = None, semilla: int = 0) -> Dict[str, pd.DataFrame]:
+    """
+    Todas las fuentes de una ejecución a una escala dada, con las mismas claves que
+    `REPORTES_CONFIG` más el formulario 'form_mov_pollos'.
+
+    La escala multiplica fechas y SKUs del formulario, SKUs del SP y categorías.
+    """
+    fecha = fecha or date.today()
+    return {
+        "ventas_semanal_vs_ppto": generar_ventas_semanal_vs_ppto(52, fecha_fin=fecha, semilla=semilla),
+        "ventas_x_sku": generar_ventas_x_sku(80 * escala, semilla=semilla),
+        "ventas_x_categoria": generar_ventas_x_categoria(12 * escala, semilla=semilla),
+        "ventas_comparativo_x_semana_x_dia": generar_ventas_x_diasem(semilla=semilla),
+        "form_mov_pollos": generar_form_movimientos(60 * escala, 12 * escala, fecha_fin=fecha, semilla=semilla),
+    }
+
+
+def generar_escenario_roturas(
+    n_dias: int = 90,
+    n_tiendas: int = 10,
+    n_skus: int = 80,
+    prob_rotura: float = 0.05,
+    horas_atencion: float = 14.0,
+    fecha_fin: Optional[date] = None,
+    semilla: int = 0
+) -> Dict[str, pd.DataFrame]:
+    """
+    Historia de varias tiendas para el cruce de roturas de stock:
+
+    - 'form_rotura_stock': formulario de roturas como lo devuelve `get_excel_stock_und` (strings).
+    - 'ventas_x_sku': ventas por SKU de cada día y tienda (columnas del SP más 'Fecha' y 'Tienda').
+    - 'stock': resumen diario por tienda con las columnas de `transformar_df_sheet_google`.
+
+    En los días con rotura la venta cae en proporción a la fracción del horario sin stock.
+    """
+    rng = np.random.default_rng(semilla)
+    fecha_fin = fecha_fin or date.today()
+    fechas = pd.date_range(end=pd.Timestamp(fecha_fin), periods=n_dias)
+    tiendas = [f"T{t:02d}" for t in range(n_tiendas)]
+    skus = nombres_sku(n_skus)
+    forma = (n_dias, n_tiendas, n_skus)
+
+    rotura = rng.random(forma) < prob_rotura
+    inicio = rng.uniform(8, 8 + horas_atencion, forma)
+    fin = np.minimum(inicio + rng.exponential(3, forma), 8 + horas_atencion)
+    fraccion = np.where(rotura, (fin - inicio) / horas_atencion, 0.0)
+    base = rng.uniform(5, 200, (1, n_tiendas, n_skus))
+    cantidad = (base * (1 - fraccion) * rng.normal(1, 0.05, forma)).clip(min=0).round(2)
+    precio = rng.uniform(5, 40, (1, 1, n_skus))
+
+    d, t, s = np.indices(forma).reshape(3, -1)
+    ventas = pd.DataFrame({
+        "Fecha": fechas[d], "Tienda": np.array(tiendas)[t], "ProductoNombre": np.array(skus)[s],
+        "Cantidad": cantidad.ravel(), "VentaSoles": (cantidad * precio).round(2).ravel(),
+    })
+    und = np.round(cantidad / 2).astype(int)
+    stock_inicial = rng.integers(0, 60, forma)
+    ingresos = np.maximum(und - stock_inicial, 0) + rng.integers(0, 20, forma)
+    stock = pd.DataFrame({
+        "Fecha": fechas[d], "Tienda": np.array(tiendas)[t], "Producto": np.array(skus)[s],
+        "Stock Inicial": stock_inicial.ravel(), "Ingresos": ingresos.ravel(), "Ventas": und.ravel(),
+        "Stock Final": (stock_inicial + ingresos - und).ravel(),
+    }).set_index("Fecha")
+
+    e = rotura.ravel()
+    a_hora = lambda h: [f"{m // 60:02d}:{m % 60:02d}" for m in np.round(h * 60).astype(int)]
+    form = pd.DataFrame({
+        "Marca temporal": [f.strftime("%d/%m/%Y 23:00:00") for f in fechas[d[e]]],
+        "Fecha": [f.strftime("%d/%m/%Y") for f in fechas[d[e]]],
+        "Tienda": np.array(tiendas)[t[e]],
+        "Producto": np.array(skus)[s[e]],
+        "Hora de quiebre": a_hora(inicio.ravel()[e]),
+        "Hora de reposición": a_hora(fin.ravel()[e]),
+    })
+    return {"form_rotura_stock": form, "ventas_x_sku": ventas, "stock": stock}
+
@@ -0,0 +1,61 @@
+"""
+Benchmark del cruce de roturas de stock (`data/roturas_stock.py`) sobre historia sintética de varias tiendas.
+
+Uso (desde project/reporte_mi_casero):
+
+    python -m benchmarks.roturas --dias 90 180 --tiendas 20 --skus 80 --presupuesto-s 5
+
+Por escenario genera el formulario de roturas, las ventas por SKU de cada día y tienda y el
+stock diario, y mide la mediana de preparar el formulario, cruzarlo con ventas y stock y
+resumir por SKU. En el escenario la venta cae en proporción a las horas sin stock, así que
+la 'Caída por hora (pp)' esperada es 100 / horas de atención (~7.1 con 14 horas). Sale con
+código 1 si algún escenario supera el presupuesto.
+"""
+import argparse
+import statistics
+import sys
+import time
+import logging
+
+from benchmarks.generadores import generar_escenario_roturas
+from data.roturas_stock import preparar_form_rotura, unir_roturas_ventas, resumir_roturas_por_sku
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cruce de roturas de stock con ventas y stock diario")
+    parser.add_argument("--dias", type=int, nargs="+", default=[90, 180])
+    parser.add_argument("--tiendas", type=int, default=20)
+    parser.add_argument("--skus", type=int, default=80)
+    parser.add_argument("--prob-rotura", type=float, default=0.05, help="Probabilidad de rotura por día, tienda y SKU")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--presupuesto-s", type=float, default=5.0, help="Máximo de la mediana total por escenario")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    fallas = 0
+    print(f"{'días':>5} {'eventos':>8} {'ventas':>9} {'preparar s':>10} {'cruce s':>8} {'resumen s':>9} {'total s':>8} {'pp/hora':>8}")
+    for dias in args.dias:
+        escenario = generar_escenario_roturas(dias, args.tiendas, args.skus, args.prob_rotura)
+        tiempos = []
+        for _ in range(args.repeticiones):
+            t0 = time.perf_counter()
+            eventos = preparar_form_rotura(escenario["form_rotura_stock"])
+            t1 = time.perf_counter()
+            df_dias = unir_roturas_ventas(eventos, escenario["ventas_x_sku"], escenario["stock"])
+            t2 = time.perf_counter()
+            resumen = resumir_roturas_por_sku(df_dias)
+            tiempos.append((t1 - t0, t2 - t1, time.perf_counter() - t2))
+        preparar, cruce, resumir = (statistics.median(t[i] for t in tiempos) for i in range(3))
+        total = preparar + cruce + resumir
+        fallas += total > args.presupuesto_s
+        print(f"{dias:>5} {len(eventos):>8} {len(escenario['ventas_x_sku']):>9} {preparar:>10.3f} {cruce:>8.3f} "
+              f"{resumir:>9.3f} {total:>8.3f} {resumen['Caída por hora (pp)'].median():>8.2f}"
+              f"{'' if total <= args.presupuesto_s else '  ❌ supera el presupuesto'}")
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
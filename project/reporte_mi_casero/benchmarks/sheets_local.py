@@ -0,0 +1,186 @@
+"""
+Servidor local que imita la API REST v4 de Google Sheets (`values.get` y `values.append`)
+para probar el modo --watch sin credenciales ni red.
+
+Uso (desde project/reporte_mi_casero):
+
+    python -m benchmarks.sheets_local --puerto 8790 --retraso-salida 90
+    python main.py --watch --dry-run     # con VIGILANCIA_CONFIG['url_base'] = 'http://127.0.0.1:8790'
+
+Sirve el formulario de movimientos sintético de `generadores.generar_form_movimientos` para
+el SHEET_ID de 'form_mov_pollos' sin las salidas de hoy, y las agrega pasados
+`--retraso-salida` segundos, como si la tienda terminara de cargar el formulario.
+Cuenta pedidos y celdas servidas para comparar lecturas parciales con `get_all_values`.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+import logging
+
+from benchmarks.generadores import generar_form_movimientos
+from config.config import ACCESOS_SHEET_GOOGLE
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+_RUTA = re.compile(r"^/v4/spreadsheets/([^/]*)/values/([^/:]+)(:append)?$")
+_RANGO_A1 = re.compile(r"^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+
+
+def _indice_columna(letras: str) -> int:
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + (ord(letra) - ord("A") + 1)
+    return indice - 1
+
+
+def recortar_rango(filas: List[List[str]], rango: str) -> List[List[str]]:
+    """ Aplica un rango A1 ('1:1', 'B5:C', 'A2:Z100', 'Hoja 1!B:C') a la hoja como lo hace la API """
+    rango = rango.split("!")[-1]
+    coincidencia = _RANGO_A1.match(rango)
+    if not coincidencia:
+        raise ValueError(f"Rango A1 no soportado: '{rango}'")
+    col_desde, fila_desde, col_hasta, fila_hasta = coincidencia.groups()
+    if col_hasta is None and fila_hasta is None:  # Celda o columna/fila única
+        col_hasta, fila_hasta = col_desde, fila_desde
+    i_desde = _indice_columna(col_desde) if col_desde else 0
+    i_hasta = _indice_columna(col_hasta) + 1 if col_hasta else None
+    f_desde = int(fila_desde) - 1 if fila_desde else 0
+    f_hasta = int(fila_hasta) if fila_hasta else None
+    recorte = [fila[i_desde:i_hasta] for fila in filas[f_desde:f_hasta]]
+    # La API omite las celdas vacías al final de cada fila y las filas vacías al final
+    recorte = [fila[:max((i + 1 for i, v in enumerate(fila) if v != ""), default=0)] for fila in recorte]
+    while recorte and not recorte[-1]:
+        recorte.pop()
+    return recorte
+
+
+class ServidorSheetsLocal:
+    """ Hojas en memoria por SHEET_ID; `filas` incluye la fila de encabezados """
+
+    def __init__(self, host: str = "127.0.0.1", puerto: int = 0):
+        self.hojas: Dict[str, List[List[str]]] = {}
+        self.pedidos = 0
+        self.celdas_servidas = 0
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer((host, puerto), self._crear_manejador())
+        self._servidor.daemon_threads = True
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def url_base(self) -> str:
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def cargar(self, sheet_id: str, filas: List[List[str]]) -> None:
+        with self._lock:
+            self.hojas[sheet_id] = [list(map(str, fila)) for fila in filas]
+
+    def agregar_filas(self, sheet_id: str, filas: List[List[str]]) -> None:
+        with self._lock:
+            self.hojas[sheet_id].extend(list(map(str, fila)) for fila in filas)
+
+    def _leer(self, sheet_id: str, rango: str) -> Tuple[int, dict]:
+        with self._lock:
+            if sheet_id not in self.hojas:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            try:
+                valores = recortar_rango(self.hojas[sheet_id], rango)
+            except ValueError as e:
+                return 400, {"error": {"code": 400, "message": str(e)}}
+            self.pedidos += 1
+            self.celdas_servidas += sum(len(fila) for fila in valores)
+        respuesta = {"range": rango, "majorDimension": "ROWS"}
+        if valores:
+            respuesta["values"] = valores
+        return 200, respuesta
+
+    def _crear_manejador(self):
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def _responder(self, codigo: int, cuerpo: dict) -> None:
+                datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+                self.send_response(codigo)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def do_GET(self):
+                ruta = _RUTA.match(urlparse(self.path).path)
+                if not ruta or ruta.group(3):
+                    self._responder(404, {"error": {"code": 404, "message": "Not Found"}})
+                    return
+                self._responder(*servidor._leer(ruta.group(1), unquote(ruta.group(2))))
+
+            def do_POST(self):
+                ruta = _RUTA.match(urlparse(self.path).path)
+                if not ruta or not ruta.group(3) or ruta.group(1) not in servidor.hojas:
+                    self._responder(404, {"error": {"code": 404, "message": "Not Found"}})
+                    return
+                largo = int(self.headers.get("Content-Length") or 0)
+                filas = json.loads(self.rfile.read(largo) or b"{}").get("values", [])
+                servidor.agregar_filas(ruta.group(1), filas)
+                self._responder(200, {"spreadsheetId": ruta.group(1), "updates": {"updatedRows": len(filas)}})
+
+            def log_message(self, formato, *args):
+                logger.debug(f"🌐 {self.address_string()} {formato % args}")
+
+        return Manejador
+
+    def iniciar(self) -> "ServidorSheetsLocal":
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name="sheets-local", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+def formulario_sin_salidas_de_hoy(fecha: date, n_fechas: int = 60, n_skus: int = 12) -> Tuple[List[List[str]], List[List[str]]]:
+    """ (hoja con encabezados sin las salidas de `fecha`, filas de salida pendientes) """
+    df = generar_form_movimientos(n_fechas=n_fechas, n_skus=n_skus, fecha_fin=fecha)
+    pendientes = (df["Fecha"] == fecha.strftime("%d/%m/%Y")) & (df["Tipo de movimiento"] == "Salida")
+    hoja = [list(df.columns)] + df[~pendientes].values.tolist()
+    return hoja, df[pendientes].values.tolist()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita la API v4 de Google Sheets")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8790)
+    parser.add_argument("--fechas", type=int, default=60, help="Días de historia del formulario")
+    parser.add_argument("--retraso-salida", type=float, default=60.0,
+                        help="Segundos hasta agregar las salidas de hoy (negativo: nunca)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    sheet_id = ACCESOS_SHEET_GOOGLE['form_mov_pollos']['SHEET_ID']
+    hoja, salidas = formulario_sin_salidas_de_hoy(date.today(), n_fechas=args.fechas)
+    servidor = ServidorSheetsLocal(args.host, args.puerto).iniciar()
+    servidor.cargar(sheet_id, hoja)
+    logger.info(f"📄 Hoja {sheet_id} servida en {servidor.url_base} ({len(hoja) - 1} filas, {len(salidas)} salidas pendientes)")
+    try:
+        if args.retraso_salida >= 0:
+            time.sleep(args.retraso_salida)
+            servidor.agregar_filas(sheet_id, salidas)
+            logger.info(f"➕ {len(salidas)} salidas de hoy agregadas")
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info(f"📊 {servidor.pedidos} pedidos, {servidor.celdas_servidas} celdas servidas")
+        servidor.detener()
+
+
+if __name__ == "__main__":
+    main()
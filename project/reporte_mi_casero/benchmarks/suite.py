@@ -0,0 +1,308 @@
+"""
+Suite de benchmarks de las etapas del pipeline sobre datos sintéticos.
+
+Uso (desde project/reporte_mi_casero):
+
+    python -m benchmarks.suite                         # escalas 1, 2 y 4
+    python -m benchmarks.suite --escalas 1 2 4 8 --repeticiones 7
+    python -m benchmarks.suite --guardar-baseline      # guarda benchmarks/baseline.json
+    python -m benchmarks.suite --con-render            # incluye el render PNG con Kaleido
+
+Reporta la mediana por caso y escala y la curva de escalamiento (exponente empírico k,
+t ~ n^k, entre escalas consecutivas), marcando los casos superlineales.
+
+Los tiempos absolutos dependen de la máquina, así que la baseline no guarda segundos:
+cada mediana se divide por una carga de calibración fija medida en la misma corrida
+(`relativo`). La suite termina con código 1 si algún caso supera su tiempo relativo de
+la baseline en más de `--tolerancia`, o si su exponente k empeora en más de `--tolerancia-k`
+(un cambio de complejidad se ve aunque la máquina sea otra).
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Tuple
+import logging
+
+from benchmarks.generadores import generar_fuentes
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+RUTA_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Exponente k a partir del cual un caso se marca como superlineal
+K_SUPERLINEAL = 1.2
+# Por debajo de este tiempo relativo (unidades de calibración) domina el ruido de la medición:
+# no se calcula k, y un caso solo es regresión si además lo supera
+MIN_RELATIVO = 0.2
+
+
+class CasoBenchmark:
+    """
+    Un caso de la suite: `preparar(fuentes)` arma los argumentos (fuera del tiempo medido)
+    y `ejecutar(*args)` es la llamada que se mide. `tamaño(fuentes)` es la magnitud de
+    entrada que se usa para la curva de escalamiento.
+    """
+
+    def __init__(self, nombre: str, preparar: Callable[[Dict[str, Any]], Tuple], ejecutar: Callable[..., Any],
+                 tamaño: Callable[[Dict[str, Any]], int], requiere_render: bool = False):
+        self.nombre = nombre
+        self.preparar = preparar
+        self.ejecutar = ejecutar
+        self.tamaño = tamaño
+        self.requiere_render = requiere_render
+
+
+def _casos() -> List[CasoBenchmark]:
+    # Importaciones diferidas: los módulos del pipeline solo se cargan al correr la suite
+    from data.transformar import (format_table, transformar_df_sheet_google, preparar_df_sheet_google,
+                                  transformar_y_filtrar_datos_ventas_vs_ppto)
+    from data.generar_reporte_google import generar_reporte_diario_und_pollos
+    from data.kpis import MotorKPIs
+    from components.generar_tablas_html import tabla_html
+    from components.reportes_graficos import crear_grafico_ventas_semanales
+    from components.reporte_graficos_2 import generar_grafico_ventas_vs_presupuesto
+    from utils.convertir_img_base64 import generar_imagen_base64
+    from service.email_service import construir_mensaje
+
+    celdas_form = lambda f: f["form_mov_pollos"].size
+    filas_sku = lambda f: len(f["ventas_x_sku"])
+
+    def _stock_diario(f):
+        return transformar_df_sheet_google(preparar_df_sheet_google(f["form_mov_pollos"].copy()))
+
+    repeticion = itertools.count()
+
+    def _args_cuerpo(f):
+        # Textos nuevos y distintos en cada repetición: se mide la codificación, no una cache
+        sufijo = f"<!-- {next(repeticion)} -->"
+        tabla_sku = tabla_html(format_table(f["ventas_x_sku"].copy())) + sufijo
+        tabla_cat = tabla_html(format_table(f["ventas_x_categoria"].copy())) + sufijo
+        imagen = "iVBORw0KGgo" * 20_000 + sufijo  # ~220 KB de base64, similar a un PNG de Kaleido
+        return (tabla_sku, tabla_cat, tabla_sku, "1,234 UND", "S/ 12,345", "1,234 kg", "S/ 10.00", imagen, imagen)
+
+    def _construir_cuerpo(*args):
+        from main import construir_cuerpo_email
+        return construir_cuerpo_email(*args)
+
+    return [
+        CasoBenchmark("preparar_df_sheet_google",
+                      lambda f: (f["form_mov_pollos"].copy(),),
+                      preparar_df_sheet_google, celdas_form),
+        CasoBenchmark("transformar_df_sheet_google",
+                      lambda f: (preparar_df_sheet_google(f["form_mov_pollos"].copy()),),
+                      transformar_df_sheet_google, celdas_form),
+        CasoBenchmark("generar_reporte_diario_und_pollos",
+                      lambda f: (_stock_diario(f), f["ventas_x_sku"], f["fecha"]),
+                      generar_reporte_diario_und_pollos, celdas_form),
+        CasoBenchmark("motor_kpis",
+                      lambda f: ({"ventas_x_sku": f["ventas_x_sku"], "stock": _stock_diario(f)},),
+                      # Motor nuevo en cada corrida: se mide el cálculo, no la cache por huella
+                      lambda fuentes: [MotorKPIs().calcular(fuentes, d) for d in (None, "dia", "semana", "categoria")],
+                      filas_sku),
+        CasoBenchmark("format_table",
+                      lambda f: (f["ventas_x_sku"].copy(),),
+                      format_table, filas_sku),
+        CasoBenchmark("tabla_html",
+                      lambda f: (format_table(f["ventas_x_sku"].copy()),),
+                      tabla_html, filas_sku),
+        CasoBenchmark("crear_grafico_ventas_semanales",
+                      lambda f: (f["ventas_comparativo_x_semana_x_dia"],),
+                      crear_grafico_ventas_semanales, lambda f: len(f["ventas_comparativo_x_semana_x_dia"])),
+        CasoBenchmark("generar_grafico_ventas_vs_presupuesto",
+                      lambda f: (transformar_y_filtrar_datos_ventas_vs_ppto(f["ventas_semanal_vs_ppto"], semanas=10),),
+                      generar_grafico_ventas_vs_presupuesto, lambda f: len(f["ventas_semanal_vs_ppto"])),
+        CasoBenchmark("render_kaleido",
+                      lambda f: (crear_grafico_ventas_semanales(f["ventas_comparativo_x_semana_x_dia"]),),
+                      generar_imagen_base64, lambda f: len(f["ventas_comparativo_x_semana_x_dia"]),
+                      requiere_render=True),
+        CasoBenchmark("construir_cuerpo_email",
+                      _args_cuerpo, _construir_cuerpo, filas_sku),
+        CasoBenchmark("ensamblado_mime",
+                      lambda f: (_construir_cuerpo(*_args_cuerpo(f)),),
+                      lambda cuerpo: construir_mensaje(cuerpo, ["a@b.com"], "Reporte", "c@d.com").as_string(),
+                      filas_sku),
+    ]
+
+
+def calibrar(repeticiones: int = 7) -> float:
+    """
+    Mediana en segundos de una carga fija (groupby y orden en pandas/NumPy, y un bucle en Python):
+    la unidad de los tiempos relativos, para comparar corridas de máquinas distintas.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"clave": rng.integers(0, 1_000, 200_000), "valor": rng.random(200_000)})
+
+    def carga():
+        df.groupby("clave")["valor"].sum()
+        np.sort(df["valor"].to_numpy())
+        sum(i * i for i in range(200_000))
+
+    carga()
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        carga()
+        tiempos.append(time.perf_counter() - t0)
+    return statistics.median(tiempos)
+
+
+def medir(caso: CasoBenchmark, fuentes: Dict[str, Any], repeticiones: int) -> Dict[str, float]:
+    """ Ejecuta el caso `repeticiones` veces (más una de calentamiento) y devuelve mediana y mínimo en segundos """
+    caso.ejecutar(*caso.preparar(fuentes))
+    tiempos = []
+    for _ in range(repeticiones):
+        args = caso.preparar(fuentes)
+        t0 = time.perf_counter()
+        caso.ejecutar(*args)
+        tiempos.append(time.perf_counter() - t0)
+    return {"mediana_s": statistics.median(tiempos), "min_s": min(tiempos)}
+
+
+def ejecutar_suite(escalas: List[int], repeticiones: int, con_render: bool, filtro: str = "") -> Dict[str, Dict[str, Any]]:
+    """ Mediciones por caso y escala; `relativo` es la mediana en unidades de calibración """
+    resultados: Dict[str, Dict[str, Any]] = {}
+    casos = [c for c in _casos() if (con_render or not c.requiere_render) and filtro in c.nombre]
+    calibracion_inicio = calibrar()
+    for escala in escalas:
+        fuentes = generar_fuentes(escala=escala)
+        fuentes["fecha"] = date.today()
+        for caso in casos:
+            medicion = medir(caso, fuentes, repeticiones)
+            medicion["tamaño"] = caso.tamaño(fuentes)
+            resultados.setdefault(caso.nombre, {})[str(escala)] = medicion
+            logger.info(f"{caso.nombre} x{escala}: {medicion['mediana_s'] * 1000:.2f} ms (n={medicion['tamaño']})")
+    # Antes y después: la carga de la máquina puede cambiar durante la suite
+    calibracion = (calibracion_inicio + calibrar()) / 2
+    for por_escala in resultados.values():
+        for medicion in por_escala.values():
+            medicion["relativo"] = medicion["mediana_s"] / calibracion
+    print(f"Calibración: {calibracion * 1000:.2f} ms")
+    return resultados
+
+
+def exponentes(por_escala: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+    """ Escala -> exponente k (t ~ n^k) respecto de la escala anterior, si la medición alcanza para estimarlo """
+    ks: Dict[str, float] = {}
+    anterior = None
+    for escala, m in sorted(por_escala.items(), key=lambda kv: int(kv[0])):
+        if anterior and m["tamaño"] != anterior["tamaño"] and \
+                min(anterior["relativo"], m["relativo"]) > 0 and max(anterior["relativo"], m["relativo"]) >= MIN_RELATIVO:
+            ks[escala] = math.log(m["relativo"] / anterior["relativo"]) / math.log(m["tamaño"] / anterior["tamaño"])
+        anterior = m
+    return ks
+
+
+def imprimir_curvas(resultados: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    Tabla de tiempos por escala y exponente empírico t ~ n^k entre escalas consecutivas.
+    Devuelve los casos superlineales (k > K_SUPERLINEAL), que quedan marcados con ⚠️.
+    """
+    superlineales = []
+    print(f"\n{'caso':<40} {'escala':>6} {'tamaño':>10} {'mediana (ms)':>13} {'relativo':>9} {'k':>6}")
+    for nombre, por_escala in resultados.items():
+        ks = exponentes(por_escala)
+        for escala, m in sorted(por_escala.items(), key=lambda kv: int(kv[0])):
+            k = f"{ks[escala]:.2f}" if escala in ks else ""
+            marca = ""
+            if ks.get(escala, 0) > K_SUPERLINEAL:
+                marca = " ⚠️"
+                superlineales.append(f"{nombre} x{escala}: k = {ks[escala]:.2f}")
+            print(f"{nombre:<40} {escala:>6} {m['tamaño']:>10} {m['mediana_s'] * 1000:>13.2f} {m['relativo']:>9.3f} {k:>6}{marca}")
+    return superlineales
+
+
+def comparar_con_baseline(resultados: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                          tolerancia: float, tolerancia_k: float) -> List[str]:
+    """
+    Regresiones respecto de la baseline: tiempo relativo > baseline * (1 + tolerancia) (y sobre
+    MIN_RELATIVO), o exponente k > k de la baseline + tolerancia_k entre las mismas escalas
+    """
+    regresiones = []
+    for nombre, por_escala in resultados.items():
+        base_caso = baseline.get(nombre, {})
+        for escala, m in por_escala.items():
+            base = base_caso.get(escala)
+            if not base:
+                continue
+            limite = max(base["relativo"] * (1 + tolerancia), MIN_RELATIVO)
+            if m["relativo"] > limite:
+                regresiones.append(f"{nombre} x{escala}: {m['relativo']:.3f} > {limite:.3f} en unidades de calibración "
+                                   f"(baseline {base['relativo']:.3f})")
+        ks_base = exponentes({e: b for e, b in base_caso.items() if e in por_escala})
+        for escala, k in exponentes({e: m for e, m in por_escala.items() if e in base_caso}).items():
+            if escala in ks_base and k > ks_base[escala] + tolerancia_k:
+                regresiones.append(f"{nombre} x{escala}: escala peor, k = {k:.2f} > {ks_base[escala] + tolerancia_k:.2f} "
+                                   f"(baseline {ks_base[escala]:.2f})")
+    return regresiones
+
+
+def baseline_portable(resultados: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """ Lo que se guarda como baseline: tiempos relativos y tamaños, sin segundos de esta máquina """
+    return {nombre: {escala: {"relativo": m["relativo"], "tamaño": m["tamaño"]} for escala, m in por_escala.items()}
+            for nombre, por_escala in resultados.items()}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline del reporte Mi Casero")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--con-render", action="store_true", help="Incluye el render PNG con Kaleido")
+    parser.add_argument("--filtro", default="", help="Solo casos cuyo nombre contenga este texto")
+    parser.add_argument("--baseline", default=RUTA_BASELINE)
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="Regresión permitida del tiempo relativo sobre la baseline (0.25 = 25%%)")
+    parser.add_argument("--tolerancia-k", type=float, default=0.3,
+                        help="Aumento permitido del exponente de escalamiento k sobre la baseline")
+    parser.add_argument("--guardar-baseline", action="store_true", help="Guarda los resultados como nueva baseline")
+    parser.add_argument("--salida", help="Ruta JSON donde escribir los resultados")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    resultados = ejecutar_suite(args.escalas, args.repeticiones, args.con_render, args.filtro)
+    superlineales = imprimir_curvas(resultados)
+    if superlineales:
+        print(f"\n⚠️ Casos superlineales (k > {K_SUPERLINEAL}):")
+        for s in superlineales:
+            print(f"   - {s}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+    if args.guardar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline_portable(resultados), f, indent=2)
+        print(f"\n✅ Baseline guardada en {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n⚠️ No hay baseline en {args.baseline}; ejecuta con --guardar-baseline para crearla.")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if any("relativo" not in m for por_escala in baseline.values() for m in por_escala.values()):
+        print(f"\n⚠️ {args.baseline} tiene segundos absolutos (formato anterior); regenérala con --guardar-baseline.")
+        return 0
+    regresiones = comparar_con_baseline(resultados, baseline, args.tolerancia, args.tolerancia_k)
+    if regresiones:
+        print("\n❌ Regresiones respecto a la baseline:")
+        for r in regresiones:
+            print(f"   - {r}")
+        return 1
+    print("\n✅ Sin regresiones respecto a la baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+# Exportación de las tablas completas (sin formatear) a XLSX y PDF para adjuntarlas al correo
+import os
+import shutil
+import time
+import zipfile
+import zlib
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Encabezados de las columnas de los SP (las que ya pasaron por `format_table` conservan su nombre)
+ENCABEZADOS = {
+    "Categoria": "Categoría",
+    "ProductoNombre": "Producto",
+    "PrecioPonderado": "Precio Prom",
+    "VentaSoles": "Ventas Totales (S/)",
+    "Cantidad": "Cantidad Total (kg)",
+    "TicketProm": "Ticket Promedio",
+    "AsientoCreadoEl_Hora": "Última Compra (hh:mm)",
+    "partic": "Participación (%)",
+}
+
+FILAS_POR_LOTE = 5_000
+
+# Fecha fija de creación (metadatos del xlsx y entradas del zip): los mismos datos dan los mismos
+# bytes, así el archivo de reportes y la cache de adjuntos deduplican el adjunto entre ejecuciones
+FECHA_FIJA = datetime(1980, 1, 1)
+
+
+def _a_python(columna: np.ndarray) -> List[Any]:
+    """ Valores de una columna como objetos de Python, con None en lugar de NaN/NaT """
+    if columna.dtype.kind == "M":
+        texto = np.datetime_as_string(columna, unit="s")
+        return np.where(np.isnat(columna), None, texto).tolist()
+    if columna.dtype.kind in "fO":
+        return np.where(pd.isna(columna), None, columna).tolist()
+    return columna.tolist()
+
+
+def _lotes(df: pd.DataFrame, tamanio: int = FILAS_POR_LOTE):
+    """ Filas de `df` como tuplas, por lotes: solo se materializa un lote a la vez (NaN -> None) """
+    for inicio in range(0, len(df), tamanio):
+        # Se corta antes de convertir: columnas de texto (Arrow) se copian a objetos solo para el lote
+        lote = df.iloc[inicio:inicio + tamanio]
+        yield inicio, zip(*(_a_python(lote[c].to_numpy()) for c in df.columns))
+
+
+def _es_numerica(serie: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie)
+
+
+# --- XLSX ---
+
+def escribir_xlsx(tablas: Dict[str, pd.DataFrame], ruta: str) -> str:
+    """
+    Una hoja por tabla, con los valores numéricos tal cual (el formato es del libro, no del dato).
+    xlsxwriter en modo `constant_memory`: cada fila se escribe al disco al pasar a la siguiente,
+    así la memoria no crece con la cantidad de filas.
+    """
+    import xlsxwriter
+
+    libro = xlsxwriter.Workbook(ruta, {"constant_memory": True, "strings_to_numbers": False, "strings_to_urls": False})
+    libro.set_properties({"created": FECHA_FIJA})
+    try:
+        encabezado = libro.add_format({"bold": True, "font_color": "white", "bg_color": "#003366", "align": "center"})
+        numero = libro.add_format({"num_format": "#,##0.00"})
+        for nombre, df in tablas.items():
+            hoja = libro.add_worksheet(nombre[:31])
+            numericas = [_es_numerica(df[c]) for c in df.columns]
+            for j, columna in enumerate(df.columns):
+                titulo = ENCABEZADOS.get(columna, str(columna))
+                hoja.set_column(j, j, max(12, min(40, len(titulo) + 2)))
+            hoja.write_row(0, 0, [ENCABEZADOS.get(c, str(c)) for c in df.columns], encabezado)
+            hoja.freeze_panes(1, 0)
+            hoja.autofilter(0, 0, max(len(df), 1), max(len(df.columns) - 1, 0))
+            escribir_numero, escribir_texto = hoja.write_number, hoja.write_string
+            for inicio, filas in _lotes(df):
+                for i, fila in enumerate(filas, start=inicio + 1):
+                    for j, valor in enumerate(fila):
+                        if valor is None:
+                            continue
+                        if numericas[j]:
+                            escribir_numero(i, j, valor, numero)
+                        else:
+                            escribir_texto(i, j, str(valor))
+    finally:
+        libro.close()
+    return ruta
+
+
+# --- PDF ---
+
+class _PdfTabla:
+    """
+    PDF mínimo de tablas en texto monoespaciado (Courier, A4 apaisado), escrito página a página:
+    cada página se comprime y se escribe al archivo apenas se completa, así la memoria no
+    depende de la cantidad de filas. Los textos se codifican en WinAnsi (cp1252).
+    """
+    ANCHO, ALTO = 842, 595
+    MARGEN = 28
+    TAMANIO_LETRA = 7
+    INTERLINEADO = 9
+
+    def __init__(self, archivo: BinaryIO):
+        self.archivo = archivo
+        self.desplazamientos: List[int] = []
+        self.paginas: List[int] = []
+        self._escribir(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        # Objetos 1 (catálogo), 2 (árbol de páginas) y 3 (fuente) se escriben al cerrar/ahora
+        self._reservar(3)
+        self._objeto(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+        self.lineas_por_pagina = int((self.ALTO - 2 * self.MARGEN) / self.INTERLINEADO)
+        self.columnas_por_linea = int((self.ANCHO - 2 * self.MARGEN) / (self.TAMANIO_LETRA * 0.6))
+
+    def _escribir(self, datos: bytes) -> None:
+        self.archivo.write(datos)
+
+    def _reservar(self, n: int) -> None:
+        self.desplazamientos.extend([0] * n)
+
+    def _objeto(self, numero: int, contenido: bytes) -> None:
+        self.desplazamientos[numero - 1] = self.archivo.tell()
+        self._escribir(b"%d 0 obj\n" % numero + contenido + b"\nendobj\n")
+
+    def _nuevo_objeto(self, contenido: bytes) -> int:
+        self._reservar(1)
+        numero = len(self.desplazamientos)
+        self._objeto(numero, contenido)
+        return numero
+
+    @staticmethod
+    def _texto(linea: str) -> bytes:
+        datos = linea.encode("cp1252", errors="replace")
+        return datos.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+    def pagina(self, lineas: Sequence[str]) -> None:
+        y = self.ALTO - self.MARGEN - self.TAMANIO_LETRA
+        contenido = [b"BT /F1 %d Tf %d TL %d %d Td" % (self.TAMANIO_LETRA, self.INTERLINEADO, self.MARGEN, y)]
+        contenido += [b"(" + self._texto(linea[:self.columnas_por_linea]) + b") Tj T*" for linea in lineas]
+        contenido.append(b"ET")
+        flujo = zlib.compress(b"\n".join(contenido), 6)
+        numero_flujo = self._nuevo_objeto(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(flujo) + flujo + b"\nendstream")
+        self.paginas.append(self._nuevo_objeto(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (self.ANCHO, self.ALTO, numero_flujo)))
+
+    def cerrar(self) -> None:
+        hijos = b" ".join(b"%d 0 R" % p for p in self.paginas)
+        self._objeto(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (hijos, len(self.paginas)))
+        self._objeto(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        inicio_xref = self.archivo.tell()
+        self._escribir(b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.desplazamientos) + 1))
+        self._escribir(b"".join(b"%010d 00000 n \n" % d for d in self.desplazamientos))
+        self._escribir(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                       % (len(self.desplazamientos) + 1, inicio_xref))
+
+
+def _formatear_celda(valor: Any) -> str:
+    if valor is None:
+        return "-"
+    if isinstance(valor, (float, np.floating)):
+        return f"{valor:,.2f}"
+    if isinstance(valor, (int, np.integer)):
+        return f"{valor:,}"
+    return str(valor)
+
+
+def escribir_pdf(tablas: Dict[str, pd.DataFrame], ruta: str, titulo: str = "") -> str:
+    """ Las tablas como texto en columnas de ancho fijo, repitiendo el encabezado en cada página """
+    with open(ruta, "wb") as archivo:
+        pdf = _PdfTabla(archivo)
+        for nombre, df in tablas.items():
+            encabezados = [ENCABEZADOS.get(c, str(c)) for c in df.columns]
+            # Ancho por columna: encabezado o un valor típico (sin recorrer toda la tabla)
+            muestra = df.head(200)
+            anchos = [max(len(t), *(len(_formatear_celda(v)) for v in muestra[c].tolist()), 4) + 2
+                      for t, c in zip(encabezados, df.columns)]
+            alinear = [str.rjust if _es_numerica(df[c]) else str.ljust for c in df.columns]
+            cabecera = [f"{titulo} - {nombre}".strip(" -"), "".join(t.ljust(a) for t, a in zip(encabezados, anchos)),
+                        "-" * min(sum(anchos), pdf.columnas_por_linea)]
+            lineas = list(cabecera)
+            for _, filas in _lotes(df):
+                for fila in filas:
+                    lineas.append("".join(f(_formatear_celda(v)[:a - 1], a - 1) + " "
+                                          for v, a, f in zip(fila, anchos, alinear)))
+                    if len(lineas) == pdf.lineas_por_pagina:
+                        pdf.pagina(lineas)
+                        lineas = list(cabecera)
+            if len(lineas) > len(cabecera) or df.empty:
+                pdf.pagina(lineas)
+        pdf.cerrar()
+    return ruta
+
+
+# --- Exportación y compresión ---
+
+def exportar_adjuntos(tablas: Dict[str, pd.DataFrame], directorio: str, nombre: str,
+                      formatos: Sequence[str] = ("xlsx",), comprimir: bool = True,
+                      titulo: str = "") -> Tuple[str, Dict[str, Any]]:
+    """
+    Escribe las tablas en cada formato pedido ('xlsx', 'pdf') y, con `comprimir`, los empaqueta
+    en un .zip (deflate, leyendo desde disco). Devuelve (ruta del archivo a adjuntar, estadísticas).
+    """
+    os.makedirs(directorio, exist_ok=True)
+    escritores = {"xlsx": escribir_xlsx, "pdf": lambda t, r: escribir_pdf(t, r, titulo)}
+    inicio = time.perf_counter()
+    archivos = []
+    tiempos: Dict[str, float] = {}
+    for formato in formatos:
+        if formato not in escritores:
+            raise ValueError(f"Formato de exportación no soportado: '{formato}' (disponibles: {sorted(escritores)})")
+        t0 = time.perf_counter()
+        archivos.append(escritores[formato](tablas, os.path.join(directorio, f"{nombre}.{formato}")))
+        tiempos[formato] = time.perf_counter() - t0
+
+    bytes_sin_comprimir = sum(os.path.getsize(a) for a in archivos)
+    if comprimir or len(archivos) > 1:
+        ruta = os.path.join(directorio, f"{nombre}.zip")
+        with zipfile.ZipFile(ruta, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for archivo in archivos:
+                entrada = zipfile.ZipInfo(os.path.basename(archivo), FECHA_FIJA.timetuple()[:6])
+                entrada.compress_type = zipfile.ZIP_DEFLATED
+                entrada.external_attr = 0o100644 << 16
+                with open(archivo, "rb") as origen, zf.open(entrada, "w") as destino:
+                    shutil.copyfileobj(origen, destino, 1 << 20)
+        for archivo in archivos:
+            os.remove(archivo)
+    else:
+        ruta = archivos[0]
+    estadisticas = {
+        "filas": sum(len(df) for df in tablas.values()),
+        "segundos": time.perf_counter() - inicio,
+        "segundos_por_formato": tiempos,
+        "bytes_sin_comprimir": bytes_sin_comprimir,
+        "bytes": os.path.getsize(ruta),
+    }
+    logger.info(f"📎 Adjunto {os.path.basename(ruta)}: {estadisticas['filas']:,} filas, "
+                f"{estadisticas['bytes'] / 1e6:.2f} MB ({bytes_sin_comprimir / 1e6:.2f} MB sin comprimir) "
+                f"en {estadisticas['segundos']:.2f}s")
+    return ruta, estadisticas
+
+
+def podar_adjuntos(directorio: str, retencion_dias: int, excluir: Optional[str] = None) -> int:
+    """
+    Borra los directorios `<directorio>/<run_id>` sin cambios en los últimos `retencion_dias` días
+    (el adjunto enviado ya queda en el checkpoint y en el archivo). `excluir`: run_id en curso.
+    Devuelve cuántos se borraron.
+    """
+    if not os.path.isdir(directorio):
+        return 0
+    limite = time.time() - retencion_dias * 86400
+    borrados = 0
+    for run_id in os.listdir(directorio):
+        ruta = os.path.join(directorio, run_id)
+        if run_id == excluir or not os.path.isdir(ruta) or os.path.getmtime(ruta) >= limite:
+            continue
+        shutil.rmtree(ruta, ignore_errors=True)
+        borrados += 1
+    if borrados:
+        logger.info(f"🧹 {borrados} directorios de adjuntos borrados de {directorio}")
+    return borrados
@@ -0,0 +1,104 @@
+# Plantilla del cuerpo del correo, compilada una sola vez: el cuerpo se arma en UTF-8 con un único join
+import string
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Union
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Fragmentos más chicos se codifican siempre: guardarlos no ahorra nada
+MIN_CODIFICAR_CACHE = 4_096
+
+
+def codificar(fragmento: Any, codificados: Optional[Dict[str, bytes]] = None) -> bytes:
+    """
+    Fragmento en UTF-8. `codificados` guarda los textos grandes ya codificados durante una
+    ejecución (tablas y gráficos comunes a varios perfiles se codifican una vez); quien lo crea
+    lo descarta al terminar, así el daemon no retiene cuerpos de días anteriores. La clave es el
+    propio str: su hash queda guardado en el objeto, así la búsqueda no recorre el texto.
+    """
+    if isinstance(fragmento, bytes):
+        return fragmento
+    if not isinstance(fragmento, str):
+        fragmento = str(fragmento)
+    if codificados is None or len(fragmento) < MIN_CODIFICAR_CACHE:
+        return fragmento.encode("utf-8")
+    codificado = codificados.get(fragmento)
+    if codificado is None:
+        codificado = codificados[fragmento] = fragmento.encode("utf-8")
+    return codificado
+
+
+class PlantillaHTML:
+    """
+    Plantilla con espacios `{nombre}` compilada al crearla: los tramos fijos quedan codificados en
+    UTF-8 y cada render solo intercala los fragmentos (str o bytes) y hace un único `b"".join`.
+
+    Armar el cuerpo en bytes evita que un solo emoji del diseño obligue a guardar todo el texto
+    (tablas y gráficos base64 incluidos) con 4 bytes por carácter, como pasa con un str de Python.
+    """
+
+    def __init__(self, texto: str):
+        self.piezas: List[Union[bytes, str]] = []
+        for literal, campo, _, _ in string.Formatter().parse(texto):
+            if literal:
+                self.piezas.append(literal.encode("utf-8"))
+            if campo is not None:
+                self.piezas.append(campo)
+        self.espacios = [p for p in self.piezas if isinstance(p, str)]
+
+    def _partes(self, fragmentos: Dict[str, Any], codificados: Optional[Dict[str, bytes]]) -> Iterator[bytes]:
+        for pieza in self.piezas:
+            yield pieza if isinstance(pieza, bytes) else codificar(fragmentos[pieza], codificados)
+
+    def render(self, codificados: Optional[Dict[str, bytes]] = None, **fragmentos: Any) -> bytes:
+        """ Cuerpo en UTF-8; `codificados`: cache de fragmentos de la ejecución (ver `codificar`) """
+        faltantes = set(self.espacios) - set(fragmentos)
+        if faltantes:
+            raise KeyError(f"Faltan fragmentos en la plantilla: {sorted(faltantes)}")
+        return b"".join(self._partes(fragmentos, codificados))
+
+    def escribir(self, archivo: BinaryIO, codificados: Optional[Dict[str, bytes]] = None, **fragmentos: Any) -> int:
+        """ Como `render`, escribiendo cada tramo en `archivo` sin armar el cuerpo en memoria """
+        return sum(archivo.write(parte) for parte in self._partes(fragmentos, codificados))
+
+
+PLANTILLA_CUERPO = PlantillaHTML("""
+    <p>Estimados,</p>
+    <p>Resumen de ventas del día:</p>
+    <ul style="list-style-type: none; padding-left: 0; margin: 0;">
+        <li><b>Pollos Vendidos:</b> {comentario_und}</li>
+        <li><b>Ingresos Totales:</b> {total_ventas_formato}</li>
+        <li><b>Volumen Total:</b> {total_kg_formato}</li>
+        <li><b>Precio Promedio:</b> {precio_prom}</li>
+    </ul>
+    <p>
+        📊 Link del Dashboard: 
+        <a href="" 
+        target="_blank" style="color: #0078D4; text-decoration: none;">
+        Ver en Power BI
+        </a>
+    </p>
+    <img src="data:image/png;base64,{grafico_ventas_comp_semanas_bas64}">
+    <p>A continuación, los reportes:</p>
+    <h3>📌 Resumen de Stock (UND Pollos)</h3>
+    {tabla_unidades_html}
+    <br>{seccion_quiebres}
+    <h3>📌 Resumen de Ventas</h3>
+    {tabla_ventas_x_categoria_html}
+    <br>
+    <h3>📌 Detalle de Ventas por Producto</h3>
+    {tabla_ventas_x_sku_html}
+    <br>
+    <h3>📌 Real vs Ppto por semana</h3>
+    <img src="data:image/png;base64,{grafico_ventas_comp_sem_ppto_bas64}" alt="Real vs Ppto por semana";">
+    
+    <p>Saludos,</p>
+    <p><b>Equipo de control de gestión</b></p>
+    """)
+
+# La sección de quiebres solo aparece si algún SKU quedó sin stock en las ventanas analizadas
+PLANTILLA_QUIEBRES = PlantillaHTML("""
+    <h3>📌 Quiebres de Stock (últimos {dias} días)</h3>
+    {tabla_quiebres_html}
+    <br>""")
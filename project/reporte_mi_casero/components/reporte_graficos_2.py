@@ -1,8 +1,11 @@
-import plotly.graph_objects as go
 import pandas as pd
+from typing import TYPE_CHECKING
 from utils.convertir_img_base64 import generar_imagen_base64
 import logging
 
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
 logger = logging.getLogger(__name__)
 
 def _fmt_monto(v):
@@ -17,7 +20,8 @@ def _fmt_k(v):
     except Exception:
         return f"S/ {v}"
 
-def generar_grafico_ventas_vs_presupuesto(df_combinado: pd.DataFrame) -> go.Figure:
+def generar_grafico_ventas_vs_presupuesto(df_combinado: pd.DataFrame) -> "go.Figure":
+    import plotly.graph_objects as go  # plotly se carga recién con el primer gráfico
     df = df_combinado.copy()
 
     # Asegurar tipos numéricos
@@ -151,14 +155,4 @@ def generar_grafico_ventas_vs_presupuesto(df_combinado: pd.DataFrame) -> go.Figu
 
 def crear_imagen_ventas_semanales_vs_ppto(df: pd.DataFrame) -> str:
     figura = generar_grafico_ventas_vs_presupuesto(df)
-    return generar_imagen_base64(figura)
-
-def analizar_rendimiento(df_combinado: pd.DataFrame) -> dict:
-    c = pd.to_numeric(df_combinado['Cumplimiento'], errors='coerce')
-    return {
-        'cumplimiento_promedio': c.mean(),
-        'semanas_deficit': (c < 100).sum(),
-        'semanas_superavit': (c > 100).sum(),
-        'deficit_total': (100 - c.clip(upper=100)).sum(),
-        'superavit_total': (c.clip(lower=100) - 100).sum()
-    }
\ No newline at end of file
+    return generar_imagen_base64(figura)
\ No newline at end of file
@@ -1,9 +1,12 @@
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any
 from utils.convertir_img_base64 import generar_imagen_base64
 import logging
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
@@ -36,7 +39,7 @@ CHART_CONFIG = {
     }
 }
 
-def crear_grafico_ventas_semanales(df: pd.DataFrame, config: Dict[str, Any] = CHART_CONFIG) -> go.Figure:
+def crear_grafico_ventas_semanales(df: pd.DataFrame, config: Dict[str, Any] = CHART_CONFIG) -> "go.Figure":
     """
     Genera un gráfico de barras comparativo de ventas semanales.
 
@@ -48,6 +51,7 @@ def crear_grafico_ventas_semanales(df: pd.DataFrame, config: Dict[str, Any] = CH
     Returns:
         go.Figure: Objeto Figure de Plotly listo para ser mostrado o guardado.
     """
+    import plotly.graph_objects as go  # plotly se carga recién con el primer gráfico
     logger.info("Iniciando la generación del gráfico de ventas semanales.")
     
     # --- 1. Preparación de Datos ---
@@ -120,28 +124,3 @@ def crear_imagen_ventas_semanales(df: pd.DataFrame) -> str:
     """
     figura = crear_grafico_ventas_semanales(df)
     return generar_imagen_base64(figura)
-
-def crear_imagen_ventas_semanales_guardar(df: pd.DataFrame) -> None:
-    """
-    Función de prueba para aislar ÚNICAMENTE el guardado del archivo HTML.
-    """
-    print("📊 Generando el gráfico de ventas semanales...")
-    figura = crear_grafico_ventas_semanales(df)
-    
-    # Ruta de destino
-    nombre_archivo = r"D:\servicio-notificador-correo\index.html"
-    
-    print(f"--- INTENTANDO GUARDAR EN: {nombre_archivo} ---")
-    
-    try:
-        # ÚNICA ACCIÓN: Guardar el archivo HTML
-        figura.write_html(nombre_archivo)
-        print(f"✅ COMANDO DE GUARDADO EJECUTADO. Revisa la ruta.")
-        
-    except Exception as e:
-        # Si hay un error al guardar, se mostrará aquí
-        print(f"❌ ERROR REAL AL GUARDAR: {e}")
-        print("   Esto confirma un problema de permisos o de ruta inválida.")
-
-    # La llamada a generar_imagen_base64 HA SIDO ELIMINADA para esta prueba.
-    
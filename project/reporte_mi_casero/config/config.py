@@ -11,6 +11,14 @@ DB_CONFIG = {
     'tabla_ventas': ''  # Nombre de la tabla
 }
 
+# BACKEND DE BASE DE DATOS DE ReporteExecutor
+# 'sqlserver': SPs de REPORTES_CONFIG vía pyodbc (producción)
+# 'sqlite': consultas equivalentes sobre tablas locales (service/consultas_sqlite.py), para pruebas de carga
+DB_BACKEND = {
+    'tipo': 'sqlserver',
+    'ruta_sqlite': './local/ventas.sqlite'
+}
+
 # RUTA DE ACCESOS AL EXCEL COMPARTIDO.
 ACCESOS_SHEET_GOOGLE = {
     'form_mov_pollos': {
@@ -55,7 +63,187 @@ REPORTES_CONFIG = {
 # CONFIGURACIÓN DEL CORREO
 DESTINATARIOS = ['cesarestefanop@gmail.com']
 
+# PERFILES DE DESTINATARIOS: cada perfil recibe un correo con las tablas y KPIs de sus categorías
+# ('categorias': None = todas). La tabla de stock y los gráficos semanales son comunes a todos.
+PERFILES_DESTINATARIOS = {
+    'general': {
+        'destinatarios': DESTINATARIOS,
+        'categorias': None
+    },
+    # 'jefe_pollo': {
+    #     'destinatarios': ['jefe.pollo@empresa.com'],
+    #     'categorias': ['Pollo Entero', 'Presas', 'Menudencia']
+    # },
+}
+
 SENDER_EMAIL = ''
 SMTP_SERVER = 'smtp.office365.com'
 SMTP_PORT = 587
-PASSWORD = ''
\ No newline at end of file
+PASSWORD = ''
+
+# Cola de envío (ColaEnvios): límites del servidor SMTP (valores de Office 365)
+SMTP_ENVIO_CONFIG = {
+    'sesiones': 3,  # Sesiones SMTP concurrentes
+    'mensajes_por_minuto': 30,
+    'max_destinatarios': 500  # Por mensaje; los destinatarios restantes van en otra parte
+}
+
+# INSTRUMENTACIÓN (tiempos, CPU, memoria, filas y bytes por etapa)
+METRICAS_CONFIG = {
+    'habilitado': False,
+    'tracemalloc': True,  # Pico de memoria por etapa (agrega overhead a las asignaciones)
+    'directorio': './metricas'  # Registro JSON por ejecución + textfile de Prometheus
+}
+
+# SNAPSHOTS DE LAS FUENTES (python main.py --record / --replay <run_id>)
+SNAPSHOTS_CONFIG = {
+    'directorio': './snapshots',  # Un bundle Parquet por ejecución: snapshots/<run_id>/
+    'compresion': 'zstd'
+}
+
+# ALMACÉN ANALÍTICO LOCAL (service/almacen_local.py)
+# Responde ventas_semanal_vs_ppto y ventas_comparativo_x_semana_x_dia desde Parquet local,
+# trayendo de SQL Server solo los días nuevos (total de ventas_x_categoria) y el presupuesto semanal.
+ALMACEN_LOCAL_CONFIG = {
+    'habilitado': False,
+    'directorio': './almacen',
+    'dias_refresco': 1,  # Días previos a la fecha que se vuelven a traer (correcciones tardías)
+    'refresco_presupuesto_dias': 7,  # Antigüedad máxima del presupuesto semanal almacenado
+    'vigencia_segundos': 300,  # No se vuelve a sincronizar la misma fecha dentro de este lapso
+    'compresion': 'zstd'
+}
+
+# BACKFILL HISTÓRICO (python backfill.py --desde dd/mm/YYYY --hasta dd/mm/YYYY)
+BACKFILL_CONFIG = {
+    'directorio': './backfill',  # Un directorio por día: reporte.html, gráficos PNG y snapshot de fuentes
+    'procesos': 4,  # Transformación y render en paralelo
+    'hilos_db': 4  # Consultas simultáneas (tamaño del pool de conexiones)
+}
+
+# MODO MULTI-TIENDA (python multitienda.py)
+# Cada tienda define su formulario de movimientos (clave de ACCESOS_SHEET_GOOGLE), sus destinatarios,
+# el valor que la identifica en los SP ('id_tienda') y, si usa otra base, su propio db_config (None = DB_CONFIG).
+TIENDAS_CONFIG = {
+    'mi_casero': {
+        'nombre': 'Mi Casero',
+        'id_tienda': '',
+        'form_mov_pollos': 'form_mov_pollos',
+        'destinatarios': DESTINATARIOS,
+        'db_config': None
+    }
+}
+
+# SP consolidados: devuelven todas las tiendas en una sola ejecución, con una columna que identifica
+# la tienda. El reporte se ejecuta una vez por base y se parte en memoria. Los reportes que no
+# figuran aquí se ejecutan con el SP de REPORTES_CONFIG (con 'tienda' entre sus params si lo filtra).
+REPORTES_MULTITIENDA_CONFIG = {
+    # 'ventas_x_sku': {
+    #     'sp': '[dl_bi].pro_ventaOdoo_get_delDia_xCategoriaDetalle_xTienda',
+    #     'params': ['fecha'],
+    #     'columna_tienda': 'IdTienda',
+    #     'description': 'Ventas por SKU del día, todas las tiendas'
+    # },
+}
+
+MULTITIENDA_CONFIG = {
+    'procesos': 4,  # Tablas, gráficos y cuerpos de correo en paralelo
+    'hilos': 8  # Consultas y lecturas de Google Sheets simultáneas
+}
+
+# DAEMON (python daemon.py): horarios cron y control HTTP local para ejecuciones a pedido
+DAEMON_CONFIG = {
+    'horarios': ['0 20 * * *'],  # 'minuto hora día mes día_semana'
+    'argumentos': [],  # Argumentos de main.py para las ejecuciones programadas
+    'host': '127.0.0.1',  # Solo escucha localmente
+    'puerto': 8765,
+    'pool_conexiones': 1,  # Conexiones a SQL Server que se mantienen abiertas entre ejecuciones
+    'token': '',  # Obligatorio: se exige en el encabezado X-Token (el daemon no arranca sin token)
+    'espera_max_segundos': 900  # Tope de /ejecutar?esperar=1; si la ejecución sigue, responde 202
+}
+
+# MODO --watch: espera a que el formulario tenga todos los movimientos del día antes de generar el reporte
+VIGILANCIA_CONFIG = {
+    'form': 'form_mov_pollos',
+    'intervalo_min': 30,  # Segundos entre sondeos mientras llegan filas nuevas
+    'intervalo_max': 600,  # Tope del backoff cuando la hoja no cambia
+    'factor': 1.5,  # Crecimiento del intervalo por cada sondeo sin filas nuevas
+    'solapamiento': 20,  # Filas ya leídas que se vuelven a pedir (correcciones recientes)
+    'hora_limite': '23:30',  # Si a esta hora siguen faltando movimientos, no se genera el reporte
+    'url_base': None  # None = API de Google; 'http://127.0.0.1:8790' = benchmarks/sheets_local.py
+}
+
+# CHECKPOINTS: salidas de cada etapa de main por ejecución, para retomarla con --resume <run_id>
+CHECKPOINTS_CONFIG = {
+    'habilitado': True,
+    'directorio': './checkpoints',  # checkpoints/<run_id>/
+    'compresion': 'zstd',
+    'conservar_completas': 5,  # Ejecuciones terminadas con éxito que se conservan (las más recientes)
+    'retencion_incompletas_dias': 7  # Las incompletas (retomables con --resume) se borran pasado este plazo
+}
+
+# QUIEBRES DE STOCK: días con Stock Final <= umbral por SKU, en ventanas móviles (sección del correo)
+QUIEBRES_CONFIG = {
+    'habilitado': True,  # False = se recalcula desde el historial del formulario en cada ejecución
+    'directorio': './almacen/quiebres',  # Estado incremental (últimos max(ventanas) días por SKU)
+    'ventanas': [7, 28, 90],  # Días calendario
+    'ventana_demanda': 28,  # Ventana de la venta promedio con stock usada para estimar la venta perdida
+    'umbral': 0,  # Stock Final <= umbral cuenta como quiebre
+    'top': 10  # SKUs que se muestran, por venta perdida estimada
+}
+
+# ROTURAS DE STOCK (python roturas.py): formulario de roturas cruzado con ventas por SKU y stock diario
+ROTURAS_CONFIG = {
+    'form': 'form_rotura_stock',  # Clave de ACCESOS_SHEET_GOOGLE
+    'form_movimientos': 'form_mov_pollos',  # Formulario del stock diario
+    'columnas': {  # Encabezados del formulario de roturas ('tienda' es opcional)
+        'fecha': 'Fecha',
+        'tienda': 'Tienda',  # Mismo valor que la columna de tienda del SP consolidado
+        'producto': 'Producto',  # Mismo nombre que ProductoNombre en ventas_x_sku
+        'inicio': 'Hora de quiebre',
+        'fin': 'Hora de reposición'
+    },
+    'hora_apertura': '08:00',  # Sin hora de quiebre se asume la apertura
+    'hora_cierre': '22:00',  # Sin hora de reposición se asume el cierre
+    'dias_base': 14,  # Días previos sin rotura que definen la venta base
+    'directorio': './roturas',
+    'hilos_db': 4
+}
+
+# ADJUNTOS: tablas completas (sin formatear) exportadas y adjuntas a cada correo
+EXPORTACION_CONFIG = {
+    'habilitado': True,
+    'formatos': ['xlsx'],  # 'xlsx' y/o 'pdf'
+    'comprimir': True,  # .zip con deflate (con más de un formato siempre se empaqueta)
+    'directorio': './adjuntos',  # adjuntos/<run_id>/
+    'retencion_dias': 7,  # adjuntos/<run_id>/ más viejos se borran al terminar cada ejecución
+    'max_mb': 15  # Adjuntos más pesados no se envían (límite habitual de los servidores SMTP)
+}
+
+# REGISTRO DE ENVÍOS: por (reporte, fecha, destinatarios) huella de las fuentes, del mensaje, estado y tiempos.
+# main omite lo ya enviado con las mismas fuentes y reutiliza el mensaje si solo cambian los destinatarios.
+REGISTRO_CONFIG = {
+    'habilitado': True,
+    'ruta': './registro/envios.sqlite',  # los mensajes generados quedan en registro/salidas/<huella>.eml
+    'ttl_minutos': 30  # una reserva 'enviando' más antigua se considera abandonada
+}
+
+# ARCHIVO DE REPORTES: HTML, gráficos, adjuntos y fuentes de cada envío, direccionados por contenido
+# (lo que no cambió entre ejecuciones se guarda una sola vez). Consulta y reenvío: python archivo.py
+ARCHIVO_CONFIG = {
+    'habilitado': True,
+    'directorio': './archivo',  # archivo/indice.sqlite y archivo/objetos/<ab>/<sha256>
+    'nivel_compresion': 6,  # zlib; los PNG, Parquet y zip se guardan tal cual
+    'fuentes': True,  # archivar también los DataFrames de origen (Parquet)
+    # Fuentes con historial, un Parquet por valor de la columna: cada ejecución solo agrega los días nuevos
+    # (los SP diarios ya son la porción del día y se guardan enteros)
+    'particiones': {'form_mov_pollos': 'Fecha'},
+    'retencion_dias': 365  # 0: sin poda
+}
+
+# PLANTILLA DEL CORREO: fragmentos que cambian poco (gráfico semanal vs presupuesto) se reutilizan por huella de sus datos
+PLANTILLA_CONFIG = {
+    'cache_en_disco': True,  # además de la memoria del proceso, para las ejecuciones siguientes
+    'directorio_cache': './cache/fragmentos',
+    'max_entradas': 64,
+    'max_dias': 14  # entradas en disco sin usar más de estos días se borran
+}
\ No newline at end of file
@@ -0,0 +1,290 @@
+"""
+Daemon del reporte diario: mantiene calientes los módulos (pandas, plotly, gspread, pyodbc),
+el pool de conexiones a SQL Server, el cliente autenticado de Google Sheets y Kaleido, y dispara
+ejecuciones de `main.main` según los horarios cron de DAEMON_CONFIG o a pedido por HTTP local:
+
+    python daemon.py
+    curl -X POST -H "X-Token: $TOKEN" http://127.0.0.1:8765/ejecutar           # encola una ejecución
+    curl -X POST -H "X-Token: $TOKEN" "http://127.0.0.1:8765/ejecutar?esperar=1" -d '{"args": ["--dry-run"]}'
+    curl -H "X-Token: $TOKEN" http://127.0.0.1:8765/estado
+
+Las ejecuciones se serializan en un único hilo trabajador (el registro de métricas es global).
+El daemon no arranca sin DAEMON_CONFIG['token']; todas las rutas salvo /salud lo exigen.
+"""
+import argparse
+import hmac
+import json
+import queue
+import signal
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+import main as reporte
+from config.config import DAEMON_CONFIG, GOOGLE_SHEET_CREDENTIALS
+from service.conect_google_sheet import obtener_cliente_gspread
+from utils.convertir_img_base64 import calentar_kaleido
+from utils.cron import ExpresionCron, proxima_ejecucion
+from utils.logs import main_loger
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class Solicitud:
+    """ Ejecución pendiente o terminada del reporte """
+
+    def __init__(self, argv: List[str], origen: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.argv = argv
+        self.origen = origen
+        self.encolada = datetime.now()
+        self.inicio: Optional[datetime] = None
+        self.segundos: Optional[float] = None
+        self.estado = "pendiente"
+        self.detalle = ""
+        self.terminada = threading.Event()
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "origen": self.origen,
+            "args": self.argv,
+            "encolada": self.encolada.isoformat(timespec="seconds"),
+            "inicio": self.inicio.isoformat(timespec="seconds") if self.inicio else None,
+            "segundos": round(self.segundos, 3) if self.segundos is not None else None,
+            "estado": self.estado,
+            "detalle": self.detalle,
+        }
+
+
+class DaemonReporte:
+
+    def __init__(self, horarios: List[str], argumentos: List[str], host: str, puerto: int,
+                 tamanio_pool: int = 1, token: str = "", espera_max: float = 900.0):
+        if not token:
+            raise ValueError("DAEMON_CONFIG['token'] está vacío: /ejecutar quedaría sin autenticación.")
+        reporte.parsear_argumentos(argumentos)  # SystemExit si los argumentos programados no son válidos
+        self.horarios = [ExpresionCron(h) for h in horarios]
+        self.argumentos = argumentos
+        self.host = host
+        self.puerto = puerto
+        self.tamanio_pool = tamanio_pool
+        self.token = token
+        self.espera_max = espera_max
+        self.fuente = None
+        self.proxima: Optional[datetime] = None
+        self.en_curso: Optional[Solicitud] = None
+        self.historial: deque = deque(maxlen=50)
+        self._cola: "queue.Queue[Optional[Solicitud]]" = queue.Queue()
+        self._detener = threading.Event()
+        self._servidor: Optional[ThreadingHTTPServer] = None
+        self._hilos: List[threading.Thread] = []
+
+    # --- Recursos calientes ---
+
+    def calentar(self) -> None:
+        """ Abre una vez lo que cada ejecución en frío paga antes de trabajar """
+        inicio = time.perf_counter()
+        self.fuente = reporte.crear_fuente_produccion(tamanio_pool=self.tamanio_pool)
+        pool = getattr(self.fuente.executor.backend, "pool", None)
+        if pool is not None:
+            try:
+                with pool.conexion():
+                    pass
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo abrir la conexión a SQL Server al iniciar: {e}")
+        try:
+            obtener_cliente_gspread(GOOGLE_SHEET_CREDENTIALS)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo autenticar con Google Sheets al iniciar: {e}")
+        calentar_kaleido()
+        logger.info(f"🔥 Recursos calientes en {time.perf_counter() - inicio:.1f}s")
+
+    # --- Ejecuciones ---
+
+    def encolar(self, argv: List[str], origen: str) -> Solicitud:
+        reporte.parsear_argumentos(argv)  # SystemExit si los argumentos no son válidos
+        solicitud = Solicitud(argv, origen)
+        self._cola.put(solicitud)
+        logger.info(f"📥 Ejecución {solicitud.id} encolada ({origen}) args={argv}")
+        return solicitud
+
+    def _trabajador(self) -> None:
+        while True:
+            solicitud = self._cola.get()
+            if solicitud is None:
+                return
+            self.en_curso = solicitud
+            solicitud.inicio = datetime.now()
+            solicitud.estado = "ejecutando"
+            inicio = time.perf_counter()
+            try:
+                exito = reporte.main(solicitud.argv, fuente=self.fuente)
+                solicitud.estado = "ok" if exito is not False else "fallida"
+            except Exception as e:
+                logger.exception(f"❌ Error en la ejecución {solicitud.id}")
+                solicitud.estado = "error"
+                solicitud.detalle = str(e)
+            solicitud.segundos = time.perf_counter() - inicio
+            self.en_curso = None
+            self.historial.append(solicitud)
+            solicitud.terminada.set()
+            logger.info(f"🏁 Ejecución {solicitud.id}: {solicitud.estado} en {solicitud.segundos:.1f}s")
+
+    def _planificador(self) -> None:
+        while not self._detener.is_set():
+            self.proxima = proxima_ejecucion(self.horarios, datetime.now())
+            logger.info(f"⏰ Próxima ejecución programada: {self.proxima.isoformat(timespec='minutes')}")
+            # Espera en tramos cortos para seguir cambios de hora del sistema
+            while not self._detener.is_set() and datetime.now() < self.proxima:
+                self._detener.wait(min(60.0, max(0.0, (self.proxima - datetime.now()).total_seconds())))
+            if not self._detener.is_set():
+                try:
+                    self.encolar(list(self.argumentos), "horario")
+                except (SystemExit, Exception) as e:
+                    # Un error al encolar no debe terminar el hilo: se intenta en el próximo horario
+                    logger.error(f"❌ No se pudo encolar la ejecución programada: {e!r}")
+                    self._detener.wait(60.0)
+
+    def estado(self) -> Dict[str, Any]:
+        return {
+            "proxima": self.proxima.isoformat(timespec="minutes") if self.proxima else None,
+            "horarios": [h.expresion for h in self.horarios],
+            "en_curso": self.en_curso.a_dict() if self.en_curso else None,
+            "pendientes": self._cola.qsize(),
+            "historial": [s.a_dict() for s in reversed(self.historial)],
+        }
+
+    # --- Control HTTP ---
+
+    def _crear_manejador(self):
+        daemon = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def _responder(self, codigo: int, cuerpo: Dict[str, Any]) -> None:
+                datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+                self.send_response(codigo)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def _autorizado(self) -> bool:
+                # Comparación en tiempo constante; en bytes, para que un encabezado no ASCII no lance TypeError
+                if not hmac.compare_digest(self.headers.get("X-Token", "").encode("utf-8"), daemon.token.encode("utf-8")):
+                    self._responder(401, {"error": "token inválido"})
+                    return False
+                return True
+
+            def do_GET(self):
+                ruta = urlparse(self.path).path
+                if ruta == "/salud":
+                    self._responder(200, {"estado": "ok"})
+                elif ruta == "/estado":
+                    if self._autorizado():
+                        self._responder(200, daemon.estado())
+                else:
+                    self._responder(404, {"error": f"ruta no encontrada: {ruta}"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != "/ejecutar":
+                    self._responder(404, {"error": f"ruta no encontrada: {url.path}"})
+                    return
+                if not self._autorizado():
+                    return
+                largo = int(self.headers.get("Content-Length") or 0)
+                try:
+                    cuerpo = json.loads(self.rfile.read(largo) or b"{}")
+                    argv = [str(a) for a in cuerpo.get("args", [])]
+                    solicitud = daemon.encolar(argv, "http")
+                except SystemExit:
+                    self._responder(400, {"error": "argumentos inválidos para main.py"})
+                    return
+                except (ValueError, AttributeError) as e:
+                    self._responder(400, {"error": f"solicitud inválida: {e}"})
+                    return
+                if parse_qs(url.query).get("esperar", ["0"])[0] in ("1", "true"):
+                    # Con tope: si la ejecución sigue, se responde 202 y el resultado queda en /estado
+                    terminada = solicitud.terminada.wait(daemon.espera_max)
+                    self._responder(200 if terminada else 202, solicitud.a_dict())
+                else:
+                    self._responder(202, solicitud.a_dict())
+
+            def log_message(self, formato, *args):
+                logger.info(f"🌐 {self.address_string()} {formato % args}")
+
+        return Manejador
+
+    # --- Ciclo de vida ---
+
+    def iniciar(self) -> None:
+        self.calentar()
+        self._servidor = ThreadingHTTPServer((self.host, self.puerto), self._crear_manejador())
+        self._servidor.daemon_threads = True
+        self._hilos = [
+            threading.Thread(target=self._trabajador, name="daemon-trabajador", daemon=True),
+            threading.Thread(target=self._planificador, name="daemon-planificador", daemon=True),
+            threading.Thread(target=self._servidor.serve_forever, name="daemon-http", daemon=True),
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+        logger.info(f"🚀 Daemon escuchando en http://{self.host}:{self._servidor.server_address[1]}")
+
+    def detener(self) -> None:
+        logger.info("🛑 Deteniendo el daemon...")
+        self._detener.set()
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+        self._cola.put(None)  # termina el trabajador después de la ejecución en curso
+        self._hilos[0].join()
+        if self.fuente is not None:
+            self.fuente.cerrar()
+
+    def esperar(self) -> None:
+        self._detener.wait()
+
+
+def parsear_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Daemon del reporte diario (horarios cron y ejecución a pedido)")
+    parser.add_argument("--host", default=DAEMON_CONFIG['host'])
+    parser.add_argument("--puerto", type=int, default=DAEMON_CONFIG['puerto'])
+    parser.add_argument("--horario", action="append", help="Expresión cron (repetible); reemplaza DAEMON_CONFIG['horarios']")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parsear_argumentos(argv)
+    main_loger()
+    try:
+        daemon = DaemonReporte(
+            horarios=args.horario or DAEMON_CONFIG['horarios'],
+            argumentos=DAEMON_CONFIG['argumentos'],
+            host=args.host,
+            puerto=args.puerto,
+            tamanio_pool=DAEMON_CONFIG['pool_conexiones'],
+            token=DAEMON_CONFIG['token'],
+            espera_max=DAEMON_CONFIG['espera_max_segundos'],
+        )
+    except (ValueError, SystemExit) as e:
+        raise SystemExit(f"❌ Configuración del daemon inválida: {e}")
+    daemon.iniciar()
+    signal.signal(signal.SIGTERM, lambda *_: daemon._detener.set())
+    try:
+        daemon.esperar()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.detener()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 from datetime import datetime, date
 import pandas as pd
 from typing import Union
+from utils.fechas import filtrar_por_fecha
 import logging
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -11,27 +12,28 @@ def generar_reporte_diario_und_pollos(df_und_google: pd.DataFrame,df_ventas_odo_
  
     Parámetros:
     ----------
-    df_und_google: DataFrame del reporte de stock de google sheet (unidades de pollo)
+    df_und_google: DataFrame del reporte de stock de google sheet (unidades de pollo),
+        indexado por 'Fecha' (salida de `transformar_df_sheet_google`)
     
     df_ventas_odoo: DataFrame de ventas de Odoo por producto del último día
 
     fecha_objetivo : str, datetime.date o None (opcional)
-        Fecha que se desea analizar. Si no se proporciona, se usará la última fecha disponible en los datos de ventas.
+        Fecha que se desea analizar. Si no se proporciona, se usará la última fecha disponible en el stock.
 
     Retorna:
     -------
-    tuple:
-        - df_2_merged : pd.DataFrame
-            DataFrame con resumen de stock, ingresos, ventas y última hora de compra por producto.
-        - comentario_und_pollos : str
-            Comentario resumen con el total de unidades vendidas ese día.
+    pd.DataFrame
+        DataFrame con resumen de stock, ingresos, ventas y última hora de compra por producto.
+        El total de unidades vendidas del día es el KPI 'und_vendidas' de `data/kpis.py`.
     """
     # Leer los datos
     df_2 = df_und_google
     df_ventas_producto = df_ventas_odo_lastday
 
-    # Filtrar por la fecha objetivo
-    df_2 = df_2[df_2['Fecha'] == fecha_objetivo]
+    # Filtrar por la fecha objetivo (búsqueda binaria sobre el índice de fechas)
+    if fecha_objetivo is None:
+        fecha_objetivo = df_2.index.max()
+    df_2 = filtrar_por_fecha(df_2, fecha_objetivo)
     # Hacer merge por producto y fecha
     df_2_merged = df_2.merge(
         df_ventas_producto[['ProductoNombre', 'AsientoCreadoEl_Hora']],
@@ -48,10 +50,4 @@ def generar_reporte_diario_und_pollos(df_und_google: pd.DataFrame,df_ventas_odo_
     df_2_merged = df_2_merged.sort_values(by=['Producto', 'Última Compra (hh:mm)'], ascending=True)
     df_2_merged = df_2_merged.drop_duplicates(subset=['Producto'], keep='last')
 
-    # Sumar ventas
-    und_vendidas_pollos = df_2_merged["Ventas"].sum()
-
-    # Comentario resumen
-    comentario_und_pollos = f"{und_vendidas_pollos:,.0f} UND"
-
-    return df_2_merged, comentario_und_pollos
\ No newline at end of file
+    return df_2_merged
\ No newline at end of file
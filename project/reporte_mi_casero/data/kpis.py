@@ -0,0 +1,162 @@
+# Motor de KPIs: métricas declaradas como expresiones sobre las fuentes tipadas, en una pasada por fuente
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Union
+import numpy as np
+import pandas as pd
+import logging
+
+from utils.cache_render import CacheRender
+from utils.fechas import normalizar_fecha
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Fuentes sobre las que se declaran los agregados, con sus columnas tipadas (las del SP, antes de format_table):
+#   'excluir'    filas que no son datos (la fila 'Total' que agregan los SP)
+#   'derivadas'  columnas por fila calculadas una vez con `DataFrame.eval`
+#   'fecha'      columna (o nivel del índice) de fecha: habilita las dimensiones 'dia' y 'semana'
+#   'dimensiones' dimensión -> columna de la fuente
+FUENTES_KPI = {
+    'ventas_x_sku': {
+        'excluir': {'Categoria': 'Total'},
+        'dimensiones': {'categoria': 'Categoria', 'tienda': 'Tienda', 'dia': 'Fecha'},
+    },
+    'stock': {  # resumen de `transformar_df_sheet_google`, indexado por 'Fecha'
+        'fecha': 'Fecha',
+        'dimensiones': {'tienda': 'Tienda'},
+    },
+}
+
+# Agregados: nombre -> fuente, columna y función. Todos los de una fuente salen del mismo groupby
+AGREGADOS = {
+    'ventas': {'fuente': 'ventas_x_sku', 'columna': 'VentaSoles', 'funcion': 'sum'},
+    'kg': {'fuente': 'ventas_x_sku', 'columna': 'Cantidad', 'funcion': 'sum'},
+    'und_vendidas': {'fuente': 'stock', 'columna': 'Ventas', 'funcion': 'sum'},
+}
+
+# KPIs: expresión sobre los agregados (`DataFrame.eval`) y formato para el correo
+KPIS = {
+    'ventas_totales': {'expresion': 'ventas', 'formato': 'S/ {:,.0f}'},
+    'kg_totales': {'expresion': 'kg', 'formato': '{:,.0f} kg'},
+    'precio_promedio': {'expresion': 'ventas / kg', 'formato': 'S/ {:,.2f}'},
+    'und_vendidas': {'expresion': 'und_vendidas', 'formato': '{:,.0f} UND'},
+}
+
+
+def _preparar_fuente(df: pd.DataFrame, spec: Dict[str, Any], columnas: Iterable[str]) -> pd.DataFrame:
+    """ Solo las columnas que usan los agregados, sin filas excluidas, con derivadas y fecha como columnas """
+    if spec.get('fecha') and spec['fecha'] in (df.index.names or []):
+        df = df.reset_index(spec['fecha'])
+    mascara = np.ones(len(df), dtype=bool)
+    for columna, valor in spec.get('excluir', {}).items():
+        if columna in df.columns:
+            mascara &= (df[columna] != valor).to_numpy(dtype=bool, na_value=True)
+    if not mascara.all():
+        df = df.loc[mascara]
+    derivadas = spec.get('derivadas', {})
+    base = df[[c for c in columnas if c in df.columns and c not in derivadas]]
+    calculadas = {nombre: df.eval(expresion) for nombre, expresion in derivadas.items() if nombre in columnas}
+    return base.assign(**calculadas) if calculadas else base
+
+
+class MotorKPIs:
+    """
+    Calcula todos los KPIs declarados en una pasada por fuente: los agregados de una misma fuente
+    comparten un único `groupby` por dimensión ('dia', 'semana', 'categoria', 'tienda' o None para
+    el total) y los KPIs se evalúan como expresiones sobre la tabla chica de agregados. Sumar un KPI
+    no agrega otra lectura de los datos.
+
+    Los resultados quedan en cache por huella de las fuentes y dimensión: perfiles o tiendas con
+    los mismos datos reutilizan el cálculo. La cache es un LRU de `max_entradas`: `motor_kpis`
+    vive lo que el proceso, y en el daemon cada día trae fuentes nuevas.
+    """
+
+    def __init__(self, kpis: Optional[Dict[str, dict]] = None, agregados: Optional[Dict[str, dict]] = None,
+                 fuentes: Optional[Dict[str, dict]] = None, max_entradas: int = 32):
+        self.kpis = kpis or KPIS
+        self.agregados = agregados or AGREGADOS
+        self.fuentes = fuentes or FUENTES_KPI
+        self.cache = CacheRender(max_entradas)
+
+    def _agregados_por_fuente(self, disponibles: Iterable[str]) -> Dict[str, Dict[str, dict]]:
+        por_fuente: Dict[str, Dict[str, dict]] = {}
+        for nombre, agregado in self.agregados.items():
+            if agregado['fuente'] in disponibles:
+                por_fuente.setdefault(agregado['fuente'], {})[nombre] = agregado
+        return por_fuente
+
+    def _columna_dimension(self, fuente: str, dimension: str) -> Optional[str]:
+        spec = self.fuentes[fuente]
+        if dimension in ('dia', 'semana') and spec.get('fecha'):
+            return spec['fecha']
+        return spec.get('dimensiones', {}).get(dimension)
+
+    def _agregar(self, fuente: str, df: pd.DataFrame, agregados: Dict[str, dict], dimension: Optional[str]) -> Optional[pd.DataFrame]:
+        columna_dim = self._columna_dimension(fuente, dimension) if dimension else None
+        if dimension and columna_dim is None:
+            return None
+        columnas = {a['columna'] for a in agregados.values()} | ({columna_dim} if columna_dim else set())
+        base = _preparar_fuente(df, self.fuentes[fuente], columnas)
+        if dimension is None:
+            return pd.DataFrame({nombre: [base[a['columna']].agg(a['funcion'])] if a['columna'] in base else [np.nan]
+                                 for nombre, a in agregados.items()})
+        if columna_dim not in base.columns:
+            return None
+        clave = base[columna_dim]
+        if dimension == 'semana' and pd.api.types.is_datetime64_any_dtype(clave):
+            iso = clave.dt.isocalendar()
+            clave = (iso['year'] * 100 + iso['week']).astype('int64')
+        elif dimension == 'dia':
+            clave = pd.to_datetime(clave).dt.normalize()
+        presentes = {n: a for n, a in agregados.items() if a['columna'] in base.columns}
+        # Un solo groupby por fuente: la factorización de la clave se comparte entre todos los agregados
+        tabla = base.groupby(clave.rename(dimension), sort=True, observed=True).agg(
+            **{n: (a['columna'], a['funcion']) for n, a in presentes.items()})
+        return tabla.reindex(columns=list(agregados))
+
+    def _calcular(self, dataframes: Dict[str, pd.DataFrame], dimension: Optional[str]) -> pd.DataFrame:
+        partes = [self._agregar(fuente, dataframes[fuente], agregados, dimension)
+                  for fuente, agregados in self._agregados_por_fuente(dataframes).items()
+                  if not dataframes[fuente].empty]
+        partes = [p for p in partes if p is not None]
+        if not partes:
+            return pd.DataFrame(columns=list(self.kpis))
+        tabla = pd.concat(partes, axis=1).reindex(columns=list(self.agregados))
+        tabla = tabla.astype(float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            resultado = pd.DataFrame({nombre: tabla.eval(kpi['expresion']) for nombre, kpi in self.kpis.items()},
+                                     index=tabla.index)
+        return resultado.replace([np.inf, -np.inf], np.nan)
+
+    def calcular(self, dataframes: Dict[str, pd.DataFrame], dimension: Optional[str] = None) -> pd.DataFrame:
+        """
+        KPIs por valor de `dimension` (una fila por día, semana, categoría o tienda) o una sola fila
+        con el total si `dimension` es None. `dataframes`: fuente -> DataFrame (las de `FUENTES_KPI`);
+        los KPIs de fuentes ausentes quedan en NaN.
+        """
+        nombres = sorted(n for n in dataframes if n in self.fuentes)
+        return self.cache.obtener(f"kpis.{dimension or 'total'}.{'+'.join(nombres)}",
+                                  [dataframes[n] for n in nombres],
+                                  lambda: self._calcular({n: dataframes[n] for n in nombres}, dimension))
+
+    def valores(self, dataframes: Dict[str, pd.DataFrame], dimension: Optional[str] = None,
+                clave: Union[None, str, date] = None) -> Dict[str, float]:
+        """ KPIs del total (o de la fila `clave` de la dimensión) como diccionario """
+        tabla = self.calcular(dataframes, dimension)
+        if dimension == 'dia' and clave is not None:
+            clave = pd.Timestamp(normalizar_fecha(clave))
+        if dimension is None:
+            fila = tabla.iloc[0] if len(tabla) else pd.Series(np.nan, index=tabla.columns)
+        elif clave in tabla.index:
+            fila = tabla.loc[clave]
+        else:
+            fila = pd.Series(np.nan, index=tabla.columns)
+        return fila.to_dict()
+
+    def formatear(self, valores: Dict[str, float], nombres: Optional[List[str]] = None) -> Dict[str, str]:
+        """ Valores con el formato declarado de cada KPI ('-' si no hay dato) """
+        return {n: self.kpis[n]['formato'].format(valores[n]) if pd.notna(valores.get(n)) else "-"
+                for n in (nombres or self.kpis)}
+
+
+motor_kpis = MotorKPIs()
@@ -0,0 +1,258 @@
+# Análisis de quiebres de stock sobre el historial diario del formulario de movimientos
+import os
+from collections import deque
+from datetime import date, timedelta
+from typing import Deque, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+import logging
+
+from utils.fechas import normalizar_fecha
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+ARCHIVO_HISTORIAL = "historial_quiebres.parquet"
+ARCHIVO_STOCK = "stock_final.parquet"
+
+# (fecha, presencia, ventas, quiebre, pérdida estimada) de un día, alineados con EstadoQuiebres.skus.
+# `presencia` es 1 para los SKUs con fila ese día: los ausentes no suman días observados ni días con stock
+_Dia = Tuple[date, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+class _Ventana:
+    """ Sumas por SKU de los días dentro de una ventana móvil de `dias` días calendario """
+
+    def __init__(self, dias: int, n_skus: int):
+        self.dias = dias
+        self.entradas: Deque[_Dia] = deque()
+        self.observados = np.zeros(n_skus)
+        self.quiebres = np.zeros(n_skus)
+        self.ventas = np.zeros(n_skus)
+        self.ventas_disponible = np.zeros(n_skus)  # Ventas de los días sin quiebre (demanda observada)
+        self.dias_disponible = np.zeros(n_skus)
+        self.perdidas = np.zeros(n_skus)
+
+    def _aplicar(self, dia: _Dia, signo: int) -> None:
+        _, presencia, ventas, quiebre, perdida = dia
+        disponible = presencia * (1 - quiebre)
+        self.observados += signo * presencia
+        self.quiebres += signo * presencia * quiebre
+        self.ventas += signo * presencia * ventas
+        self.ventas_disponible += signo * ventas * disponible
+        self.dias_disponible += signo * disponible
+        self.perdidas += signo * presencia * perdida
+
+    def agregar(self, dia: _Dia) -> None:
+        self.entradas.append(dia)
+        self._aplicar(dia, +1)
+        limite = dia[0] - timedelta(days=self.dias)
+        while self.entradas and self.entradas[0][0] <= limite:
+            self._aplicar(self.entradas.popleft(), -1)
+
+    def retirar_ultimo(self) -> None:
+        """ Deshace el último `agregar` (los días que este sacó de la ventana ya no vuelven a entrar) """
+        self._aplicar(self.entradas.pop(), -1)
+
+    def ampliar(self, n_nuevos: int) -> None:
+        """ Agrega SKUs nuevos (sin historia: ausentes en los días ya incorporados) al final """
+        for nombre in ("observados", "quiebres", "ventas", "ventas_disponible", "dias_disponible", "perdidas"):
+            setattr(self, nombre, np.concatenate([getattr(self, nombre), np.zeros(n_nuevos)]))
+        self.entradas = deque((f, *(np.concatenate([a, np.zeros(n_nuevos)]) for a in arrays)) for f, *arrays in self.entradas)
+
+    def demanda_diaria(self) -> np.ndarray:
+        """ Venta promedio de los días con stock; si todos fueron quiebres, la de todos los días """
+        con_stock = np.divide(self.ventas_disponible, self.dias_disponible,
+                              out=np.zeros_like(self.ventas), where=self.dias_disponible > 0)
+        todos = np.divide(self.ventas, self.observados, out=np.zeros_like(self.ventas), where=self.observados > 0)
+        return np.where(self.dias_disponible > 0, con_stock, todos)
+
+
+class EstadoQuiebres:
+    """
+    Agregados incrementales de quiebres de stock por SKU en ventanas móviles (por defecto 7/28/90 días).
+
+    Cada día nuevo del resumen de `transformar_df_sheet_google` se incorpora en O(SKUs): se suma a
+    cada ventana y se restan los días que salen de ella, sin recorrer el historial. Un día es quiebre
+    si su 'Stock Final' es <= `umbral`; la venta perdida estimada de ese día es la demanda diaria
+    (venta promedio de los días con stock en `ventana_demanda`, calculada antes de agregarlo)
+    menos lo vendido. Los días de cobertura son el último stock final sobre esa demanda.
+
+    El estado se guarda como los últimos `max(ventanas)` días por SKU (`historial_quiebres.parquet`);
+    al cargarlo se rearman las sumas de las ventanas, con un costo acotado por la ventana mayor y no
+    por el largo del historial.
+    """
+
+    def __init__(self, ventanas: Sequence[int] = (7, 28, 90), umbral: float = 0, ventana_demanda: int = 28):
+        if ventana_demanda not in ventanas:
+            raise ValueError(f"ventana_demanda ({ventana_demanda}) debe ser una de las ventanas {list(ventanas)}")
+        self.ventanas: Dict[int, _Ventana] = {d: _Ventana(d, 0) for d in sorted(ventanas)}
+        self.umbral = umbral
+        self.ventana_demanda = ventana_demanda
+        self.skus: List[str] = []
+        self._indice: Dict[str, int] = {}
+        self.stock_final = np.zeros(0)
+        self.ultima_fecha: Optional[date] = None
+
+    # --- Actualización ---
+
+    def _alinear(self, productos: Sequence[str]) -> np.ndarray:
+        """ Posición de cada producto en `skus`, agregando los que no existían """
+        nuevos = [p for p in dict.fromkeys(productos) if p not in self._indice]
+        if nuevos:
+            for p in nuevos:
+                self._indice[p] = len(self.skus)
+                self.skus.append(p)
+            for ventana in self.ventanas.values():
+                ventana.ampliar(len(nuevos))
+            self.stock_final = np.concatenate([self.stock_final, np.full(len(nuevos), np.nan)])
+        return np.fromiter((self._indice[p] for p in productos), dtype=int, count=len(productos))
+
+    def agregar_dia(self, fecha, productos: Sequence[str], ventas: Sequence[float], stock_final: Sequence[float]) -> None:
+        """ Incorpora un día (una fila por producto); los días deben llegar en orden """
+        fecha = normalizar_fecha(fecha)
+        if self.ultima_fecha is not None and fecha <= self.ultima_fecha:
+            raise ValueError(f"El día {fecha} no es posterior al último incorporado ({self.ultima_fecha})")
+        posiciones = self._alinear(list(productos))
+        n = len(self.skus)
+        presencia = np.zeros(n)
+        ventas_dia = np.zeros(n)
+        quiebre = np.zeros(n)
+        presencia[posiciones] = 1.0
+        ventas_dia[posiciones] = np.asarray(ventas, dtype=float)
+        stock = np.asarray(stock_final, dtype=float)
+        quiebre[posiciones] = (stock <= self.umbral).astype(float)
+        self.stock_final[posiciones] = stock
+
+        demanda = self.ventanas[self.ventana_demanda].demanda_diaria()
+        perdida = np.where(quiebre > 0, np.maximum(demanda - ventas_dia, 0.0), 0.0)
+        dia = (fecha, presencia, ventas_dia, quiebre, perdida)
+        for ventana in self.ventanas.values():
+            ventana.agregar(dia)
+        self.ultima_fecha = fecha
+
+    def retirar_ultimo_dia(self) -> None:
+        """ Deshace el último día incorporado, para volver a agregarlo con datos corregidos """
+        if self.ultima_fecha is None:
+            return
+        for ventana in self.ventanas.values():
+            ventana.retirar_ultimo()
+        entradas = self.ventanas[max(self.ventanas)].entradas
+        self.ultima_fecha = entradas[-1][0] if entradas else None
+
+    def actualizar(self, df_resumen: pd.DataFrame, hasta: Union[str, date, None] = None) -> int:
+        """
+        Incorpora los días de `df_resumen` (índice 'Fecha', columnas 'Producto', 'Ventas',
+        'Stock Final') desde el último ya incorporado y hasta `hasta` inclusive. El último día
+        se vuelve a aplicar: el formulario de ese día pudo completarse o corregirse después.
+        Devuelve la cantidad de días agregados (incluido el reaplicado).
+        """
+        if df_resumen.empty:
+            return 0
+        inicio = pd.Timestamp(self.ultima_fecha) if self.ultima_fecha else None
+        fin = pd.Timestamp(normalizar_fecha(hasta)) if hasta is not None else None
+        nuevos = df_resumen.loc[inicio:fin]
+        dias = 0
+        for fecha, grupo in nuevos.groupby(level="Fecha", sort=True):
+            if fecha.date() == self.ultima_fecha:
+                self.retirar_ultimo_dia()
+            self.agregar_dia(fecha.date(), grupo["Producto"].tolist(), grupo["Ventas"].to_numpy(), grupo["Stock Final"].to_numpy())
+            dias += 1
+        if dias:
+            logger.info(f"📉 Quiebres: {dias} días incorporados hasta el {self.ultima_fecha} ({len(self.skus)} SKUs)")
+        return dias
+
+    # --- Resultados ---
+
+    def resumen(self) -> pd.DataFrame:
+        """ Métricas por SKU: frecuencia de quiebre y venta perdida por ventana, y días de cobertura """
+        datos = {"Producto": self.skus}
+        for dias, ventana in self.ventanas.items():
+            datos[f"Quiebres {dias}d"] = ventana.quiebres.astype(int)
+            datos[f"Días {dias}d"] = ventana.observados.astype(int)
+        demanda = self.ventanas[self.ventana_demanda].demanda_diaria()
+        datos["Demanda diaria"] = demanda
+        datos["Días de cobertura"] = np.divide(self.stock_final, demanda, out=np.full(len(self.skus), np.inf), where=demanda > 0)
+        for dias, ventana in self.ventanas.items():
+            datos[f"Venta perdida {dias}d"] = ventana.perdidas
+        return pd.DataFrame(datos)
+
+    def tabla(self, top: int = 10) -> pd.DataFrame:
+        """ SKUs con quiebres en la ventana mayor, ordenados por venta perdida estimada, listos para el correo """
+        df = self.resumen()
+        mayor = max(self.ventanas)
+        df = df[df[f"Quiebres {mayor}d"] > 0]
+        df = df.sort_values([f"Venta perdida {self.ventana_demanda}d", f"Quiebres {mayor}d"], ascending=False).head(top)
+        tabla = pd.DataFrame({"Producto": df["Producto"]})
+        for dias in self.ventanas:
+            tabla[f"Quiebres {dias}d"] = [f"{q}/{n}" for q, n in zip(df[f"Quiebres {dias}d"], df[f"Días {dias}d"])]
+        tabla["Cobertura (días)"] = [("—" if not np.isfinite(c) else f"{c:,.1f}") for c in df["Días de cobertura"]]
+        for dias in self.ventanas:
+            tabla[f"Venta perdida {dias}d (UND)"] = [f"{v:,.0f}" for v in df[f"Venta perdida {dias}d"]]
+        return tabla.reset_index(drop=True)
+
+    # --- Persistencia ---
+
+    def guardar(self, directorio: str) -> str:
+        os.makedirs(directorio, exist_ok=True)
+        skus = np.array(self.skus, dtype=object)
+        filas = []
+        # Solo los SKUs presentes cada día: al cargar, la presencia sale de las filas
+        for fecha, presencia, ventas, quiebre, perdida in self.ventanas[max(self.ventanas)].entradas:
+            mascara = presencia > 0
+            filas.append(pd.DataFrame({"Fecha": pd.Timestamp(fecha), "Producto": skus[mascara], "Ventas": ventas[mascara],
+                                       "Quiebre": quiebre[mascara].astype(bool), "Perdida": perdida[mascara]}))
+        historial = pd.concat(filas, ignore_index=True) if filas else pd.DataFrame(columns=["Fecha", "Producto", "Ventas", "Quiebre", "Perdida"])
+        ruta = os.path.join(directorio, ARCHIVO_HISTORIAL)
+        ruta_stock = os.path.join(directorio, ARCHIVO_STOCK)
+        historial.to_parquet(f"{ruta}.tmp", index=False)
+        pd.DataFrame({"Producto": self.skus, "Stock Final": self.stock_final}).to_parquet(f"{ruta_stock}.tmp", index=False)
+        os.replace(f"{ruta_stock}.tmp", ruta_stock)
+        os.replace(f"{ruta}.tmp", ruta)
+        return ruta
+
+    @classmethod
+    def cargar(cls, directorio: str, ventanas: Sequence[int] = (7, 28, 90), umbral: float = 0,
+               ventana_demanda: int = 28) -> Optional["EstadoQuiebres"]:
+        """ Estado guardado por `guardar`, o None si no existe """
+        ruta = os.path.join(directorio, ARCHIVO_HISTORIAL)
+        if not os.path.exists(ruta):
+            return None
+        estado = cls(ventanas, umbral, ventana_demanda)
+        historial = pd.read_parquet(ruta)
+        stock = pd.read_parquet(os.path.join(directorio, ARCHIVO_STOCK))
+        estado._alinear(stock["Producto"].tolist())
+        estado.stock_final = np.array(stock["Stock Final"], dtype=float)
+        for fecha, grupo in historial.groupby("Fecha", sort=True):
+            posiciones = estado._alinear(grupo["Producto"].tolist())
+            n = len(estado.skus)
+            presencia = np.zeros(n)
+            presencia[posiciones] = 1.0
+            arrays = [np.zeros(n) for _ in range(3)]
+            for array, columna in zip(arrays, ("Ventas", "Quiebre", "Perdida")):
+                array[posiciones] = grupo[columna].to_numpy(dtype=float)
+            dia = (fecha.date(), presencia, *arrays)
+            for ventana in estado.ventanas.values():
+                ventana.agregar(dia)
+            estado.ultima_fecha = fecha.date()
+        return estado
+
+
+def analizar_quiebres(df_resumen: pd.DataFrame, fecha, directorio: Optional[str] = None,
+                      ventanas: Sequence[int] = (7, 28, 90), umbral: float = 0,
+                      ventana_demanda: int = 28, persistir: bool = True) -> EstadoQuiebres:
+    """
+    Estado de quiebres al día `fecha`. Si hay un estado guardado en `directorio` que no pasa de
+    `fecha`, solo se le agregan los días nuevos; si no (primera ejecución o reporte de una fecha
+    pasada), se arma desde el historial completo de `df_resumen`.
+    """
+    fecha = normalizar_fecha(fecha)
+    estado = EstadoQuiebres.cargar(directorio, ventanas, umbral, ventana_demanda) if directorio else None
+    if estado is not None and estado.ultima_fecha is not None and estado.ultima_fecha > fecha:
+        logger.info(f"📉 El estado de quiebres llega al {estado.ultima_fecha}, posterior al {fecha}: se recalcula sin guardar")
+        estado, persistir = None, False
+    if estado is None:
+        estado = EstadoQuiebres(ventanas, umbral, ventana_demanda)
+    if estado.actualizar(df_resumen, hasta=fecha) and persistir and directorio:
+        estado.guardar(directorio)
+    return estado
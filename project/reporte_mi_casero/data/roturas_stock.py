@@ -0,0 +1,244 @@
+# Cruce del formulario de roturas de stock con las ventas por SKU y el stock diario del formulario de movimientos
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import logging
+
+from utils.fechas import parsear_fechas
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Columnas canónicas del formulario de roturas -> encabezado en la hoja
+COLUMNAS_ROTURA = {
+    'fecha': 'Fecha',
+    'tienda': 'Tienda',
+    'producto': 'Producto',
+    'inicio': 'Hora de quiebre',
+    'fin': 'Hora de reposición',
+}
+
+_DIA = np.timedelta64(1, "D")
+
+
+def _horas(s: pd.Series) -> np.ndarray:
+    """ 'HH:MM' o 'HH:MM:SS' -> horas decimales (NaN si está vacía o es inválida) """
+    texto = s.astype(str).str.strip()
+    texto = texto.where(texto.str.count(":") != 1, texto + ":00")
+    return (pd.to_timedelta(texto, errors="coerce") / pd.Timedelta(hours=1)).to_numpy(dtype=float)
+
+
+def horas_atencion(hora_apertura: str, hora_cierre: str) -> float:
+    apertura, cierre = _horas(pd.Series([hora_apertura, hora_cierre]))
+    return float(cierre - apertura)
+
+
+def preparar_form_rotura(df: pd.DataFrame, columnas: Optional[Dict[str, str]] = None,
+                         hora_apertura: str = "08:00", hora_cierre: str = "22:00") -> pd.DataFrame:
+    """
+    Normaliza el formulario de roturas a un evento por fila con 'Fecha' (datetime64 a medianoche),
+    'Tienda' (si el formulario la tiene), 'Producto', 'Inicio' y 'Fin' (horas decimales) y 'Horas'.
+
+    Sin hora de quiebre se asume la apertura y sin reposición el cierre; los eventos se recortan
+    al horario de atención. Se descartan filas sin fecha o producto y con reposición anterior al quiebre.
+    """
+    columnas = {**COLUMNAS_ROTURA, **(columnas or {})}
+    if df.empty:
+        return pd.DataFrame(columns=["Fecha", "Producto", "Inicio", "Fin", "Horas"])
+    faltantes = [columnas[c] for c in ("fecha", "producto") if columnas[c] not in df.columns]
+    if faltantes:
+        raise KeyError(f"El formulario de roturas no tiene las columnas {faltantes}")
+
+    apertura, cierre = _horas(pd.Series([hora_apertura, hora_cierre]))
+    eventos = pd.DataFrame({"Fecha": parsear_fechas(df[columnas['fecha']])})
+    if columnas['tienda'] in df.columns:
+        eventos["Tienda"] = df[columnas['tienda']].astype(str).str.strip().to_numpy()
+    eventos["Producto"] = df[columnas['producto']].astype(str).str.strip().to_numpy()
+    inicio = _horas(df[columnas['inicio']]) if columnas['inicio'] in df.columns else np.full(len(df), np.nan)
+    fin = _horas(df[columnas['fin']]) if columnas['fin'] in df.columns else np.full(len(df), np.nan)
+    eventos["Inicio"] = np.clip(np.where(np.isnan(inicio), apertura, inicio), apertura, cierre)
+    eventos["Fin"] = np.clip(np.where(np.isnan(fin), cierre, fin), apertura, cierre)
+    eventos["Horas"] = eventos["Fin"] - eventos["Inicio"]
+
+    validos = eventos["Fecha"].notna() & (eventos["Producto"] != "") & (eventos["Horas"] >= 0)
+    descartados = int((~validos).sum())
+    if descartados:
+        logger.warning(f"⚠️ {descartados} fila(s) del formulario de roturas sin fecha/producto o con reposición anterior al quiebre fueron descartadas.")
+    eventos = eventos[validos.to_numpy()].reset_index(drop=True)
+    logger.info(f"✅ Formulario de roturas preparado: {len(eventos)} eventos")
+    return eventos
+
+
+class IndiceOrdenado:
+    """
+    Búsqueda de filas por clave compuesta codificada como entero: las claves se ordenan una
+    vez y cada consulta es un `searchsorted` vectorizado (sin `merge`). Devuelve -1 si no hay fila.
+    """
+
+    def __init__(self, claves: np.ndarray):
+        self._orden = np.argsort(claves, kind="stable")
+        self._claves = claves[self._orden]
+
+    def buscar(self, claves: np.ndarray) -> np.ndarray:
+        if not len(self._claves):
+            return np.full(len(claves), -1)
+        posiciones = np.minimum(np.searchsorted(self._claves, claves), len(self._claves) - 1)
+        return np.where(self._claves[posiciones] == claves, self._orden[posiciones], -1)
+
+
+class _Codificador:
+    """
+    Códigos enteros comunes a varias tablas: grupo (tienda, producto) y día desde la primera fecha.
+    Cada columna de clave se factoriza una sola vez sobre todas las tablas concatenadas.
+    """
+
+    def __init__(self, tablas: Sequence[pd.DataFrame], con_tienda: bool):
+        largos = np.cumsum([0] + [len(t) for t in tablas])
+        producto, productos = pd.factorize(np.concatenate([t["Producto"].to_numpy(dtype=object) for t in tablas]))
+        self.n_productos = len(productos)
+        if con_tienda:
+            tienda, tiendas = pd.factorize(np.concatenate([t["Tienda"].to_numpy(dtype=object) for t in tablas]))
+            self.n_tiendas = len(tiendas)
+        else:
+            tienda, self.n_tiendas = np.zeros(len(producto), dtype=np.int64), 1
+        dias = np.concatenate([t["Fecha"].to_numpy(dtype="datetime64[D]") for t in tablas])
+        dia_min = dias.min()
+        self.n_dias = int((dias.max() - dia_min) / _DIA) + 1
+        dia = ((dias - dia_min) / _DIA).astype(np.int64)
+        grupo = tienda.astype(np.int64) * self.n_productos + producto
+        self.tiendas = [tienda[a:b] for a, b in zip(largos[:-1], largos[1:])]
+        self.grupos = [grupo[a:b] for a, b in zip(largos[:-1], largos[1:])]
+        self.dias = [dia[a:b] for a, b in zip(largos[:-1], largos[1:])]
+
+    @property
+    def n_grupos(self) -> int:
+        return self.n_tiendas * self.n_productos
+
+    def clave(self, i: int) -> np.ndarray:
+        """ Clave (grupo, día) de la tabla `i` como un único entero """
+        return self.grupos[i] * self.n_dias + self.dias[i]
+
+    def matriz(self, i: int, valores=True) -> np.ndarray:
+        """ Matriz grupos x días: suma de `valores` de la tabla `i` (o True donde hay filas) """
+        if valores is True:
+            matriz = np.zeros((self.n_grupos, self.n_dias), dtype=bool)
+            matriz[self.grupos[i], self.dias[i]] = True
+        else:
+            matriz = np.zeros((self.n_grupos, self.n_dias))
+            np.add.at(matriz, (self.grupos[i], self.dias[i]), valores)
+        return matriz
+
+
+def _valor_y_base(valores: np.ndarray, observados: np.ndarray, quiebre: np.ndarray,
+                  grupo: np.ndarray, dia: np.ndarray, dias_base: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Valor de la matriz grupos x días en cada (grupo, día) pedido y su promedio en los `dias_base`
+    días previos observados y sin quiebre, con sumas acumuladas por fila.
+    """
+    validos = observados & ~quiebre
+    suma = np.zeros((valores.shape[0], valores.shape[1] + 1))
+    cuenta = np.zeros_like(suma)
+    np.cumsum(np.where(validos, valores, 0.0), axis=1, out=suma[:, 1:])
+    np.cumsum(validos, axis=1, out=cuenta[:, 1:])
+    # Días [d - dias_base, d - 1]: posiciones [max(d - dias_base, 0), d) de las sumas acumuladas
+    desde = np.maximum(dia - dias_base, 0)
+    total = suma[grupo, dia] - suma[grupo, desde]
+    dias = cuenta[grupo, dia] - cuenta[grupo, desde]
+    base = np.divide(total, dias, out=np.full(len(total), np.nan), where=dias > 0)
+    valor = np.where(observados[grupo, dia], valores[grupo, dia], np.nan)
+    return valor, base
+
+
+def unir_roturas_ventas(df_roturas: pd.DataFrame, df_ventas: pd.DataFrame, df_stock: pd.DataFrame,
+                        dias_base: int = 14, horas_atencion: float = 14.0) -> pd.DataFrame:
+    """
+    Un registro por (tienda, fecha, producto) con rotura, cruzado con:
+
+    - `df_ventas`: ventas por SKU de varios días (columnas de `ventas_x_sku` más 'Fecha'); se usan
+      'Cantidad' y 'VentaSoles'. Un producto sin fila en un día con ventas cuenta como venta 0.
+    - `df_stock`: resumen diario del formulario de movimientos (`transformar_df_sheet_google`).
+
+    La clave incluye la tienda solo si `df_roturas` y `df_ventas` tienen la columna 'Tienda'
+    (y el stock se cruza por tienda solo si también la tiene). El valor base de cada métrica es
+    su promedio en los `dias_base` días previos sin rotura.
+    """
+    if df_roturas.empty:
+        return pd.DataFrame()
+    ventas = df_ventas.rename(columns={"ProductoNombre": "Producto"})
+    ventas = ventas[ventas["Producto"] != "Total"]
+    stock = df_stock.reset_index() if "Fecha" not in df_stock.columns else df_stock
+    con_tienda = "Tienda" in df_roturas.columns and "Tienda" in ventas.columns
+
+    # Una fila por día con rotura: las horas de varios eventos del mismo día se suman (tope: el horario)
+    claves = (["Tienda"] if con_tienda else []) + ["Fecha", "Producto"]
+    dias_rotura = (df_roturas.groupby(claves, sort=True)
+                   .agg(Eventos=("Horas", "size"), Horas=("Horas", "sum")).reset_index())
+    dias_rotura["Horas"] = dias_rotura["Horas"].clip(upper=horas_atencion)
+    resultado = dias_rotura.copy()
+    resultado["Fracción del día"] = resultado["Horas"] / horas_atencion
+
+    # Ventas: tabla 0 = días con rotura, tabla 1 = ventas
+    cod = _Codificador([dias_rotura, ventas], con_tienda)
+    quiebre = cod.matriz(0)
+    # Días observados: todos los productos de la tienda en los días con datos (el SP omite los productos sin venta)
+    por_tienda = np.zeros((cod.n_tiendas, cod.n_dias), dtype=bool)
+    por_tienda[cod.tiendas[1], cod.dias[1]] = True
+    observados = np.repeat(por_tienda, cod.n_productos, axis=0)
+    for columna, nombre in (("Cantidad", "Cantidad"), ("VentaSoles", "Venta S/")):
+        valores = cod.matriz(1, pd.to_numeric(ventas[columna], errors="coerce").fillna(0).to_numpy())
+        resultado[nombre], resultado[f"{nombre} base"] = _valor_y_base(
+            valores, observados, quiebre, cod.grupos[0], cod.dias[0], dias_base)
+
+    # Stock del día (formulario de movimientos) por búsqueda sobre claves ordenadas
+    if not stock.empty:
+        cod_stock = _Codificador([dias_rotura, stock], con_tienda and "Tienda" in stock.columns)
+        filas = IndiceOrdenado(cod_stock.clave(1)).buscar(cod_stock.clave(0))
+        encontrados = filas >= 0
+        for columna in ("Stock Inicial", "Ingresos", "Ventas", "Stock Final"):
+            valores = stock[columna].to_numpy(dtype=float)
+            resultado["UND vendidas" if columna == "Ventas" else columna] = np.where(encontrados, valores[np.maximum(filas, 0)], np.nan)
+        _, resultado["UND base"] = _valor_y_base(
+            cod_stock.matriz(1, stock["Ventas"].to_numpy(dtype=float)), cod_stock.matriz(1), cod_stock.matriz(0),
+            cod_stock.grupos[0], cod_stock.dias[0], dias_base)
+
+    base = resultado["Cantidad base"].to_numpy()
+    resultado["Caída de venta (%)"] = np.where(base > 0, (1 - resultado["Cantidad"].to_numpy() / np.where(base > 0, base, 1)) * 100, np.nan)
+    resultado["Venta perdida S/"] = np.maximum(resultado["Venta S/ base"] - resultado["Venta S/"], 0)
+    logger.info(f"✅ Roturas cruzadas con ventas y stock: {len(resultado)} días-SKU ({int(resultado['Eventos'].sum())} eventos)")
+    return resultado
+
+
+def resumir_roturas_por_sku(df_dias: pd.DataFrame) -> pd.DataFrame:
+    """
+    Por SKU: días con rotura, horas totales y promedio, caída promedio de la venta frente a su base
+    y sensibilidad de la caída a la duración (puntos de caída por hora de rotura, ajuste por mínimos
+    cuadrados sin intercepto) y venta perdida estimada.
+    """
+    if df_dias.empty:
+        return pd.DataFrame()
+    validos = df_dias["Caída de venta (%)"].notna().to_numpy()
+    codigos, productos = pd.factorize(df_dias["Producto"], sort=True)
+    n = len(productos)
+    horas = df_dias["Horas"].to_numpy(dtype=float)
+    caida = np.where(validos, df_dias["Caída de venta (%)"].to_numpy(dtype=float), 0.0)
+    horas_validas = np.where(validos, horas, 0.0)
+
+    dias = np.bincount(codigos, minlength=n)
+    con_base = np.bincount(codigos, weights=validos, minlength=n)
+    horas_totales = np.bincount(codigos, weights=horas, minlength=n)
+    suma_caida = np.bincount(codigos, weights=caida, minlength=n)
+    xy = np.bincount(codigos, weights=horas_validas * caida, minlength=n)
+    xx = np.bincount(codigos, weights=horas_validas ** 2, minlength=n)
+    perdida = np.bincount(codigos, weights=df_dias["Venta perdida S/"].fillna(0).to_numpy(), minlength=n)
+
+    resumen = pd.DataFrame({
+        "Producto": productos,
+        "Días con rotura": dias,
+        "Eventos": np.bincount(codigos, weights=df_dias["Eventos"].to_numpy(), minlength=n).astype(int),
+        "Horas totales": horas_totales,
+        "Horas promedio": horas_totales / dias,
+        "Caída promedio (%)": np.divide(suma_caida, con_base, out=np.full(n, np.nan), where=con_base > 0),
+        "Caída por hora (pp)": np.divide(xy, xx, out=np.full(n, np.nan), where=xx > 0),
+        "Venta perdida S/": perdida,
+    })
+    return resumen.sort_values("Venta perdida S/", ascending=False).reset_index(drop=True)
@@ -1,8 +1,10 @@
 # Script para realizar transofrmaciones de datos en el reporte Mi Casero
 
+import numpy as np
 import pandas as pd
 from typing import Union, List, Any
 from datetime import datetime, date
+from utils.fechas import indexar_por_fecha
 import logging
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -45,29 +47,42 @@ def format_table(df):
         return df
     return df
 
+# --- Función para preparar los datos de google sheet ---
+
+def preparar_df_sheet_google(df: pd.DataFrame, columna_fecha: str = 'Fecha') -> pd.DataFrame:
+    """
+    Etapa canónica de preparación del formulario de Google Sheets.
+
+    Parsea la columna de fecha una única vez y la deja como un DatetimeIndex ordenado.
+    El validador, la transformación de stock y el reporte diario trabajan sobre este
+    DataFrame y cortan el día objetivo por búsqueda binaria sobre el índice.
+    """
+    logger.info(f"Preparando el DataFrame de Google Sheets. Filas iniciales: {len(df)}")
+    if df.empty:
+        return df
+    df_preparado = indexar_por_fecha(df, columna_fecha=columna_fecha)
+    logger.info(f"DataFrame preparado con índice de fechas. Filas: {len(df_preparado)}")
+    return df_preparado
+
 # --- Función para transformar los datos de google sheet ---
 
 def transformar_df_sheet_google(df: pd.DataFrame) -> pd.DataFrame:
     """
     Transforma un DataFrame de Google Sheets para calcular el stock diario por producto,
     integrando un sistema de logging para trazabilidad y depuración.
+
+    Recibe el DataFrame preparado por `preparar_df_sheet_google` (si recibe el DataFrame
+    crudo lo prepara primero) y devuelve el resumen indexado por 'Fecha' (DatetimeIndex ordenado).
     """
     logger.info(f"Iniciando la transformación del DataFrame. Filas iniciales: {len(df)}")
 
     # --- 1. Limpieza y conversión de tipos ---
-    logger.info("Convirtiendo la columna 'Fecha' a formato datetime.")
-    # Guardamos el número de filas con fechas nulas ANTES de la conversión
-    fechas_nulas_antes = df['Fecha'].isnull().sum()
-    df['Fecha'] = pd.to_datetime(df['Fecha'], dayfirst=True, errors='coerce')
-
-    # Verificamos si la conversión generó nuevos valores nulos (NaT)
-    fechas_nulas_despues = df['Fecha'].isnull().sum()
-    if fechas_nulas_despues > fechas_nulas_antes:
-        filas_con_error = fechas_nulas_despues - fechas_nulas_antes
-        logger.warning(f"{filas_con_error} fila(s) contenían un formato de fecha inválido y fueron marcadas como NaT.")
-        # Opcional: eliminar filas con fechas inválidas para evitar errores posteriores
-        df.dropna(subset=['Fecha'], inplace=True)
-        logger.info(f"Se eliminaron las filas con fechas inválidas. Filas restantes: {len(df)}")
+    if df.empty:
+        logger.warning("El DataFrame recibido está vacío. Devolviendo DataFrame vacío.")
+        return pd.DataFrame()
+    if not isinstance(df.index, pd.DatetimeIndex):
+        logger.info("El DataFrame no tiene índice de fechas, se prepara antes de transformar.")
+        df = preparar_df_sheet_google(df)
 
     # --- 2. Procesamiento de columnas de Unidades (SKU) ---
     logger.info("Identificando y procesando columnas de SKU.")
@@ -78,57 +93,49 @@ def transformar_df_sheet_google(df: pd.DataFrame) -> pd.DataFrame:
         return pd.DataFrame() # Devolver un DF vacío si no hay nada que procesar
 
     logger.info(f"Convirtiendo {len(sku_columns)} columnas de SKU a tipo numérico.")
-    df[sku_columns] = df[sku_columns].apply(pd.to_numeric, errors="coerce").fillna(0)
+    valores = df[sku_columns].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=float)
 
     # --- 3. Cálculo de stock ---
+    # Una suma por fecha y tipo de movimiento para todos los SKUs a la vez (matriz fechas x SKUs):
+    # el costo crece con las filas del formulario, no con fechas x SKUs consultas por separado
     logger.info("Iniciando el cálculo de stock por fecha y producto.")
-    resumen_lista = []
-    
-    # Agrupar por fecha. Es más eficiente que iterar todo el DataFrame
-    for fecha, grupo in df.groupby("Fecha"):
-        for sku in sku_columns:
-            # Usar .loc para un filtrado más explícito y eficiente
-            movimientos = grupo.loc[:, ["Tipo de movimiento", sku]]
-            
-            stock_inicial = movimientos.loc[movimientos["Tipo de movimiento"] == "Stock inicial", sku].sum()
-            ingresos = movimientos.loc[movimientos["Tipo de movimiento"] == "Ingreso", sku].sum()
-            ventas = movimientos.loc[movimientos["Tipo de movimiento"] == "Salida", sku].sum()
-
-            stock_final = stock_inicial + ingresos - ventas
-
-            resumen_lista.append({
-                "Fecha": fecha, # Mantenemos el objeto datetime por ahora
-                "Producto": sku.replace("Unidades - ", ""),
-                "Stock Inicial": int(stock_inicial),
-                "Ingresos": int(ingresos),
-                "Ventas": int(ventas),
-                "Stock Final": int(stock_final)
-            })
-    
-    logger.info(f"Cálculo de stock completado. Se generaron {len(resumen_lista)} registros.")
+    posiciones, fechas = pd.factorize(df.index, sort=True)
+    totales = {}
+    for tipo in ("Stock inicial", "Ingreso", "Salida"):
+        filas = (df["Tipo de movimiento"] == tipo).fillna(False).to_numpy(dtype=bool)
+        suma = np.zeros((len(fechas), len(sku_columns)))
+        np.add.at(suma, posiciones[filas], valores[filas])
+        totales[tipo] = suma
+    stock_final = totales["Stock inicial"] + totales["Ingreso"] - totales["Salida"]
+
+    logger.info(f"Cálculo de stock completado. Se generaron {stock_final.size} registros.")
 
     # --- 4. Creación y retorno del DataFrame final ---
-    if not resumen_lista:
+    if stock_final.size == 0:
         logger.warning("No se generó ningún dato en el resumen. Devolviendo DataFrame vacío.")
         return pd.DataFrame()
 
-    logger.info("Creando y ordenando el DataFrame de resumen final.")
-    resumen = pd.DataFrame(resumen_lista)
-    
-    # Formatear la fecha a string al final, para mantener el tipo correcto durante el ordenamiento
-    resumen_ordenado = resumen.sort_values(by="Fecha")
-    resumen_ordenado["Fecha"] = resumen_ordenado["Fecha"].dt.strftime("%d/%m/%Y")
-    
-    logger.info(f"Transformación finalizada exitosamente. DataFrame final con {len(resumen_ordenado)} filas.")
-    
-    return resumen_ordenado
+    logger.info("Creando el DataFrame de resumen final indexado por fecha.")
+    # Filas por fecha y, dentro de cada fecha, en el orden de las columnas del formulario
+    resumen = pd.DataFrame({
+        "Producto": np.tile([sku.replace("Unidades - ", "") for sku in sku_columns], len(fechas)),
+        "Stock Inicial": totales["Stock inicial"].ravel().astype(int),
+        "Ingresos": totales["Ingreso"].ravel().astype(int),
+        "Ventas": totales["Salida"].ravel().astype(int),
+        "Stock Final": stock_final.ravel().astype(int),
+    }, index=pd.DatetimeIndex(fechas.repeat(len(sku_columns)), name="Fecha"))
+
+    logger.info(f"Transformación finalizada exitosamente. DataFrame final con {len(resumen)} filas.")
+
+    return resumen
 
 
-def transformar_y_filtrar_datos_ventas_vs_ppto(df: pd.DataFrame,semanas: int):
+def transformar_y_filtrar_datos_ventas_vs_ppto(df: pd.DataFrame,semanas: int, fecha_referencia: Union[date, None] = None):
     """Cambia el nombre de las columnas necesarias y se filtra por las n semanas últimas
     arg:
         df = dataframe extraido del sql server
         semanas = últimas semanas que se quiere filtrar
+        fecha_referencia = fecha cuya semana es la última del filtro (por defecto hoy)
     """
 
     rename_columns = {
@@ -145,11 +152,44 @@ def transformar_y_filtrar_datos_ventas_vs_ppto(df: pd.DataFrame,semanas: int):
     ]
     df = df[selec_columns]
     #filtrar
-    fecha_actual = datetime.now()
+    fecha_actual = fecha_referencia or datetime.now()
     año_iso, numero_semana, _ = fecha_actual.isocalendar()
     df_filtrado = df[
         (df['Año'] == año_iso) & 
         (df['Semana'] <= numero_semana) & 
         (df['Semana'] >= numero_semana - semanas)
     ]
-    return df_filtrado
\ No newline at end of file
+    return df_filtrado
+
+def filtrar_por_categorias(df: pd.DataFrame, categorias: Union[List[str], None], columna: str = "Categoria") -> pd.DataFrame:
+    """Filtra la salida de un SP de ventas por categoría para un perfil de destinatarios
+    arg:
+        df = ventas_x_categoria o ventas_x_sku (columnas originales del SP)
+        categorias = categorías del perfil; None o vacío devuelve todas
+    Si el SP trae la fila 'Total', se recalcula con las categorías filtradas: la participación de
+    cada fila pasa a ser sobre el nuevo total (que queda en 100) y el ticket promedio del total es
+    la venta sobre los tickets de las filas (VentaSoles / TicketProm).
+    Siempre devuelve una copia (format_table modifica el DataFrame que recibe).
+    """
+    if not categorias:
+        return df.copy()
+    es_total = df[columna] == "Total"
+    df_filtrado = df[df[columna].isin(set(categorias)) & ~es_total].copy()
+    if not es_total.any() or df_filtrado.empty:
+        return df_filtrado.reset_index(drop=True)
+
+    total = {c: None for c in df.columns}
+    total[columna] = "Total"
+    for c in ("VentaSoles", "Cantidad"):
+        if c in df.columns:
+            total[c] = df_filtrado[c].sum()
+    if "PrecioPonderado" in df.columns and total.get("Cantidad"):
+        total["PrecioPonderado"] = total["VentaSoles"] / total["Cantidad"]
+    if "partic" in df.columns and total.get("VentaSoles"):
+        df_filtrado["partic"] = (df_filtrado["VentaSoles"] / total["VentaSoles"] * 100).round(2)
+        total["partic"] = 100.0
+    if "TicketProm" in df.columns:
+        tickets = (df_filtrado["VentaSoles"] / df_filtrado["TicketProm"]).sum()
+        if tickets:
+            total["TicketProm"] = total["VentaSoles"] / tickets
+    return pd.concat([df_filtrado, pd.DataFrame([total])], ignore_index=True)
@@ -1,146 +1,585 @@
+import argparse
+import base64
+import hashlib
+import os
+import time
 from datetime import datetime
 
 # Importaciones de tus módulos
-from service.conect_google_sheet import get_excel_stock_und
-from service.conect_db import ReporteExecutor
-from service.email_service import enviar_email_con_reintentos,enviar_email
-from config.config import GOOGLE_SHEET_CREDENTIALS, ACCESOS_SHEET_GOOGLE, REPORTES_CONFIG, DB_CONFIG, DESTINATARIOS, SENDER_EMAIL,SMTP_SERVER,SMTP_PORT,PASSWORD
+from service.conect_db import ReporteExecutor, crear_backend
+from service.almacen_local import crear_almacen
+from service.fuentes import FuenteProduccion, FuenteGrabadora, FuenteReproduccion, BundleSnapshots
+from service.vigilante_sheets import VigilanteMovimientos, crear_hoja_sheets_api, esperar_movimientos_completos
+from service.email_service import ColaEnvios, construir_mensaje, construir_asunto
+from config.config import GOOGLE_SHEET_CREDENTIALS, ACCESOS_SHEET_GOOGLE, REPORTES_CONFIG, DB_CONFIG, SENDER_EMAIL,SMTP_SERVER,SMTP_PORT,PASSWORD, METRICAS_CONFIG, SNAPSHOTS_CONFIG, DB_BACKEND, ALMACEN_LOCAL_CONFIG, PERFILES_DESTINATARIOS, VIGILANCIA_CONFIG, CHECKPOINTS_CONFIG, SMTP_ENVIO_CONFIG, QUIEBRES_CONFIG, EXPORTACION_CONFIG, REGISTRO_CONFIG, ARCHIVO_CONFIG, PLANTILLA_CONFIG
 from utils.logs import main_loger
-from data.transformar import format_table, transformar_y_filtrar_datos_ventas_vs_ppto, transformar_df_sheet_google
+from data.transformar import format_table, transformar_y_filtrar_datos_ventas_vs_ppto, transformar_df_sheet_google, preparar_df_sheet_google, filtrar_por_categorias
 from data.generar_reporte_google import generar_reporte_diario_und_pollos
-from data.generar_reporte_odoo import generar_comentarios_producto
+from data.quiebres_stock import analizar_quiebres
+from data.kpis import motor_kpis
 from components.reportes_graficos import crear_imagen_ventas_semanales
 from components.reporte_graficos_2 import crear_imagen_ventas_semanales_vs_ppto
 from components.generar_tablas_html import tabla_html
+from components.exportar_tablas import exportar_adjuntos, podar_adjuntos
+from components.plantilla_email import PLANTILLA_CUERPO, PLANTILLA_QUIEBRES
 from validators.validator_data import validar_movimientos_diarios_completos,DatosInvalidosError,validar_dataframe_no_vacio
+from utils.fechas import formatear_fecha, normalizar_fecha
+from utils.metricas import metricas, medir_etapa
+from utils.perfilador import PerfiladorEjecucion
+from utils.convertir_img_base64 import generar_imagen_base64
+from utils.cache_render import CacheRender, CacheFragmentos, huella_codigo, huella_dataframe
+from utils.checkpoints import CheckpointEjecucion
+from utils.registro_ejecuciones import RegistroEjecuciones, huella_entradas
+from utils.archivo_reportes import ArchivoReportes, partes_mensaje
+import logging
 
-def obtener_dataframes(fecha):
-    executor = ReporteExecutor(db_config=DB_CONFIG, reportes_config=REPORTES_CONFIG)
-    df_semanal_vs_ppto = executor.ejecutar_reporte('ventas_semanal_vs_ppto')
-    df_ventas_x_sku = executor.ejecutar_reporte('ventas_x_sku', fecha=fecha)
-    df_ventas_x_categoria = executor.ejecutar_reporte('ventas_x_categoria', fecha=fecha)
-    df_ventas_x_diasem = executor.ejecutar_reporte('ventas_comparativo_x_semana_x_dia', fecha=fecha)
-    df_ventas_unidades_google = get_excel_stock_und(
-        form='form_mov_pollos',
-        GOOGLE_SHEET_CREDENTIALS=GOOGLE_SHEET_CREDENTIALS,
-        ACCESOS_SHEET_GOOGLE=ACCESOS_SHEET_GOOGLE
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+def crear_fuente(args, fecha, fuente=None):
+    """
+    Fuente de datos según el modo: producción, grabación (--record) o reproducción (--replay).
+    `fuente` permite reutilizar una fuente de producción ya abierta (daemon).
+    """
+    if args.replay:
+        return FuenteReproduccion(BundleSnapshots(SNAPSHOTS_CONFIG['directorio'], args.replay))
+    if fuente is None:
+        fuente = crear_fuente_produccion()
+    if args.record:
+        bundle = BundleSnapshots(SNAPSHOTS_CONFIG['directorio'], metricas.run_id, compresion=SNAPSHOTS_CONFIG['compresion'])
+        return FuenteGrabadora(fuente, bundle, fecha)
+    return fuente
+
+def crear_fuente_produccion(tamanio_pool=0):
+    executor = ReporteExecutor(db_config=DB_CONFIG, reportes_config=REPORTES_CONFIG, backend=crear_backend(DB_BACKEND, DB_CONFIG, tamanio_pool=tamanio_pool),
+                                almacen=crear_almacen(ALMACEN_LOCAL_CONFIG))
+    return FuenteProduccion(executor, GOOGLE_SHEET_CREDENTIALS, ACCESOS_SHEET_GOOGLE)
+
+def esperar_formulario_completo(fecha):
+    """ --watch: bloquea hasta que el formulario tenga todos los movimientos de `fecha` o se alcance la hora límite """
+    hoja = crear_hoja_sheets_api(VIGILANCIA_CONFIG['form'], GOOGLE_SHEET_CREDENTIALS, ACCESOS_SHEET_GOOGLE,
+                                 url_base=VIGILANCIA_CONFIG['url_base'])
+    vigilante = VigilanteMovimientos(hoja, solapamiento=VIGILANCIA_CONFIG['solapamiento'])
+    hora, minuto = (int(v) for v in VIGILANCIA_CONFIG['hora_limite'].split(":"))
+    limite = datetime.combine(fecha, datetime.min.time()).replace(hour=hora, minute=minuto)
+    logger.info(f"👀 Esperando los movimientos del {formatear_fecha(fecha)} en el formulario (límite {VIGILANCIA_CONFIG['hora_limite']})")
+    return esperar_movimientos_completos(
+        vigilante, fecha,
+        intervalo_min=VIGILANCIA_CONFIG['intervalo_min'],
+        intervalo_max=VIGILANCIA_CONFIG['intervalo_max'],
+        factor=VIGILANCIA_CONFIG['factor'],
+        limite=limite
     )
+
+# Orden de los DataFrames que devuelve obtener_dataframes
+NOMBRES_FUENTES = ('ventas_semanal_vs_ppto', 'ventas_x_sku', 'ventas_x_categoria', 'ventas_comparativo_x_semana_x_dia', 'form_mov_pollos')
+
+# Nombre de cada fuente en los mensajes de validación
+ETIQUETAS_FUENTES = {
+    'ventas_semanal_vs_ppto': "DataFrame Semanal vs Presupuesto",
+    'ventas_x_sku': "DataFrame Ventas por SKU",
+    'ventas_x_categoria': "DataFrame Ventas por Categoría",
+    'ventas_comparativo_x_semana_x_dia': "DataFrame Ventas por Día de Semana",
+    'form_mov_pollos': "DataFrame Unidades Google Sheets",
+}
+
+def obtener_dataframes(fecha, fuente):
+    # Los SP reciben la fecha como string 'dd/mm/YYYY'
+    fecha_sp = formatear_fecha(fecha)
+    with medir_etapa("fetch_db") as etapa:
+        df_semanal_vs_ppto = fuente.obtener_reporte('ventas_semanal_vs_ppto')
+        df_ventas_x_sku = fuente.obtener_reporte('ventas_x_sku', fecha=fecha_sp)
+        df_ventas_x_categoria = fuente.obtener_reporte('ventas_x_categoria', fecha=fecha_sp)
+        df_ventas_x_diasem = fuente.obtener_reporte('ventas_comparativo_x_semana_x_dia', fecha=fecha_sp)
+        etapa.anotar(filas=len(df_semanal_vs_ppto) + len(df_ventas_x_sku) + len(df_ventas_x_categoria) + len(df_ventas_x_diasem))
+    with medir_etapa("fetch_sheets") as etapa:
+        df_ventas_unidades_google = fuente.obtener_sheet('form_mov_pollos')
+        etapa.anotar(filas=len(df_ventas_unidades_google))
     return (df_semanal_vs_ppto, df_ventas_x_sku, df_ventas_x_categoria, df_ventas_x_diasem, df_ventas_unidades_google)
 
-def preparar_tablas_y_comentarios(df_ventas_x_sku, df_ventas_x_categoria, df_ventas_unidades_google, fecha):
-    df_ventas_unidades_2 = transformar_df_sheet_google(df_ventas_unidades_google)
-    df_ventas_unidades_final, comentario_und = generar_reporte_diario_und_pollos(
+def preparar_tabla_unidades(df_ventas_x_sku, df_ventas_unidades_google, fecha, df_resumen_unidades=None):
+    # df_ventas_unidades_google llega preparado (índice de fechas) desde main.
+    # El backfill pasa el resumen de stock ya calculado para todas las fechas (df_resumen_unidades).
+    df_ventas_unidades_2 = df_resumen_unidades if df_resumen_unidades is not None else transformar_df_sheet_google(df_ventas_unidades_google)
+    df_ventas_unidades_final = generar_reporte_diario_und_pollos(
         df_und_google=df_ventas_unidades_2,
         df_ventas_odo_lastday=df_ventas_x_sku,
         fecha_objetivo=fecha
     )
-    tabla_unidades_html = tabla_html(df_ventas_unidades_final)
+    # Unidades vendidas del día: en el backfill la tabla por día se calcula una vez para todas las fechas
+    kpis_dia = motor_kpis.valores({'stock': df_ventas_unidades_2}, 'dia', fecha)
+    comentario_und = motor_kpis.formatear(kpis_dia, ['und_vendidas'])['und_vendidas']
+    return tabla_html(df_ventas_unidades_final), comentario_und
+
+def preparar_tabla_quiebres(df_resumen_unidades, fecha, persistir=True):
+    estado = analizar_quiebres(
+        df_resumen_unidades, fecha,
+        directorio=QUIEBRES_CONFIG['directorio'] if QUIEBRES_CONFIG['habilitado'] else None,
+        ventanas=QUIEBRES_CONFIG['ventanas'],
+        umbral=QUIEBRES_CONFIG['umbral'],
+        ventana_demanda=QUIEBRES_CONFIG['ventana_demanda'],
+        persistir=persistir
+    )
+    df_quiebres = estado.tabla(top=QUIEBRES_CONFIG['top'])
+    return tabla_html(df_quiebres) if not df_quiebres.empty else ""
+
+def preparar_adjunto(df_ventas_x_sku, df_ventas_x_categoria, fecha, nombre_perfil):
+    """ XLSX (y PDF) con las tablas completas, comprimido; None si supera el tamaño máximo de adjunto """
+    with medir_etapa("adjuntos") as etapa:
+        ruta, estadisticas = exportar_adjuntos(
+            {"Ventas por SKU": df_ventas_x_sku, "Ventas por Categoría": df_ventas_x_categoria},
+            directorio=os.path.join(EXPORTACION_CONFIG['directorio'], metricas.run_id),
+            nombre=f"detalle_ventas_{nombre_perfil}_{normalizar_fecha(fecha).isoformat()}",
+            formatos=EXPORTACION_CONFIG['formatos'],
+            comprimir=EXPORTACION_CONFIG['comprimir'],
+            titulo=f"Detalle de ventas {formatear_fecha(fecha)}"
+        )
+        etapa.anotar(filas=estadisticas['filas'], bytes_salida=estadisticas['bytes'])
+    if estadisticas['bytes'] > EXPORTACION_CONFIG['max_mb'] * 1e6:
+        logger.warning(f"⚠️ El adjunto {ruta} pesa {estadisticas['bytes'] / 1e6:.1f} MB (máximo {EXPORTACION_CONFIG['max_mb']} MB); no se adjunta.")
+        return None
+    return ruta
+
+def preparar_tablas_ventas(df_ventas_x_sku, df_ventas_x_categoria):
+    # KPIs sobre las columnas tipadas, antes de que format_table las renombre sobre el DataFrame recibido
+    kpis = motor_kpis.formatear(motor_kpis.valores({'ventas_x_sku': df_ventas_x_sku}),
+                                ['ventas_totales', 'kg_totales', 'precio_promedio'])
+    total_ventas_formato, total_kg_formato, precio_prom = kpis['ventas_totales'], kpis['kg_totales'], kpis['precio_promedio']
     df_ventas_x_sku_final = format_table(df_ventas_x_sku)
     tabla_ventas_x_sku_html = tabla_html(df_ventas_x_sku_final)
-    total_ventas_formato, total_kg_formato, precio_prom = generar_comentarios_producto(df_ventas_x_sku_final)
     df_ventas_x_categoria_final = format_table(df_ventas_x_categoria)
     tabla_ventas_x_categoria_html = tabla_html(df_ventas_x_categoria_final)
+    return tabla_ventas_x_categoria_html, tabla_ventas_x_sku_html, total_ventas_formato, total_kg_formato, precio_prom
+
+def preparar_tablas_y_comentarios(df_ventas_x_sku, df_ventas_x_categoria, df_ventas_unidades_google, fecha, df_resumen_unidades=None):
+    tabla_unidades_html, comentario_und = preparar_tabla_unidades(df_ventas_x_sku, df_ventas_unidades_google, fecha, df_resumen_unidades)
+    (tabla_ventas_x_categoria_html, tabla_ventas_x_sku_html,
+     total_ventas_formato, total_kg_formato, precio_prom) = preparar_tablas_ventas(df_ventas_x_sku, df_ventas_x_categoria)
     return (tabla_unidades_html, tabla_ventas_x_categoria_html, tabla_ventas_x_sku_html,
             comentario_und, total_ventas_formato, total_kg_formato, precio_prom)
 
-def preparar_graficos(df_ventas_x_diasem, df_semanal_vs_ppto):
+_cache_fragmentos = None
+
+def obtener_cache_fragmentos():
+    """ Cache de fragmentos del proceso (se crea al primer uso: importar main no toca el disco) """
+    global _cache_fragmentos
+    if _cache_fragmentos is None:
+        _cache_fragmentos = CacheFragmentos(PLANTILLA_CONFIG['directorio_cache'] if PLANTILLA_CONFIG['cache_en_disco'] else None,
+                                            PLANTILLA_CONFIG['max_entradas'], PLANTILLA_CONFIG['max_dias'])
+    return _cache_fragmentos
+
+def preparar_graficos(df_ventas_x_diasem, df_semanal_vs_ppto, fecha=None):
     grafico_ventas_comp_semanas_bas64 = crear_imagen_ventas_semanales(df_ventas_x_diasem)
-    df_ventas_sem_vs_ppto = transformar_y_filtrar_datos_ventas_vs_ppto(df_semanal_vs_ppto, semanas=10)
-    grafico_ventas_comp_sem_ppto_bas64 = crear_imagen_ventas_semanales_vs_ppto(df_ventas_sem_vs_ppto)
+    df_ventas_sem_vs_ppto = transformar_y_filtrar_datos_ventas_vs_ppto(df_semanal_vs_ppto, semanas=10, fecha_referencia=fecha)
+    # Real vs ppto por semana: mismo dato durante la semana, el render de Kaleido sale de la cache.
+    # La clave lleva la versión del código del gráfico y del render: un cambio de diseño no reutiliza PNGs viejos
+    version = huella_codigo(crear_imagen_ventas_semanales_vs_ppto, generar_imagen_base64, paquetes=("plotly", "kaleido"))
+    grafico_ventas_comp_sem_ppto_bas64 = obtener_cache_fragmentos().obtener(
+        "grafico_ppto", f"{version[:12]}_{huella_dataframe(df_ventas_sem_vs_ppto)}",
+        lambda: crear_imagen_ventas_semanales_vs_ppto(df_ventas_sem_vs_ppto)
+    )
     return grafico_ventas_comp_semanas_bas64, grafico_ventas_comp_sem_ppto_bas64
 
 def construir_cuerpo_email(tabla_unidades_html, tabla_ventas_x_categoria_html, tabla_ventas_x_sku_html,
                           comentario_und, total_ventas_formato, total_kg_formato, precio_prom,
-                          grafico_ventas_comp_semanas_bas64, grafico_ventas_comp_sem_ppto_bas64):
-    return f"""
-    <p>Estimados,</p>
-    <p>Resumen de ventas del día:</p>
-    <ul style="list-style-type: none; padding-left: 0; margin: 0;">
-        <li><b>Pollos Vendidos:</b> {comentario_und}</li>
-        <li><b>Ingresos Totales:</b> {total_ventas_formato}</li>
-        <li><b>Volumen Total:</b> {total_kg_formato}</li>
-        <li><b>Precio Promedio:</b> {precio_prom}</li>
-    </ul>
-    <p>
-        📊 Link del Dashboard: 
-        <a href="" 
-        target="_blank" style="color: #0078D4; text-decoration: none;">
-        Ver en Power BI
-        </a>
-    </p>
-    <img src="data:image/png;base64,{grafico_ventas_comp_semanas_bas64}">
-    <p>A continuación, los reportes:</p>
-    <h3>📌 Resumen de Stock (UND Pollos)</h3>
-    {tabla_unidades_html}
-    <br>
-    <h3>📌 Resumen de Ventas</h3>
-    {tabla_ventas_x_categoria_html}
-    <br>
-    <h3>📌 Detalle de Ventas por Producto</h3>
-    {tabla_ventas_x_sku_html}
-    <br>
-    <h3>📌 Real vs Ppto por semana</h3>
-    <img src="data:image/png;base64,{grafico_ventas_comp_sem_ppto_bas64}" alt="Real vs Ppto por semana";">
-    
-    <p>Saludos,</p>
-    <p><b>Equipo de control de gestión</b></p>
+                          grafico_ventas_comp_semanas_bas64, grafico_ventas_comp_sem_ppto_bas64,
+                          tabla_quiebres_html="", codificados=None):
+    """
+    Cuerpo HTML del correo en UTF-8 (bytes), armado sobre la plantilla precompilada.
+    `codificados`: fragmentos ya codificados de la ejecución, compartidos entre perfiles
     """
+    seccion_quiebres = PLANTILLA_QUIEBRES.render(
+        codificados, dias=max(QUIEBRES_CONFIG['ventanas']), tabla_quiebres_html=tabla_quiebres_html) if tabla_quiebres_html else b""
+    return PLANTILLA_CUERPO.render(
+        codificados,
+        comentario_und=comentario_und,
+        total_ventas_formato=total_ventas_formato,
+        total_kg_formato=total_kg_formato,
+        precio_prom=precio_prom,
+        grafico_ventas_comp_semanas_bas64=grafico_ventas_comp_semanas_bas64,
+        tabla_unidades_html=tabla_unidades_html,
+        seccion_quiebres=seccion_quiebres,
+        tabla_ventas_x_categoria_html=tabla_ventas_x_categoria_html,
+        tabla_ventas_x_sku_html=tabla_ventas_x_sku_html,
+        grafico_ventas_comp_sem_ppto_bas64=grafico_ventas_comp_sem_ppto_bas64,
+    )
 
-def main():
+def validar_fuentes(dataframes, fecha, df_ventas_unidades_google=None):
+    """
+    Valida las fuentes del reporte (`NOMBRES_FUENTES`) y devuelve el formulario con su índice de fechas.
+    Quien ya tiene el formulario preparado (backfill) lo pasa en `df_ventas_unidades_google`.
+    Lanza DatosInvalidosError si alguna validación falla.
+    """
+    for nombre, etiqueta in ETIQUETAS_FUENTES.items():
+        validar_dataframe_no_vacio(dataframes[nombre], etiqueta)
+    # Las fechas del formulario se parsean una sola vez (índice de fechas ordenado)
+    if df_ventas_unidades_google is None:
+        df_ventas_unidades_google = preparar_df_sheet_google(dataframes['form_mov_pollos'])
+    validar_movimientos_diarios_completos(df_ventas_unidades_google, fecha=fecha, nombre_columna_fecha='Fecha')
+    return df_ventas_unidades_google
+
+def generar_cuerpo_reporte(dataframes, fecha, df_ventas_unidades_google=None, df_resumen_unidades=None, tabla_quiebres_html=""):
+    """
+    Pipeline de un reporte sin perfiles (backfill y multi-tienda): validación, tablas, gráficos y cuerpo.
+    Devuelve (cuerpo en bytes, (gráfico semanal, gráfico vs ppto) en base64).
+    Lanza DatosInvalidosError si la validación falla. main recorre las mismas etapas con checkpoints.
+    """
+    df_ventas_unidades_google = validar_fuentes(dataframes, fecha, df_ventas_unidades_google)
+    tablas_y_comentarios = preparar_tablas_y_comentarios(
+        df_ventas_x_sku=dataframes['ventas_x_sku'],
+        df_ventas_x_categoria=dataframes['ventas_x_categoria'],
+        df_ventas_unidades_google=df_ventas_unidades_google,
+        fecha=fecha,
+        df_resumen_unidades=df_resumen_unidades
+    )
+    graficos = preparar_graficos(
+        df_ventas_x_diasem=dataframes['ventas_comparativo_x_semana_x_dia'],
+        df_semanal_vs_ppto=dataframes['ventas_semanal_vs_ppto'],
+        fecha=fecha
+    )
+    cuerpo_mensaje = construir_cuerpo_email(*tablas_y_comentarios, *graficos, tabla_quiebres_html=tabla_quiebres_html)
+    return cuerpo_mensaje, graficos
+
+def parsear_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Reporte diario de ventas y stock Mi Casero")
+    parser.add_argument("--profile", action="store_true",
+                        help="Perfila la ejecución completa (cProfile, pilas colapsadas y asignaciones por etapa)")
+    parser.add_argument("--profile-dir", default="./perfiles", help="Directorio de salida de los perfiles")
+    parser.add_argument("--profile-top", type=int, default=20, help="Cantidad de entradas en los reportes top-N")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument("--record", action="store_true",
+                      help="Graba todos los DataFrames de origen en un bundle Parquet (snapshots/<run_id>)")
+    modo.add_argument("--replay", metavar="RUN_ID",
+                      help="Reproduce una ejecución grabada sin SQL Server ni Google Sheets (no envía el correo)")
+    modo.add_argument("--resume", metavar="RUN_ID",
+                      help="Retoma una ejecución desde su primera etapa incompleta (checkpoints/<run_id>)")
+    parser.add_argument("--dry-run", action="store_true", help="Genera el reporte sin enviar el correo")
+    parser.add_argument("--force", action="store_true",
+                        help="Genera y envía aunque el registro de envíos indique que ya se envió con las mismas fuentes")
+    parser.add_argument("--watch", action="store_true",
+                        help="Espera a que el formulario tenga todos los movimientos del día antes de generar el reporte")
+    return parser.parse_args(argv)
+
+def main(argv=None, fuente=None):
+    """ `fuente`: fuente de producción compartida entre ejecuciones (daemon); no se cierra al terminar """
+    args = parsear_argumentos(argv)
     main_loger()
-    fecha = datetime.now().strftime('%d/%m/%Y')
-    # fecha = '01/08/2025'
-    
-    # 1. Obtener todos los dataframes
-    (df_semanal_vs_ppto, df_ventas_x_sku, df_ventas_x_categoria, df_ventas_x_diasem, df_ventas_unidades_google) = obtener_dataframes(fecha)
+    # El perfilado necesita las etapas instrumentadas para tomar snapshots en sus límites
+    metricas.configurar(
+        habilitado=METRICAS_CONFIG['habilitado'] or args.profile,
+        usar_tracemalloc=METRICAS_CONFIG['tracemalloc'] or args.profile
+    )
+    try:
+        if args.profile:
+            return PerfiladorEjecucion(directorio=args.profile_dir, top_n=args.profile_top).ejecutar(ejecutar_reporte_diario, args, fuente)
+        else:
+            return ejecutar_reporte_diario(args, fuente)
+    finally:
+        metricas.exportar(METRICAS_CONFIG['directorio'])
+
+def obtener_fuentes(args, fecha, checkpoint, fuente_compartida=None):
+    """ 1. DataFrames de origen (del checkpoint si la etapa está completa). Devuelve (fecha, dataframes) """
+    if checkpoint.completa("fuentes"):
+        return fecha, checkpoint.cargar_dataframes("fuentes")
+    fuente = crear_fuente(args, fecha, fuente_compartida)
+    if fuente.fecha:
+        # En reproducción el reporte se genera para la fecha grabada
+        fecha = fuente.fecha
+    try:
+        dataframes = dict(zip(NOMBRES_FUENTES, obtener_dataframes(fecha, fuente)))
+    finally:
+        if fuente_compartida is None:
+            fuente.cerrar()
+    checkpoint.fecha = fecha
+    checkpoint.guardar_dataframes("fuentes", dataframes)
+    return fecha, dataframes
+
+def ejecutar_etapas_comunes(args, fecha, checkpoint, dataframes):
+    """
+    Etapas comunes a todos los perfiles (validación, tabla de stock, quiebres y gráficos) sobre
+    las fuentes de `obtener_fuentes`. Cada etapa completa en el checkpoint se carga en lugar de
+    recalcularse. Devuelve None si la validación de datos falla.
+    """
+    df_semanal_vs_ppto = dataframes['ventas_semanal_vs_ppto']
+    df_ventas_x_sku = dataframes['ventas_x_sku']
+    df_ventas_x_categoria = dataframes['ventas_x_categoria']
+    df_ventas_x_diasem = dataframes['ventas_comparativo_x_semana_x_dia']
     
     # 2. Validar que los dataframes no están vacíos
-    try:
-        # Validaciones de DataFrames vacíos
-        validar_dataframe_no_vacio(df_semanal_vs_ppto, "DataFrame Semanal vs Presupuesto")
-        validar_dataframe_no_vacio(df_ventas_x_sku, "DataFrame Ventas por SKU")
-        validar_dataframe_no_vacio(df_ventas_x_categoria, "DataFrame Ventas por Categoría")
-        validar_dataframe_no_vacio(df_ventas_x_diasem, "DataFrame Ventas por Día de Semana")
-        validar_dataframe_no_vacio(df_ventas_unidades_google, "DataFrame Unidades Google Sheets")
-        
-        # Validación específica de Google Sheets (tu validador existente)
-        validar_movimientos_diarios_completos(df_ventas_unidades_google, fecha=fecha, nombre_columna_fecha='Fecha')
-        
-        print("✅ Todas las validaciones de datos pasaron correctamente.")
-        
-    except DatosInvalidosError as e:
-        print(f"❌ Error de validación: {e}")
-        return  # Detiene el flujo si alguna validación falla
+    if checkpoint.completa("validacion"):
+        df_ventas_unidades_google = checkpoint.cargar_dataframes("validacion")['form_mov_pollos']
+    else:
+        with medir_etapa("validacion") as etapa:
+            try:
+                df_ventas_unidades_google = validar_fuentes(dataframes, fecha)
+                print("✅ Todas las validaciones de datos pasaron correctamente.")
+                
+            except DatosInvalidosError as e:
+                etapa.marcar_error()
+                print(f"❌ Error de validación: {e}")
+                return None  # Detiene el flujo si alguna validación falla
+        checkpoint.guardar_dataframes("validacion", {'form_mov_pollos': df_ventas_unidades_google})
     
-    # 3. Preparar tablas y comentarios
-    (tabla_unidades_html, tabla_ventas_x_categoria_html, tabla_ventas_x_sku_html,
-     comentario_und, total_ventas_formato, total_kg_formato, precio_prom) = preparar_tablas_y_comentarios(
-        df_ventas_x_sku=df_ventas_x_sku, 
-        df_ventas_x_categoria=df_ventas_x_categoria, 
-        df_ventas_unidades_google=df_ventas_unidades_google, 
-        fecha=fecha
-    )
+    # 3. Preparar la tabla de stock (común a todos los perfiles)
+    df_resumen_unidades = None
+    if checkpoint.completa("transformacion"):
+        tabla_unidades_html = checkpoint.leer_archivo("transformacion", "tabla_unidades.html").decode("utf-8")
+        comentario_und = checkpoint.datos("transformacion")['comentario_und']
+    else:
+        with medir_etapa("transformacion") as etapa:
+            df_resumen_unidades = transformar_df_sheet_google(df_ventas_unidades_google)
+            tabla_unidades_html, comentario_und = preparar_tabla_unidades(
+                df_ventas_x_sku=df_ventas_x_sku,
+                df_ventas_unidades_google=df_ventas_unidades_google,
+                fecha=fecha,
+                df_resumen_unidades=df_resumen_unidades
+            )
+            etapa.anotar(filas=len(df_ventas_unidades_google), bytes_salida=len(tabla_unidades_html))
+        checkpoint.guardar_archivos("transformacion", {"tabla_unidades.html": tabla_unidades_html}, comentario_und=comentario_und)
     
-    # 4. Preparar gráficos
-    grafico_ventas_comp_semanas_bas64, grafico_ventas_comp_sem_ppto_bas64 = preparar_graficos(
-        df_ventas_x_diasem=df_ventas_x_diasem, 
-        df_semanal_vs_ppto=df_semanal_vs_ppto
-    )
+    # 3b. Quiebres de stock por SKU en ventanas móviles (estado incremental en QUIEBRES_CONFIG['directorio'])
+    if checkpoint.completa("quiebres"):
+        tabla_quiebres_html = checkpoint.leer_archivo("quiebres", "tabla_quiebres.html").decode("utf-8")
+    else:
+        with medir_etapa("quiebres") as etapa:
+            if df_resumen_unidades is None:
+                df_resumen_unidades = transformar_df_sheet_google(df_ventas_unidades_google)
+            tabla_quiebres_html = preparar_tabla_quiebres(df_resumen_unidades, fecha, persistir=not args.replay)
+            etapa.anotar(filas=len(df_resumen_unidades), bytes_salida=len(tabla_quiebres_html))
+        checkpoint.guardar_archivos("quiebres", {"tabla_quiebres.html": tabla_quiebres_html})
     
-    # 5. Construir cuerpo del email
-    cuerpo_mensaje = construir_cuerpo_email(
-        tabla_unidades_html=tabla_unidades_html, 
-        tabla_ventas_x_categoria_html=tabla_ventas_x_categoria_html, 
-        tabla_ventas_x_sku_html=tabla_ventas_x_sku_html,
-        comentario_und=comentario_und, 
-        total_ventas_formato=total_ventas_formato, 
-        total_kg_formato=total_kg_formato, 
-        precio_prom=precio_prom,
-        grafico_ventas_comp_semanas_bas64=grafico_ventas_comp_semanas_bas64, 
-        grafico_ventas_comp_sem_ppto_bas64=grafico_ventas_comp_sem_ppto_bas64
-    )
-    # 6. Enviar email
-    enviar_email_con_reintentos(cuerpo_mensaje=cuerpo_mensaje,destinatarios=DESTINATARIOS,fecha_asunto=fecha,sender_email=SENDER_EMAIL,password=PASSWORD,smtp_server=SMTP_SERVER,smtp_port=SMTP_PORT)
+    # 4. Preparar gráficos (los SP semanales no tienen categoría: son comunes a todos los perfiles)
+    if checkpoint.completa("graficos"):
+        grafico_ventas_comp_semanas_bas64 = base64.b64encode(checkpoint.leer_archivo("graficos", "ventas_comp_semanas.png")).decode("utf-8")
+        grafico_ventas_comp_sem_ppto_bas64 = base64.b64encode(checkpoint.leer_archivo("graficos", "ventas_comp_sem_ppto.png")).decode("utf-8")
+    else:
+        with medir_etapa("graficos") as etapa:
+            grafico_ventas_comp_semanas_bas64, grafico_ventas_comp_sem_ppto_bas64 = preparar_graficos(
+                df_ventas_x_diasem=df_ventas_x_diasem, 
+                df_semanal_vs_ppto=df_semanal_vs_ppto,
+                fecha=fecha
+            )
+            etapa.anotar(filas=len(df_ventas_x_diasem) + len(df_semanal_vs_ppto), bytes_salida=len(grafico_ventas_comp_semanas_bas64) + len(grafico_ventas_comp_sem_ppto_bas64))
+        checkpoint.guardar_archivos("graficos", {
+            "ventas_comp_semanas.png": base64.b64decode(grafico_ventas_comp_semanas_bas64),
+            "ventas_comp_sem_ppto.png": base64.b64decode(grafico_ventas_comp_sem_ppto_bas64),
+        })
+    
+    return {
+        'fecha': fecha,
+        'df_ventas_x_sku': df_ventas_x_sku,
+        'df_ventas_x_categoria': df_ventas_x_categoria,
+        'tabla_unidades_html': tabla_unidades_html,
+        'comentario_und': comentario_und,
+        'tabla_quiebres_html': tabla_quiebres_html,
+        'grafico_ventas_comp_semanas_bas64': grafico_ventas_comp_semanas_bas64,
+        'grafico_ventas_comp_sem_ppto_bas64': grafico_ventas_comp_sem_ppto_bas64,
+    }
+
+def archivar_comunes(archivo, run_id, fecha, dataframes, comunes):
+    """ Fuentes, tablas y gráficos comunes de la ejecución en el archivo de reportes """
+    archivo.guardar(run_id, fecha, "reporte_diario", {
+        "tabla_unidades.html": comunes['tabla_unidades_html'],
+        "tabla_quiebres.html": comunes['tabla_quiebres_html'],
+        "comentario_und.txt": str(comunes['comentario_und']),
+        "ventas_comp_semanas.png": base64.b64decode(comunes['grafico_ventas_comp_semanas_bas64']),
+        "ventas_comp_sem_ppto.png": base64.b64decode(comunes['grafico_ventas_comp_sem_ppto_bas64']),
+    }, dataframes=dataframes if ARCHIVO_CONFIG['fuentes'] else None)
+
+def archivar_mensajes(archivo, run_id, fecha, mensajes, resultados):
+    """ Cuerpo y adjuntos de cada mensaje enviado, con el resultado del envío; luego la poda por retención """
+    for resultado in resultados:
+        archivos, datos = partes_mensaje(mensajes[resultado.etiqueta])
+        archivo.guardar(run_id, fecha, f"reporte_diario.{resultado.etiqueta}", archivos,
+                        datos={**datos, 'enviado': resultado.ok, 'errores': resultado.errores})
+    if ARCHIVO_CONFIG['retencion_dias']:
+        archivo.podar(ARCHIVO_CONFIG['retencion_dias'])
+
+def ejecutar_reporte_diario(args, fuente_compartida=None):
+    if args.resume:
+        checkpoint = CheckpointEjecucion.retomar(CHECKPOINTS_CONFIG['directorio'], args.resume, compresion=CHECKPOINTS_CONFIG['compresion'])
+        modo = checkpoint.modo
+        if modo is None:
+            raise ValueError(f"El checkpoint '{args.resume}' no registra si fue --dry-run o --replay; "
+                             f"no se retoma para no enviar datos que no correspondan")
+        # Se retoma en el modo original: un --dry-run sigue sin enviar y un --replay no manda datos viejos
+        args.replay = modo['replay']
+        args.dry_run = args.dry_run or modo['dry_run']
+        if args.replay or args.dry_run:
+            logger.info(f"⏯️ Se retoma en el modo original ({'--replay ' + args.replay if args.replay else '--dry-run'}): no se envía el correo.")
+        fecha = checkpoint.fecha or datetime.now().date()
+    else:
+        fecha = datetime.now().date()
+        # fecha = date(2025, 8, 1)
+        checkpoint = CheckpointEjecucion(CHECKPOINTS_CONFIG['directorio'], metricas.run_id,
+                                         habilitado=CHECKPOINTS_CONFIG['habilitado'], compresion=CHECKPOINTS_CONFIG['compresion'],
+                                         modo={'dry_run': args.dry_run, 'replay': args.replay})
+        if args.watch and not args.replay and not esperar_formulario_completo(fecha):
+            return False
+    enviar = not (args.dry_run or args.replay)
+    # El registro de envíos solo aplica a ejecuciones que envían; --force lo ignora (igual registra)
+    registro = RegistroEjecuciones(REGISTRO_CONFIG['ruta'], REGISTRO_CONFIG['ttl_minutos']) if enviar and REGISTRO_CONFIG['habilitado'] else None
+    # Historial de lo enviado (contenido deduplicado): solo de las ejecuciones que envían
+    archivo = ArchivoReportes(ARCHIVO_CONFIG['directorio'], ARCHIVO_CONFIG['nivel_compresion'],
+                              ARCHIVO_CONFIG['particiones']) if enviar and ARCHIVO_CONFIG['habilitado'] else None
+    
+    # Si todos los mensajes ya están en el checkpoint (reenvío), no se recalcula nada: solo SMTP
+    comunes = None
+    decisiones = {}
+    huella = checkpoint.datos("fuentes").get('huella') if checkpoint.completa("fuentes") else None
+    pendientes = [clave for clave in PERFILES_DESTINATARIOS if not checkpoint.completa(f"mensaje.{clave}")]
+    if pendientes:
+        fecha, dataframes = obtener_fuentes(args, fecha, checkpoint, fuente_compartida)
+        if registro is not None:
+            if huella is None:
+                huella = huella_entradas(dataframes)
+                if checkpoint.completa("fuentes"):
+                    # Al retomar, el registro usa la huella de las fuentes originales
+                    checkpoint.marcar("fuentes", archivos=checkpoint.datos("fuentes")['archivos'], huella=huella)
+            if not args.force:
+                decisiones = {clave: registro.consultar(f"reporte_diario.{clave}", fecha,
+                                                        PERFILES_DESTINATARIOS[clave]['destinatarios'], huella)
+                              for clave in pendientes}
+        # Las etapas comunes se calculan solo si algún perfil necesita generar su mensaje
+        if any(decisiones.get(clave, {}).get('accion', 'generar') == 'generar' for clave in pendientes):
+            comunes = ejecutar_etapas_comunes(args, fecha, checkpoint, dataframes)
+            if comunes is None:
+                return False
+            if archivo is not None:
+                with medir_etapa("archivo"):
+                    archivar_comunes(archivo, checkpoint.run_id, fecha, dataframes, comunes)
+        else:
+            logger.info("🗃️ Fuentes sin cambios respecto de lo ya generado: se omiten las etapas comunes.")
+    
+    # 5. Tablas, KPIs y mensaje por perfil de destinatarios.
+    # Los perfiles que filtran a los mismos datos reutilizan las tablas ya generadas.
+    cache = CacheRender()
+    # Tablas y gráficos comunes se codifican a UTF-8 una vez por ejecución (no por proceso: el daemon no los retiene)
+    codificados = {}
+    exito = True
+    cola = ColaEnvios(SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, PASSWORD, **SMTP_ENVIO_CONFIG)
+    encolados = {}
+    destinatarios_perfil = {}
+    for clave_perfil, perfil in PERFILES_DESTINATARIOS.items():
+        etapa_mensaje = f"mensaje.{clave_perfil}"
+        reporte = f"reporte_diario.{clave_perfil}"
+        decision = decisiones.get(clave_perfil, {'accion': 'generar'})
+        if checkpoint.completa(etapa_mensaje):
+            if checkpoint.datos(etapa_mensaje).get('omitido'):
+                continue
+            mensaje = checkpoint.cargar_mensaje(clave_perfil)
+            destinatarios = checkpoint.datos(etapa_mensaje)['destinatarios']
+        elif decision['accion'] == 'omitir':
+            logger.info(f"🗃️ Perfil '{clave_perfil}': ya enviado el {formatear_fecha(fecha)} con las mismas fuentes, se omite.")
+            checkpoint.marcar(etapa_mensaje, omitido=True)
+            continue
+        elif decision['accion'] == 'reutilizar':
+            destinatarios = perfil['destinatarios']
+            mensaje = registro.cargar_mensaje(decision['ruta'], destinatarios)
+            logger.info(f"🗃️ Perfil '{clave_perfil}': mensaje reutilizado del registro ({decision['huella_salida'][:12]}).")
+            registro.registrar_generado(reporte, fecha, destinatarios, huella, mensaje, decision['huella_salida'], 0.0, checkpoint.run_id)
+            checkpoint.guardar_mensaje(etapa_mensaje, clave_perfil, mensaje, destinatarios)
+        else:
+            inicio_mensaje = time.perf_counter()
+            with medir_etapa("cuerpo_email") as etapa:
+                df_sku_perfil = filtrar_por_categorias(comunes['df_ventas_x_sku'], perfil.get('categorias'))
+                df_categoria_perfil = filtrar_por_categorias(comunes['df_ventas_x_categoria'], perfil.get('categorias'))
+                if df_sku_perfil.empty and df_categoria_perfil.empty:
+                    logger.warning(f"⚠️ El perfil '{clave_perfil}' no tiene ventas en sus categorías; no se envía.")
+                    checkpoint.marcar(etapa_mensaje, omitido=True)
+                    continue
+                # El detalle completo va adjunto (antes de format_table, que renombra las columnas del perfil)
+                adjuntos = []
+                if EXPORTACION_CONFIG['habilitado']:
+                    # El nombre del archivo lleva el perfil: no se comparte entre perfiles aunque los datos coincidan
+                    ruta_adjunto = cache.obtener(
+                        f"adjunto.{clave_perfil}", (df_sku_perfil, df_categoria_perfil),
+                        lambda: preparar_adjunto(df_sku_perfil, df_categoria_perfil, fecha, clave_perfil)
+                    )
+                    adjuntos = [ruta_adjunto] if ruta_adjunto else []
+                (tabla_ventas_x_categoria_html, tabla_ventas_x_sku_html,
+                 total_ventas_formato, total_kg_formato, precio_prom) = cache.obtener(
+                    "tablas_ventas", (df_sku_perfil, df_categoria_perfil),
+                    lambda: preparar_tablas_ventas(df_sku_perfil, df_categoria_perfil)
+                )
+                cuerpo_mensaje = construir_cuerpo_email(
+                    tabla_unidades_html=comunes['tabla_unidades_html'], 
+                    tabla_ventas_x_categoria_html=tabla_ventas_x_categoria_html, 
+                    tabla_ventas_x_sku_html=tabla_ventas_x_sku_html,
+                    comentario_und=comunes['comentario_und'], 
+                    total_ventas_formato=total_ventas_formato, 
+                    total_kg_formato=total_kg_formato, 
+                    precio_prom=precio_prom,
+                    grafico_ventas_comp_semanas_bas64=comunes['grafico_ventas_comp_semanas_bas64'], 
+                    grafico_ventas_comp_sem_ppto_bas64=comunes['grafico_ventas_comp_sem_ppto_bas64'],
+                    tabla_quiebres_html=comunes['tabla_quiebres_html'],
+                    codificados=codificados
+                )
+                destinatarios = perfil['destinatarios']
+                mensaje = construir_mensaje(cuerpo_mensaje, destinatarios, construir_asunto(formatear_fecha(fecha)), SENDER_EMAIL,
+                                            adjuntos=adjuntos)
+                etapa.anotar(filas=len(df_sku_perfil) + len(df_categoria_perfil), bytes_salida=len(cuerpo_mensaje))
+            if registro is not None:
+                # La huella de salida es la del contenido (cuerpo y adjuntos), no la del MIME: el separador es aleatorio
+                huella_salida = hashlib.sha1(b"\0".join([mensaje["Subject"].encode(), cuerpo_mensaje,
+                                                           *(os.path.basename(a).encode() for a in adjuntos)])).hexdigest()
+                registro.registrar_generado(reporte, fecha, destinatarios, huella, mensaje, huella_salida,
+                                            time.perf_counter() - inicio_mensaje, checkpoint.run_id)
+            checkpoint.guardar_mensaje(etapa_mensaje, clave_perfil, mensaje, destinatarios)
+        if not enviar:
+            print(f"ℹ️ Perfil '{clave_perfil}': ejecución sin envío de correo (mensaje de {len(mensaje.as_bytes()):,} bytes).")
+            continue
+        if checkpoint.completa(f"smtp.{clave_perfil}"):
+            logger.info(f"✉️ Perfil '{clave_perfil}': ya enviado en esta ejecución, se omite.")
+            continue
+        if registro is not None and huella is not None and not args.force and \
+                not registro.reservar(reporte, fecha, destinatarios, huella, checkpoint.run_id):
+            continue
+        # Un envío dividido en partes que falló a medias: solo se reenvía a quienes no lo recibieron.
+        # El checkpoint lo sabe al retomar; el registro, también en una ejecución nueva con las mismas fuentes
+        entregados = set(checkpoint.datos(f"smtp_parcial.{clave_perfil}")['entregados']) \
+            if checkpoint.completa(f"smtp_parcial.{clave_perfil}") else set()
+        if registro is not None and huella is not None and not args.force:
+            entregados.update(registro.entregados(reporte, fecha, destinatarios, huella))
+        pendientes = [d for d in destinatarios if d not in entregados]
+        if entregados:
+            logger.info(f"✉️ Perfil '{clave_perfil}': {len(destinatarios) - len(pendientes)} destinatarios ya lo recibieron, "
+                        f"se reenvía a {len(pendientes)}.")
+        cola.agregar(mensaje, pendientes, etiqueta=clave_perfil)
+        encolados[clave_perfil] = mensaje
+        destinatarios_perfil[clave_perfil] = destinatarios
+    
+    # 6. Enviar los correos pendientes por sesiones SMTP concurrentes
+    if enviar:
+        with medir_etapa("smtp") as etapa:
+            resultados = cola.enviar()
+            for resultado in resultados:
+                if resultado.ok:
+                    checkpoint.marcar(f"smtp.{resultado.etiqueta}")
+                else:
+                    exito = False
+                    if resultado.entregados:
+                        previos = checkpoint.datos(f"smtp_parcial.{resultado.etiqueta}")['entregados'] \
+                            if checkpoint.completa(f"smtp_parcial.{resultado.etiqueta}") else []
+                        checkpoint.marcar(f"smtp_parcial.{resultado.etiqueta}", entregados=previos + resultado.entregados)
+                if registro is not None and huella is not None:
+                    registro.registrar_envio(f"reporte_diario.{resultado.etiqueta}", fecha, destinatarios_perfil[resultado.etiqueta],
+                                             resultado.ok, resultado.latencia, "; ".join(resultado.errores) or None,
+                                             entregados=resultado.entregados)
+            etapa.anotar(filas=len(resultados))
+        if archivo is not None and resultados:
+            with medir_etapa("archivo"):
+                archivar_mensajes(archivo, checkpoint.run_id, fecha, encolados, resultados)
+    logger.info(f"♻️ Cache de render: {cache.aciertos} reutilizados, {cache.fallos} generados")
+    checkpoint.finalizar(exito)
+    if EXPORTACION_CONFIG['habilitado']:
+        podar_adjuntos(EXPORTACION_CONFIG['directorio'], EXPORTACION_CONFIG['retencion_dias'], excluir=metricas.run_id)
+    if checkpoint.habilitado:
+        CheckpointEjecucion.podar(CHECKPOINTS_CONFIG['directorio'], CHECKPOINTS_CONFIG['conservar_completas'],
+                                  CHECKPOINTS_CONFIG['retencion_incompletas_dias'], excluir=checkpoint.run_id)
+    if not exito and checkpoint.habilitado:
+        logger.error(f"❌ Envío incompleto. Para reintentar solo lo pendiente: python main.py --resume {checkpoint.run_id}")
+    return exito
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
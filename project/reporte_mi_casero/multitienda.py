@@ -0,0 +1,271 @@
+"""
+Modo multi-tienda: ejecuta el pipeline completo para varias tiendas en un solo proceso.
+
+    python multitienda.py                          # todas las tiendas de TIENDAS_CONFIG, hoy
+    python multitienda.py --tiendas mi_casero otra --fecha 01/08/2025 --dry-run
+
+Extracción compartida:
+- Los reportes de REPORTES_MULTITIENDA_CONFIG (SP consolidados) se ejecutan una vez por base de datos
+  y se particionan en memoria por su columna de tienda.
+- El resto de reportes se ejecuta una vez por combinación distinta de base de datos y parámetros;
+  si el SP recibe el parámetro 'tienda', se le pasa el `id_tienda` de cada tienda.
+  Si dos tiendas comparten base y algún reporte no se puede filtrar por tienda, el lote no arranca
+  (`validar_filtro_tienda`): ambas recibirían los mismos datos.
+- Los formularios de Google Sheets de las tiendas se leen en paralelo (uno por formulario distinto).
+
+Las tablas, gráficos y cuerpos de correo de cada tienda se generan en un pool de procesos
+(Kaleido se inicia una vez por proceso) y los correos se envían desde el proceso principal.
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Tuple
+import pandas as pd
+
+from service.conect_db import ReporteExecutor, crear_backend
+from service.almacen_local import crear_almacen
+from service.fuentes import FuenteProduccion
+from service.email_service import ColaEnvios, construir_asunto, construir_mensaje
+from config.config import (GOOGLE_SHEET_CREDENTIALS, ACCESOS_SHEET_GOOGLE, REPORTES_CONFIG, DB_CONFIG, DB_BACKEND,
+                           ALMACEN_LOCAL_CONFIG, METRICAS_CONFIG, TIENDAS_CONFIG, REPORTES_MULTITIENDA_CONFIG,
+                           MULTITIENDA_CONFIG, SENDER_EMAIL, SMTP_SERVER, SMTP_PORT, PASSWORD, SMTP_ENVIO_CONFIG)
+from utils.logs import main_loger
+from validators.validator_data import DatosInvalidosError
+from utils.fechas import normalizar_fecha, formatear_fecha
+from utils.metricas import metricas, medir_etapa
+from utils.convertir_img_base64 import calentar_kaleido
+from main import generar_cuerpo_reporte
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+FORM_MOVIMIENTOS = 'form_mov_pollos'
+
+
+def _clave_db(db_config: dict) -> str:
+    return json.dumps(db_config, sort_keys=True, default=str)
+
+
+def particionar_por_tienda(df: pd.DataFrame, columna_tienda: str) -> Dict[Any, pd.DataFrame]:
+    """ Parte la salida de un SP consolidado en un DataFrame por tienda (una sola pasada de groupby) """
+    if columna_tienda not in df.columns:
+        raise ValueError(f"El SP consolidado no devolvió la columna de tienda '{columna_tienda}'.")
+    return {
+        id_tienda: grupo.drop(columns=columna_tienda).reset_index(drop=True)
+        for id_tienda, grupo in df.groupby(columna_tienda, sort=False)
+    }
+
+
+def validar_filtro_tienda(tiendas: Dict[str, dict]) -> None:
+    """
+    Las tiendas que comparten base de datos solo pueden recibir reportes filtrados por tienda: un SP
+    consolidado (REPORTES_MULTITIENDA_CONFIG) o uno de REPORTES_CONFIG con 'tienda' en sus params.
+    Lanza ValueError si algún reporte devolvería los mismos datos a varias tiendas.
+    """
+    por_db: Dict[str, List[str]] = {}
+    for clave_tienda, tienda in tiendas.items():
+        por_db.setdefault(_clave_db(tienda.get('db_config') or DB_CONFIG), []).append(clave_tienda)
+    sin_filtro = [nombre for nombre, config in REPORTES_CONFIG.items()
+                  if nombre not in REPORTES_MULTITIENDA_CONFIG and 'tienda' not in config['params']]
+    compartidas = [claves for claves in por_db.values() if len(claves) > 1]
+    if compartidas and sin_filtro:
+        raise ValueError(
+            f"Las tiendas {compartidas} comparten base de datos, pero los reportes {sin_filtro} no se pueden "
+            f"filtrar por tienda: todas recibirían los mismos datos. Configura un SP consolidado en "
+            f"REPORTES_MULTITIENDA_CONFIG, agrega 'tienda' a los params del SP o un 'db_config' propio por tienda."
+        )
+
+
+class ExtraccionMultitienda:
+    """
+    Planifica y ejecuta las consultas de todas las tiendas sin repetir ninguna:
+    cada consulta distinta (SP consolidado, reporte con sus parámetros o formulario) se
+    registra una vez con su clave y se ejecuta en un pool de hilos.
+    """
+
+    def __init__(self, tiendas: Dict[str, dict], hilos: int):
+        self.tiendas = tiendas
+        self.hilos = hilos
+        self._fuentes: Dict[str, FuenteProduccion] = {}
+        self._consolidados: Dict[str, ReporteExecutor] = {}
+
+    def _fuente(self, db_config: dict) -> Tuple[FuenteProduccion, ReporteExecutor]:
+        """ Una fuente (pool de conexiones) por base de datos distinta """
+        clave = _clave_db(db_config)
+        if clave not in self._fuentes:
+            backend = crear_backend(DB_BACKEND, db_config, tamanio_pool=self.hilos)
+            # El almacén local guarda la historia de la base principal (DB_CONFIG)
+            executor = ReporteExecutor(db_config=db_config, reportes_config=REPORTES_CONFIG, backend=backend,
+                                       almacen=crear_almacen(ALMACEN_LOCAL_CONFIG) if db_config is DB_CONFIG else None)
+            self._fuentes[clave] = FuenteProduccion(executor, GOOGLE_SHEET_CREDENTIALS, ACCESOS_SHEET_GOOGLE)
+            # Los SP consolidados comparten el backend (y su pool) de la misma base
+            self._consolidados[clave] = ReporteExecutor(db_config=db_config, reportes_config=REPORTES_MULTITIENDA_CONFIG,
+                                                        backend=backend)
+        return self._fuentes[clave], self._consolidados[clave]
+
+    def planificar(self, fecha: date) -> Tuple[Dict[tuple, Callable[[], pd.DataFrame]], Dict[str, Dict[str, tuple]]]:
+        """
+        Devuelve (consultas, plan): `consultas` mapea cada clave de consulta distinta a la función
+        que la ejecuta; `plan[tienda][nombre]` es (clave de consulta, id de tienda a particionar o None).
+        """
+        validar_filtro_tienda(self.tiendas)
+        fecha_sp = formatear_fecha(fecha)
+        consultas: Dict[tuple, Callable[[], pd.DataFrame]] = {}
+        plan: Dict[str, Dict[str, tuple]] = {}
+        for clave_tienda, tienda in self.tiendas.items():
+            db_config = tienda.get('db_config') or DB_CONFIG
+            fuente, consolidado = self._fuente(db_config)
+            db = _clave_db(db_config)
+            plan[clave_tienda] = {}
+            for nombre, config in REPORTES_CONFIG.items():
+                if nombre in REPORTES_MULTITIENDA_CONFIG:
+                    params = REPORTES_MULTITIENDA_CONFIG[nombre]['params']
+                    kwargs = {'fecha': fecha_sp} if 'fecha' in params else {}
+                    clave = ('consolidado', db, nombre, tuple(sorted(kwargs.items())))
+                    consultas.setdefault(clave, lambda e=consolidado, n=nombre, k=kwargs: e.ejecutar_reporte(n, **k))
+                    plan[clave_tienda][nombre] = (clave, tienda['id_tienda'])
+                    continue
+                kwargs = {'fecha': fecha_sp} if 'fecha' in config['params'] else {}
+                if 'tienda' in config['params']:
+                    kwargs['tienda'] = tienda['id_tienda']
+                clave = ('reporte', db, nombre, tuple(sorted(kwargs.items())))
+                consultas.setdefault(clave, lambda f=fuente, n=nombre, k=kwargs: f.obtener_reporte(n, **k))
+                plan[clave_tienda][nombre] = (clave, None)
+            form = tienda.get('form_mov_pollos', FORM_MOVIMIENTOS)
+            clave = ('sheet', form)
+            consultas.setdefault(clave, lambda f=fuente, s=form: f.obtener_sheet(s))
+            plan[clave_tienda][FORM_MOVIMIENTOS] = (clave, None)
+        return consultas, plan
+
+    def obtener(self, fecha: date) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """ DataFrames de origen de cada tienda: {tienda: {reporte o formulario: DataFrame}} """
+        consultas, plan = self.planificar(fecha)
+        with medir_etapa("lote.fetch") as etapa:
+            with ThreadPoolExecutor(max_workers=self.hilos) as hilos:
+                futuros = {clave: hilos.submit(consulta) for clave, consulta in consultas.items()}
+                resultados = {clave: futuro.result() for clave, futuro in futuros.items()}
+            etapa.anotar(filas=sum(len(df) for df in resultados.values()))
+        logger.info(f"✅ {len(consultas)} consultas distintas para {len(self.tiendas)} tiendas")
+
+        particiones: Dict[tuple, Dict[Any, pd.DataFrame]] = {}
+        dataframes: Dict[str, Dict[str, pd.DataFrame]] = {}
+        for clave_tienda, consultas_tienda in plan.items():
+            dataframes[clave_tienda] = {}
+            for nombre, (clave, id_tienda) in consultas_tienda.items():
+                df = resultados[clave]
+                if id_tienda is not None:
+                    if clave not in particiones:
+                        particiones[clave] = particionar_por_tienda(df, REPORTES_MULTITIENDA_CONFIG[nombre]['columna_tienda'])
+                    columna = REPORTES_MULTITIENDA_CONFIG[nombre]['columna_tienda']
+                    df = particiones[clave].get(id_tienda, df.iloc[0:0].drop(columns=columna))
+                dataframes[clave_tienda][nombre] = df
+        return dataframes
+
+    def cerrar(self) -> None:
+        for fuente in self._fuentes.values():
+            fuente.cerrar()
+
+
+def procesar_tienda(clave_tienda: str, fecha: date, dfs: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    """ Validación, tablas, gráficos y cuerpo del correo de una tienda (en un proceso trabajador) """
+    inicio = time.perf_counter()
+    try:
+        cuerpo_mensaje, _ = generar_cuerpo_reporte(dfs, fecha)
+    except DatosInvalidosError as e:
+        return {"tienda": clave_tienda, "estado": "invalido", "detalle": str(e), "cuerpo": None,
+                "segundos": time.perf_counter() - inicio}
+    return {"tienda": clave_tienda, "estado": "ok", "detalle": f"{len(cuerpo_mensaje):,} bytes",
+            "cuerpo": cuerpo_mensaje, "segundos": time.perf_counter() - inicio}
+
+
+def ejecutar_lote(tiendas: Dict[str, dict], fecha: date, enviar: bool, procesos: int, hilos: int) -> List[Dict[str, Any]]:
+    if not tiendas:
+        return []
+    extraccion = ExtraccionMultitienda(tiendas, hilos)
+    try:
+        dataframes = extraccion.obtener(fecha)
+    finally:
+        extraccion.cerrar()
+
+    resultados = []
+    with medir_etapa("lote.render") as etapa:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(tiendas)), initializer=calentar_kaleido) as pool:
+            futuros = {pool.submit(procesar_tienda, clave, fecha, dfs): clave for clave, dfs in dataframes.items()}
+            for futuro, clave in futuros.items():
+                try:
+                    resultados.append(futuro.result())
+                except Exception as e:
+                    logger.error(f"❌ Error generando el reporte de la tienda '{clave}': {e}")
+                    resultados.append({"tienda": clave, "estado": "error", "detalle": str(e), "cuerpo": None, "segundos": 0.0})
+        etapa.anotar(filas=len(resultados))
+
+    if not enviar:
+        return resultados
+    # Los correos de todas las tiendas se drenan por un pool de sesiones SMTP
+    with medir_etapa("lote.smtp") as etapa:
+        cola = ColaEnvios(SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, PASSWORD, **SMTP_ENVIO_CONFIG)
+        por_tienda = {}
+        for resultado in resultados:
+            if resultado["estado"] != "ok":
+                continue
+            tienda = tiendas[resultado["tienda"]]
+            asunto = construir_asunto(formatear_fecha(fecha), f"Reporte Diario de Ventas {tienda['nombre']}")
+            msg = construir_mensaje(resultado["cuerpo"], tienda['destinatarios'], asunto, SENDER_EMAIL)
+            cola.agregar(msg, tienda['destinatarios'], etiqueta=resultado["tienda"])
+            por_tienda[resultado["tienda"]] = resultado
+            etapa.anotar(bytes_salida=len(resultado["cuerpo"]))
+        for envio in cola.enviar():
+            resultado = por_tienda[envio.etiqueta]
+            resultado["envio"] = envio.a_dict()
+            if not envio.ok:
+                resultado.update(estado="error", detalle=f"Falló el envío del correo: {'; '.join(envio.errores)}")
+    return resultados
+
+
+def parsear_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Reporte diario para varias tiendas en un solo proceso")
+    parser.add_argument("--tiendas", nargs="+", metavar="TIENDA", help="Claves de TIENDAS_CONFIG (por defecto todas)")
+    parser.add_argument("--fecha", help="Fecha del reporte (dd/mm/YYYY o YYYY-MM-DD, por defecto hoy)")
+    parser.add_argument("--procesos", type=int, default=MULTITIENDA_CONFIG['procesos'],
+                        help="Procesos para tablas, gráficos y cuerpos de correo")
+    parser.add_argument("--hilos", type=int, default=MULTITIENDA_CONFIG['hilos'],
+                        help="Consultas y lecturas de Sheets simultáneas")
+    parser.add_argument("--dry-run", action="store_true", help="Genera los reportes sin enviar correos")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parsear_argumentos(argv)
+    main_loger()
+    metricas.configurar(habilitado=METRICAS_CONFIG['habilitado'], usar_tracemalloc=METRICAS_CONFIG['tracemalloc'])
+    claves = args.tiendas or list(TIENDAS_CONFIG)
+    desconocidas = [c for c in claves if c not in TIENDAS_CONFIG]
+    if desconocidas:
+        raise SystemExit(f"❌ Tiendas no configuradas: {desconocidas}. Disponibles: {list(TIENDAS_CONFIG)}")
+    if not claves:
+        print("ℹ️ No hay tiendas en TIENDAS_CONFIG; no se genera ningún reporte.")
+        return 0
+    try:
+        validar_filtro_tienda({c: TIENDAS_CONFIG[c] for c in claves})
+    except ValueError as e:
+        raise SystemExit(f"❌ Configuración multi-tienda inválida: {e}")
+    fecha = normalizar_fecha(args.fecha) if args.fecha else datetime.now().date()
+    inicio = time.perf_counter()
+    try:
+        resultados = ejecutar_lote({c: TIENDAS_CONFIG[c] for c in claves}, fecha, not args.dry_run, args.procesos, args.hilos)
+    finally:
+        metricas.exportar(METRICAS_CONFIG['directorio'])
+    for r in resultados:
+        icono = "✅" if r["estado"] == "ok" else "❌"
+        smtp = f"  smtp {r['envio']['latencia']:.2f}s" if r.get("envio") else ""
+        print(f"{icono} {r['tienda']:<20} {r['estado']:<8} {r['segundos']:6.1f}s{smtp}  {r['detalle']}")
+    correctas = sum(r["estado"] == "ok" for r in resultados)
+    print(f"ℹ️ Multi-tienda: {correctas}/{len(resultados)} tiendas en {time.perf_counter() - inicio:.1f}s")
+    return 0 if correctas == len(resultados) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+"""
+Análisis de roturas de stock: cruza el formulario `form_rotura_stock` con las ventas por SKU
+y el stock diario del formulario de movimientos, por (tienda, fecha, producto).
+
+    python roturas.py --desde 01/06/2025 --hasta 31/08/2025 --hilos-db 4
+
+Escribe en <directorio>/<desde>_<hasta>/:
+    dias_rotura.parquet   un registro por día-SKU con rotura: horas sin stock, venta del día
+                          frente a su base de los días previos sin rotura y stock del día
+    resumen_sku.parquet   por SKU: días y horas de rotura, caída de venta y caída por hora
+
+Las ventas por SKU se consultan una vez por día del rango (más los días de base) en un pool de
+hilos; si `REPORTES_MULTITIENDA_CONFIG` define el SP consolidado de `ventas_x_sku`, se usa ese
+(todas las tiendas en una consulta por día) y el cruce es por tienda. El cruce se resuelve con
+claves enteras ordenadas (`data/roturas_stock.py`), sin `merge`.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Optional, Tuple
+import pandas as pd
+
+from service.conect_db import ReporteExecutor, crear_backend
+from service.almacen_local import crear_almacen
+from service.fuentes import FuenteProduccion
+from config.config import (GOOGLE_SHEET_CREDENTIALS, ACCESOS_SHEET_GOOGLE, REPORTES_CONFIG, DB_CONFIG, DB_BACKEND,
+                           ALMACEN_LOCAL_CONFIG, METRICAS_CONFIG, REPORTES_MULTITIENDA_CONFIG, ROTURAS_CONFIG)
+from utils.logs import main_loger
+from data.transformar import transformar_df_sheet_google, preparar_df_sheet_google
+from data.roturas_stock import preparar_form_rotura, unir_roturas_ventas, resumir_roturas_por_sku, horas_atencion
+from utils.fechas import normalizar_fecha, formatear_fecha
+from utils.metricas import metricas, medir_etapa
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def crear_fuente_roturas(hilos_db: int) -> Tuple[FuenteProduccion, Optional[str]]:
+    """ Fuente de producción y columna de tienda del SP consolidado de `ventas_x_sku` (None si no hay) """
+    backend = crear_backend(DB_BACKEND, DB_CONFIG, tamanio_pool=hilos_db)
+    consolidado = REPORTES_MULTITIENDA_CONFIG.get('ventas_x_sku')
+    if consolidado:
+        executor = ReporteExecutor(db_config=DB_CONFIG, reportes_config=REPORTES_MULTITIENDA_CONFIG, backend=backend)
+    else:
+        executor = ReporteExecutor(db_config=DB_CONFIG, reportes_config=REPORTES_CONFIG, backend=backend,
+                                   almacen=crear_almacen(ALMACEN_LOCAL_CONFIG))
+    fuente = FuenteProduccion(executor, GOOGLE_SHEET_CREDENTIALS, ACCESOS_SHEET_GOOGLE)
+    return fuente, (consolidado['columna_tienda'] if consolidado else None)
+
+
+def obtener_ventas_rango(fuente: FuenteProduccion, desde: date, hasta: date, hilos_db: int,
+                         columna_tienda: Optional[str] = None) -> pd.DataFrame:
+    """ `ventas_x_sku` de cada día del rango, con columna 'Fecha' (y 'Tienda' si viene `columna_tienda`) """
+
+    def _dia(fecha: date) -> pd.DataFrame:
+        df = fuente.obtener_reporte('ventas_x_sku', fecha=formatear_fecha(fecha)).assign(Fecha=pd.Timestamp(fecha))
+        if columna_tienda:
+            df = df.rename(columns={columna_tienda: 'Tienda'}).astype({'Tienda': str})
+        return df
+
+    with ThreadPoolExecutor(max_workers=hilos_db) as hilos:
+        dias = [df for df in hilos.map(_dia, (d.date() for d in pd.date_range(desde, hasta))) if not df.empty]
+    return pd.concat(dias, ignore_index=True) if dias else pd.DataFrame(columns=['Fecha', 'ProductoNombre', 'Cantidad', 'VentaSoles'])
+
+
+def ejecutar_analisis(desde: date, hasta: date, directorio: str, hilos_db: int) -> Tuple[pd.DataFrame, pd.DataFrame, str]:
+    fuente, columna_tienda = crear_fuente_roturas(hilos_db)
+    try:
+        with medir_etapa("roturas.formularios") as etapa:
+            df_rotura = fuente.obtener_sheet(ROTURAS_CONFIG['form'])
+            df_mov = fuente.obtener_sheet(ROTURAS_CONFIG['form_movimientos'])
+            eventos = preparar_form_rotura(df_rotura, ROTURAS_CONFIG['columnas'],
+                                           ROTURAS_CONFIG['hora_apertura'], ROTURAS_CONFIG['hora_cierre'])
+            eventos = eventos[(eventos['Fecha'] >= pd.Timestamp(desde)) & (eventos['Fecha'] <= pd.Timestamp(hasta))]
+            df_stock = transformar_df_sheet_google(preparar_df_sheet_google(df_mov)) if not df_mov.empty else pd.DataFrame()
+            etapa.anotar(filas=len(df_rotura) + len(df_mov))
+
+        with medir_etapa("roturas.ventas") as etapa:
+            # Los días previos al rango dan la venta base de las primeras roturas
+            df_ventas = obtener_ventas_rango(fuente, desde - timedelta(days=ROTURAS_CONFIG['dias_base']), hasta,
+                                             hilos_db, columna_tienda)
+            etapa.anotar(filas=len(df_ventas))
+    finally:
+        fuente.cerrar()
+
+    with medir_etapa("roturas.cruce") as etapa:
+        df_dias = unir_roturas_ventas(eventos, df_ventas, df_stock, ROTURAS_CONFIG['dias_base'],
+                                      horas_atencion(ROTURAS_CONFIG['hora_apertura'], ROTURAS_CONFIG['hora_cierre']))
+        df_resumen = resumir_roturas_por_sku(df_dias)
+        etapa.anotar(filas=len(eventos) + len(df_ventas) + len(df_stock))
+
+    ruta = os.path.join(directorio, f"{desde.isoformat()}_{hasta.isoformat()}")
+    os.makedirs(ruta, exist_ok=True)
+    df_dias.to_parquet(os.path.join(ruta, "dias_rotura.parquet"), index=False)
+    df_resumen.to_parquet(os.path.join(ruta, "resumen_sku.parquet"), index=False)
+    return df_dias, df_resumen, ruta
+
+
+def parsear_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Cruce del formulario de roturas de stock con ventas y stock diario")
+    parser.add_argument("--desde", required=True, help="Primera fecha (dd/mm/YYYY o YYYY-MM-DD)")
+    parser.add_argument("--hasta", required=True, help="Última fecha, inclusive")
+    parser.add_argument("--directorio", default=ROTURAS_CONFIG['directorio'], help="Directorio de salida")
+    parser.add_argument("--hilos-db", type=int, default=ROTURAS_CONFIG['hilos_db'],
+                        help="Consultas simultáneas (tamaño del pool de conexiones)")
+    parser.add_argument("--top", type=int, default=15, help="SKUs a mostrar")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parsear_argumentos(argv)
+    main_loger()
+    metricas.configurar(habilitado=METRICAS_CONFIG['habilitado'], usar_tracemalloc=False)
+    inicio = time.perf_counter()
+    try:
+        df_dias, df_resumen, ruta = ejecutar_analisis(normalizar_fecha(args.desde), normalizar_fecha(args.hasta),
+                                                      args.directorio, args.hilos_db)
+    finally:
+        metricas.exportar(METRICAS_CONFIG['directorio'])
+    if df_resumen.empty:
+        print("ℹ️ No hay roturas registradas en el rango.")
+    else:
+        print(df_resumen.head(args.top).to_string(index=False, float_format=lambda x: f"{x:,.1f}"))
+    print(f"ℹ️ Roturas: {len(df_dias)} días-SKU analizados en {time.perf_counter() - inicio:.1f}s → {ruta}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
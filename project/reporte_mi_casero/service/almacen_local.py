@@ -0,0 +1,247 @@
+# Almacén analítico local (Parquet) para las comparaciones semanales del reporte
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import pandas as pd
+import logging
+
+from utils.fechas import normalizar_fecha, formatear_fecha
+from utils.metricas import medir_etapa
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+ARCHIVO_ESTADO = "estado.json"
+ARCHIVO_PRESUPUESTO = "presupuesto_semanal.parquet"
+DIRECTORIO_DIARIO = "ventas_diarias"
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+# Firma de la función que ejecuta un reporte contra el backend (SQL Server / SQLite)
+ObtenerReporte = Callable[..., pd.DataFrame]
+
+
+def _lunes(fecha: date) -> date:
+    return fecha - timedelta(days=fecha.weekday())
+
+
+def _particion(fecha: date) -> str:
+    anio, semana, _ = fecha.isocalendar()
+    return f"semana={anio}-W{semana:02d}.parquet"
+
+
+class AlmacenLocal:
+    """
+    Almacén local de agregados para `ventas_semanal_vs_ppto` y `ventas_comparativo_x_semana_x_dia`.
+
+    En lugar de recalcular toda la historia semanal en SQL Server en cada ejecución, guarda:
+
+        <directorio>/ventas_diarias/semana=2025-W31.parquet   venta y cantidad por día (una partición por semana ISO)
+        <directorio>/presupuesto_semanal.parquet              salida del SP semanal (presupuesto y venta de semanas antiguas)
+        <directorio>/estado.json                              primera fecha diaria y última sincronización del presupuesto
+
+    `sincronizar` solo trae de SQL Server los días que faltan más los últimos `dias_refresco`
+    (el día en curso siempre se vuelve a traer) a partir del total de `ventas_x_categoria`,
+    y el SP semanal solo cuando la semana actual no está o pasaron `refresco_presupuesto_dias`.
+    Las semanas cubiertas por la historia diaria usan la suma de los días como VentaReal.
+    """
+    REPORTES = ('ventas_semanal_vs_ppto', 'ventas_comparativo_x_semana_x_dia')
+
+    def __init__(self, directorio: str, dias_refresco: int = 1, refresco_presupuesto_dias: int = 7,
+                 vigencia_segundos: int = 300, compresion: str = "zstd"):
+        self.directorio = directorio
+        self.dias_refresco = dias_refresco
+        self.refresco_presupuesto_dias = refresco_presupuesto_dias
+        self.vigencia_segundos = vigencia_segundos
+        self.compresion = compresion
+        self._lock = threading.Lock()
+        self._sincronizado: Dict[date, float] = {}  # fecha -> time.monotonic() de la última sincronización
+
+    def responde(self, nombre_reporte: str) -> bool:
+        return nombre_reporte in self.REPORTES
+
+    # --- Estado y particiones ---
+
+    def _ruta(self, *partes: str) -> str:
+        return os.path.join(self.directorio, *partes)
+
+    def _leer_estado(self) -> Dict[str, Any]:
+        ruta = self._ruta(ARCHIVO_ESTADO)
+        if not os.path.exists(ruta):
+            return {"primera_fecha": None, "presupuesto_sincronizado": None}
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _escribir_estado(self, estado: Dict[str, Any]) -> None:
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = self._ruta(ARCHIVO_ESTADO + ".tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(estado, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, self._ruta(ARCHIVO_ESTADO))
+
+    def _escribir_parquet(self, df: pd.DataFrame, ruta: str) -> None:
+        # Escritura atómica: una ejecución interrumpida no deja particiones a medias
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = ruta + ".tmp"
+        df.to_parquet(temporal, compression=self.compresion, index=False)
+        os.replace(temporal, ruta)
+
+    def ventas_diarias(self) -> pd.DataFrame:
+        """ Historia diaria almacenada: columnas fecha (date), VentaSoles y Cantidad, ordenada por fecha """
+        directorio = self._ruta(DIRECTORIO_DIARIO)
+        archivos = sorted(os.listdir(directorio)) if os.path.isdir(directorio) else []
+        archivos = [a for a in archivos if a.endswith(".parquet")]
+        if not archivos:
+            return pd.DataFrame({"fecha": pd.Series(dtype=object), "VentaSoles": pd.Series(dtype=float),
+                                 "Cantidad": pd.Series(dtype=float)})
+        df = pd.concat([pd.read_parquet(os.path.join(directorio, a)) for a in archivos], ignore_index=True)
+        df["fecha"] = pd.to_datetime(df["fecha"]).dt.date
+        return df.sort_values("fecha").reset_index(drop=True)
+
+    def _guardar_dias(self, filas: List[Dict[str, Any]]) -> None:
+        """ Reescribe solo las particiones semanales de los días traídos """
+        por_particion: Dict[str, List[Dict[str, Any]]] = {}
+        for fila in filas:
+            por_particion.setdefault(_particion(fila["fecha"]), []).append(fila)
+        for particion, nuevas in por_particion.items():
+            ruta = self._ruta(DIRECTORIO_DIARIO, particion)
+            df_nuevas = pd.DataFrame(nuevas)
+            df_nuevas["fecha"] = df_nuevas["fecha"].map(date.isoformat)
+            if os.path.exists(ruta):
+                df_actual = pd.read_parquet(ruta)
+                df_actual = df_actual[~df_actual["fecha"].isin(df_nuevas["fecha"])]
+                df_nuevas = pd.concat([df_actual, df_nuevas], ignore_index=True)
+            self._escribir_parquet(df_nuevas.sort_values("fecha"), ruta)
+
+    # --- Sincronización incremental ---
+
+    @staticmethod
+    def _total_dia(df_categoria: pd.DataFrame) -> Dict[str, float]:
+        # Se suman las categorías (sin la fila 'Total' que agrega el SP)
+        if df_categoria.empty:
+            return {"VentaSoles": 0.0, "Cantidad": 0.0}
+        categorias = df_categoria[df_categoria["Categoria"] != "Total"]
+        return {
+            "VentaSoles": float(pd.to_numeric(categorias["VentaSoles"], errors="coerce").fillna(0).sum()),
+            "Cantidad": float(pd.to_numeric(categorias["Cantidad"], errors="coerce").fillna(0).sum()),
+        }
+
+    def dias_pendientes(self, fecha: date, almacenados: Iterable[date], primera_fecha: Optional[date]) -> List[date]:
+        """
+        Días a traer para dejar la historia diaria completa desde la primera fecha
+        (como mínimo el lunes de la semana anterior) hasta `fecha`.
+        """
+        desde = _lunes(fecha) - timedelta(days=7)
+        if primera_fecha is not None:
+            desde = min(desde, primera_fecha)
+        almacenados = set(almacenados)
+        refresco = fecha - timedelta(days=self.dias_refresco)
+        pendientes = []
+        dia = desde
+        while dia <= fecha:
+            if dia not in almacenados or dia >= refresco:
+                pendientes.append(dia)
+            dia += timedelta(days=1)
+        return pendientes
+
+    def _presupuesto_vigente(self, estado: Dict[str, Any], fecha: date) -> bool:
+        if not estado.get("presupuesto_sincronizado") or not os.path.exists(self._ruta(ARCHIVO_PRESUPUESTO)):
+            return False
+        sincronizado = datetime.fromisoformat(estado["presupuesto_sincronizado"])
+        if datetime.now() - sincronizado > timedelta(days=self.refresco_presupuesto_dias):
+            return False
+        anio, semana, _ = fecha.isocalendar()
+        ppto = pd.read_parquet(self._ruta(ARCHIVO_PRESUPUESTO), columns=["idPeriodo", "numSemana"])
+        return bool(((ppto["idPeriodo"] == anio) & (ppto["numSemana"] == semana)).any())
+
+    def sincronizar(self, obtener: ObtenerReporte, fecha: Any) -> None:
+        """
+        Trae de la base de datos solo lo que falta para responder los reportes locales a `fecha`.
+        `obtener(nombre_reporte, **params)` ejecuta un reporte contra el backend.
+        """
+        fecha = normalizar_fecha(fecha)
+        with self._lock:
+            ultima = self._sincronizado.get(fecha)
+            if ultima is not None and time.monotonic() - ultima < self.vigencia_segundos:
+                return
+            with medir_etapa("almacen.sincronizar") as etapa:
+                estado = self._leer_estado()
+                primera = date.fromisoformat(estado["primera_fecha"]) if estado.get("primera_fecha") else None
+                pendientes = self.dias_pendientes(fecha, self.ventas_diarias()["fecha"], primera)
+                filas = []
+                for dia in pendientes:
+                    df = obtener('ventas_x_categoria', fecha=formatear_fecha(dia))
+                    filas.append({"fecha": dia, **self._total_dia(df)})
+                if filas:
+                    self._guardar_dias(filas)
+                    estado["primera_fecha"] = (min(primera, pendientes[0]) if primera else pendientes[0]).isoformat()
+
+                if not self._presupuesto_vigente(estado, fecha):
+                    df_ppto = obtener('ventas_semanal_vs_ppto')
+                    self._escribir_parquet(df_ppto, self._ruta(ARCHIVO_PRESUPUESTO))
+                    estado["presupuesto_sincronizado"] = datetime.now().isoformat(timespec="seconds")
+                    logger.info(f"💾 Presupuesto semanal sincronizado ({len(df_ppto)} semanas)")
+
+                self._escribir_estado(estado)
+                etapa.anotar(filas=len(filas))
+            logger.info(f"✅ Almacén local sincronizado a {formatear_fecha(fecha)}: {len(filas)} días traídos")
+            self._sincronizado[fecha] = time.monotonic()
+
+    # --- Consultas locales ---
+
+    def consultar(self, nombre_reporte: str, fecha: Any = None) -> pd.DataFrame:
+        if nombre_reporte == 'ventas_semanal_vs_ppto':
+            return self.ventas_semanal_vs_ppto()
+        if nombre_reporte == 'ventas_comparativo_x_semana_x_dia':
+            return self.ventas_comparativo_x_semana_x_dia(fecha)
+        raise ValueError(f"El almacén local no responde el reporte '{nombre_reporte}'.")
+
+    def ventas_semanal_vs_ppto(self) -> pd.DataFrame:
+        """ Misma salida que el SP: el presupuesto almacenado con VentaReal de la historia diaria donde existe """
+        df = pd.read_parquet(self._ruta(ARCHIVO_PRESUPUESTO))
+        estado = self._leer_estado()
+        diarias = self.ventas_diarias()
+        if diarias.empty or not estado.get("primera_fecha"):
+            return df
+        # Solo semanas completas dentro de la historia diaria
+        primera = date.fromisoformat(estado["primera_fecha"])
+        diarias = diarias[diarias["fecha"] >= _lunes(primera + timedelta(days=6))]
+        iso = [d.isocalendar() for d in diarias["fecha"]]
+        semanal = diarias.groupby([[i[0] for i in iso], [i[1] for i in iso]])["VentaSoles"].sum()
+
+        claves = pd.MultiIndex.from_arrays([df["idPeriodo"].astype(int), df["numSemana"].astype(int)])
+        venta_local = semanal.reindex(claves).to_numpy()
+        cubiertas = ~pd.isna(venta_local)
+        df = df.copy()
+        df.loc[cubiertas, "VentaReal"] = venta_local[cubiertas]
+        ppto = pd.to_numeric(df.loc[cubiertas, "ImporteProyectadoSemana"], errors="coerce")
+        df.loc[cubiertas, "PorcCumplimientoVenta"] = (df.loc[cubiertas, "VentaReal"] / ppto.where(ppto > 0) * 100)
+        return df
+
+    def ventas_comparativo_x_semana_x_dia(self, fecha: Any) -> pd.DataFrame:
+        """ Misma salida que el SP: venta por día de la semana de `fecha` vs la semana anterior """
+        lunes = _lunes(normalizar_fecha(fecha))
+        venta = self.ventas_diarias().set_index("fecha")["VentaSoles"]
+        anterior = [float(venta.get(lunes - timedelta(days=7 - n), 0.0)) for n in range(7)]
+        actual = [float(venta.get(lunes + timedelta(days=n), 0.0)) for n in range(7)]
+        return pd.DataFrame({
+            "Dia": DIAS_SEMANA,
+            "VentaSemanaAnterior": anterior,
+            "VentaSemanaActual": actual,
+            "DiferenciaPorcentaje": [100.0 * (b - a) / a if a > 0 else 0.0 for a, b in zip(anterior, actual)],
+        })
+
+
+def crear_almacen(almacen_config: dict) -> Optional[AlmacenLocal]:
+    """ Almacén local según `ALMACEN_LOCAL_CONFIG`, o None si está deshabilitado """
+    if not almacen_config.get('habilitado'):
+        return None
+    return AlmacenLocal(
+        almacen_config['directorio'],
+        dias_refresco=almacen_config.get('dias_refresco', 1),
+        refresco_presupuesto_dias=almacen_config.get('refresco_presupuesto_dias', 7),
+        vigencia_segundos=almacen_config.get('vigencia_segundos', 300),
+        compresion=almacen_config.get('compresion', 'zstd'),
+    )
@@ -1,16 +1,29 @@
 # db_utils.py
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
 import pandas as pd
-import pyodbc
 import logging
-from typing import Any, List
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from utils.metricas import medir_etapa
+from utils.fechas import normalizar_fecha, formatear_fecha
+
+if TYPE_CHECKING:
+    import pyodbc
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
-def get_db_connection(DB_CONFIG: dict) -> pyodbc.Connection:
+def get_db_connection(DB_CONFIG: dict) -> "pyodbc.Connection":
     """
     Crea y retorna una conexión a SQL Server usando la configuración del archivo config.
+    pyodbc se importa aquí: el backend SQLite y las ejecuciones que fallan antes no lo cargan.
     """
+    import pyodbc
     try:
         conn_str = (
             f"DRIVER={{{DB_CONFIG['driver']}}};"
@@ -26,49 +39,130 @@ def get_db_connection(DB_CONFIG: dict) -> pyodbc.Connection:
         logger.error(f"❌ Error al conectar a SQL Server: {e}")
         raise
 
-class ReporteExecutor:
-    # CAMBIO 1: Se añade 'reportes_config' al constructor
-    def __init__(self, db_config: dict, reportes_config: dict):
+class PoolConexiones:
+    """
+    Pool acotado de conexiones reutilizables. `crear` abre una conexión nueva cuando no hay
+    una libre; a lo sumo `tamanio` conexiones quedan en uso a la vez. Una conexión que falla
+    durante su uso se descarta en lugar de devolverse al pool.
+
+    Si se indica `validar`, una conexión que estuvo libre más de `validar_tras_segundos`
+    se prueba antes de entregarla (p. ej. `SELECT 1`) y se reemplaza si ya no responde,
+    para procesos de larga duración en los que el servidor corta sesiones inactivas.
+    """
+
+    def __init__(self, crear, tamanio: int, validar=None, validar_tras_segundos: float = 60.0):
+        self._crear = crear
+        self._validar = validar
+        self._validar_tras_segundos = validar_tras_segundos
+        self._libres: "queue.LifoQueue" = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(tamanio)
+
+    def _tomar(self):
+        while True:
+            try:
+                connection, liberada = self._libres.get_nowait()
+            except queue.Empty:
+                return self._crear()
+            if self._validar is None or time.monotonic() - liberada < self._validar_tras_segundos:
+                return connection
+            try:
+                self._validar(connection)
+                return connection
+            except Exception as e:
+                logger.warning(f"⚠️ Conexión inactiva descartada del pool: {e}")
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+    @contextmanager
+    def conexion(self):
+        self._cupos.acquire()
+        try:
+            connection = self._tomar()
+            try:
+                yield connection
+            except Exception:
+                connection.close()
+                raise
+            self._libres.put((connection, time.monotonic()))
+        finally:
+            self._cupos.release()
+
+    def cerrar(self) -> None:
+        while True:
+            try:
+                self._libres.get_nowait()[0].close()
+            except queue.Empty:
+                break
+
+class BackendDB(ABC):
+    """
+    Interfaz del backend de base de datos que usa `ReporteExecutor`.
+    Recibe el nombre del reporte, su entrada de `REPORTES_CONFIG` y los parámetros
+    requeridos (en el orden de `config['params']`) y devuelve el primer result set.
+    """
+    nombre = "base"
+
+    @abstractmethod
+    def ejecutar(self, nombre_reporte: str, config: dict, params: Dict[str, Any]) -> pd.DataFrame:
+        ...
+
+    def cerrar(self) -> None:
+        pass
+
+class BackendSQLServer(BackendDB):
+    """ SQL Server vía pyodbc: ejecuta el SP configurado con `EXEC sp ?, ?` """
+    nombre = "sqlserver"
+
+    def __init__(self, db_config: dict, tamanio_pool: int = 0):
         self.db_config = db_config
-        self.reportes_config = reportes_config  # Se guarda la config de reportes en la instancia
+        # Sin pool (0) se abre y cierra una conexión por SP, como en la ejecución diaria
+        self.pool = PoolConexiones(lambda: get_db_connection(db_config), tamanio_pool,
+                                   validar=self._validar_conexion) if tamanio_pool > 0 else None
 
-    def ejecutar_reporte(self, nombre_reporte: str, **kwargs) -> pd.DataFrame:
-        """
-        Ejecuta un reporte por nombre con parámetros dinámicos.
-        """
-        # CAMBIO 2: Se usa 'self.reportes_config' en lugar de la variable global
-        if nombre_reporte not in self.reportes_config:
-            raise ValueError(f"Reporte '{nombre_reporte}' no existe. Disponibles: {list(self.reportes_config.keys())}")
-            
-        config = self.reportes_config[nombre_reporte]
+    @staticmethod
+    def _validar_conexion(connection) -> None:
+        with connection.cursor() as cur:
+            cur.execute("SELECT 1").fetchall()
+
+    @staticmethod
+    def _valor_parametro(valor: Any) -> Any:
+        # Los SP reciben las fechas como string 'dd/mm/YYYY'
+        if isinstance(valor, (date, datetime)):
+            return formatear_fecha(valor)
+        return valor
+
+    def ejecutar(self, nombre_reporte: str, config: dict, params: Dict[str, Any]) -> pd.DataFrame:
         sp_name = config['sp']
-        required_params = config['params']
-        
-        # Validar parámetros requeridos
-        missing_params = [p for p in required_params if p not in kwargs]
-        if missing_params:
-            raise ValueError(f"Faltan parámetros requeridos para '{nombre_reporte}': {missing_params}")
-        
         # Construir SQL dinámicamente
-        if required_params:
-            param_placeholders = ', '.join(['?' for _ in required_params])
+        if params:
+            param_placeholders = ', '.join(['?' for _ in params])
             sql = f"EXEC {sp_name} {param_placeholders}"
-            param_values = [kwargs[p] for p in required_params]
+            param_values = [self._valor_parametro(v) for v in params.values()]
         else:
             sql = f"EXEC {sp_name}"
             param_values = []
-            
         return self._ejecutar_sp(sql, param_values, nombre_reporte)
-    
+
+    @contextmanager
+    def _conexion(self):
+        if self.pool is not None:
+            with self.pool.conexion() as connection:
+                yield connection
+            return
+        connection = get_db_connection(self.db_config)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
     def _ejecutar_sp(self, sql: str, params: List[Any], reporte_name: str) -> pd.DataFrame:
         """Ejecuta el SP y retorna DataFrame"""
-        connection = None # Se define para que exista en el bloque finally
         try:
-            # CAMBIO 3: Se pasa 'self.db_config' a la función de conexión
-            connection = get_db_connection(self.db_config)
-            with connection.cursor() as cur:
+            with self._conexion() as connection, connection.cursor() as cur:
                 logger.info(f"▶ Ejecutando {reporte_name}: {sql} | Params: {params}")
-                
+
                 if params:
                     cur.execute(sql, params)
                 else:
@@ -86,11 +180,165 @@ class ReporteExecutor:
 
             logger.info(f"✅ {reporte_name} ejecutado: {len(df)} registros")
             return df
-            
+
         except Exception as e:
             logger.error(f"❌ Error ejecutando {reporte_name}: {e}")
             raise
-        finally:
-            # La lógica de cierre de conexión se mantiene intacta
-            if connection:
-                connection.close()
+
+    def cerrar(self) -> None:
+        if self.pool is not None:
+            self.pool.cerrar()
+
+def _iso_anio(fecha: str) -> int:
+    return date.fromisoformat(fecha).isocalendar()[0]
+
+def _iso_semana(fecha: str) -> int:
+    return date.fromisoformat(fecha).isocalendar()[1]
+
+def _lunes_iso(fecha: str) -> str:
+    d = date.fromisoformat(fecha)
+    return date.fromordinal(d.toordinal() - d.weekday()).isoformat()
+
+class BackendSQLite(BackendDB):
+    """
+    Backend local sobre SQLite para pruebas de carga y desarrollo sin SQL Server.
+
+    Cada reporte de `REPORTES_CONFIG` se resuelve con la consulta parametrizada
+    equivalente de `consultas` (ver `service/consultas_sqlite.py`), sobre las tablas
+    locales `ventas` y `presupuesto_semanal`. Las fechas se pasan en formato ISO.
+    Mantiene una conexión por hilo, reutilizada entre consultas; `cerrar` cierra las de todos los hilos.
+    """
+    nombre = "sqlite"
+
+    def __init__(self, ruta: str, consultas: Dict[str, str]):
+        self.ruta = ruta
+        self.consultas = consultas
+        self._local = threading.local()
+        self._conexiones: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _conexion(self) -> sqlite3.Connection:
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is not None and conexion not in self._conexiones:
+            conexion = None  # Cerrada por `cerrar` desde otro hilo
+        if conexion is None:
+            # Cada conexión la usa solo su hilo; check_same_thread=False permite cerrarla desde `cerrar`
+            conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+            conexion.create_function("iso_anio", 1, _iso_anio, deterministic=True)
+            conexion.create_function("iso_semana", 1, _iso_semana, deterministic=True)
+            conexion.create_function("lunes_iso", 1, _lunes_iso, deterministic=True)
+            self._local.conexion = conexion
+            with self._lock:
+                self._conexiones.append(conexion)
+            logger.info(f"✅ Conexión a SQLite establecida ({self.ruta})")
+        return conexion
+
+    @staticmethod
+    def _valor_parametro(valor: Any) -> Any:
+        if isinstance(valor, (date, datetime)):
+            return normalizar_fecha(valor).isoformat()
+        if isinstance(valor, str):
+            try:
+                return normalizar_fecha(valor).isoformat()
+            except ValueError:
+                return valor
+        return valor
+
+    def ejecutar(self, nombre_reporte: str, config: dict, params: Dict[str, Any]) -> pd.DataFrame:
+        if nombre_reporte not in self.consultas:
+            raise ValueError(f"No hay consulta SQLite para el reporte '{nombre_reporte}'.")
+        valores = {k: self._valor_parametro(v) for k, v in params.items()}
+        logger.info(f"▶ Ejecutando {nombre_reporte} en SQLite | Params: {valores}")
+        try:
+            df = pd.read_sql_query(self.consultas[nombre_reporte], self._conexion(), params=valores)
+        except Exception as e:
+            logger.error(f"❌ Error ejecutando {nombre_reporte}: {e}")
+            raise
+        logger.info(f"✅ {nombre_reporte} ejecutado: {len(df)} registros")
+        return df
+
+    def cerrar(self) -> None:
+        with self._lock:
+            conexiones, self._conexiones = self._conexiones, []
+        for conexion in conexiones:
+            conexion.close()
+        self._local.conexion = None
+        logger.info(f"🔒 {len(conexiones)} conexiones a SQLite cerradas")
+
+def crear_base_sqlite(ruta: str, df_ventas: pd.DataFrame, df_presupuesto: pd.DataFrame) -> None:
+    """
+    Crea (o reemplaza) las tablas locales del backend SQLite con sus índices.
+
+    df_ventas: líneas de venta con columnas fecha (ISO), hora ('HH:MM'), ticket,
+        categoria, producto, cantidad y venta_soles.
+    df_presupuesto: anio, semana (ISO) e importe_proyectado.
+    """
+    conexion = sqlite3.connect(ruta)
+    try:
+        with conexion:
+            df_ventas.to_sql("ventas", conexion, if_exists="replace", index=False)
+            df_presupuesto.to_sql("presupuesto_semanal", conexion, if_exists="replace", index=False)
+            conexion.execute("CREATE INDEX IF NOT EXISTS ix_ventas_fecha ON ventas (fecha, categoria, producto)")
+            conexion.execute("CREATE INDEX IF NOT EXISTS ix_presupuesto ON presupuesto_semanal (anio, semana)")
+    finally:
+        conexion.close()
+    logger.info(f"✅ Base SQLite creada en {ruta}: {len(df_ventas)} líneas de venta, {len(df_presupuesto)} semanas")
+
+def crear_backend(backend_config: dict, db_config: dict, tamanio_pool: int = 0) -> BackendDB:
+    """
+    Crea el backend configurado en `DB_BACKEND` ('sqlserver' o 'sqlite').
+    `tamanio_pool` > 0 reutiliza hasta ese número de conexiones a SQL Server entre consultas.
+    """
+    tipo = backend_config.get('tipo', 'sqlserver')
+    if tipo == 'sqlserver':
+        return BackendSQLServer(db_config, tamanio_pool=tamanio_pool)
+    if tipo == 'sqlite':
+        from service.consultas_sqlite import CONSULTAS_SQLITE
+        return BackendSQLite(backend_config['ruta_sqlite'], CONSULTAS_SQLITE)
+    raise ValueError(f"Backend de base de datos no soportado: '{tipo}'")
+
+class ReporteExecutor:
+    # CAMBIO 1: Se añade 'reportes_config' al constructor
+    def __init__(self, db_config: dict, reportes_config: dict, backend: Optional[BackendDB] = None, almacen=None):
+        self.db_config = db_config
+        self.reportes_config = reportes_config  # Se guarda la config de reportes en la instancia
+        # Por defecto SQL Server (pyodbc); se puede inyectar otro backend (p. ej. SQLite)
+        self.backend = backend or BackendSQLServer(db_config)
+        # Almacén local opcional (service/almacen_local.py) que responde los reportes semanales
+        self.almacen = almacen
+
+    def ejecutar_reporte(self, nombre_reporte: str, **kwargs) -> pd.DataFrame:
+        """
+        Ejecuta un reporte por nombre con parámetros dinámicos.
+        """
+        # CAMBIO 2: Se usa 'self.reportes_config' en lugar de la variable global
+        if nombre_reporte not in self.reportes_config:
+            raise ValueError(f"Reporte '{nombre_reporte}' no existe. Disponibles: {list(self.reportes_config.keys())}")
+
+        config = self.reportes_config[nombre_reporte]
+        required_params = config['params']
+
+        # Validar parámetros requeridos
+        missing_params = [p for p in required_params if p not in kwargs]
+        if missing_params:
+            raise ValueError(f"Faltan parámetros requeridos para '{nombre_reporte}': {missing_params}")
+
+        params = {p: kwargs[p] for p in required_params}
+        if self.almacen is not None and self.almacen.responde(nombre_reporte):
+            fecha = params.get('fecha') or date.today()
+            self.almacen.sincronizar(self._ejecutar_en_backend, fecha)
+            with medir_etapa(f"almacen.{nombre_reporte}") as etapa:
+                df = self.almacen.consultar(nombre_reporte, fecha=fecha)
+                etapa.anotar(filas=len(df))
+            return df
+        return self._ejecutar_en_backend(nombre_reporte, **params)
+
+    def _ejecutar_en_backend(self, nombre_reporte: str, **params) -> pd.DataFrame:
+        config = self.reportes_config[nombre_reporte]
+        with medir_etapa(f"sp.{nombre_reporte}") as etapa:
+            df = self.backend.ejecutar(nombre_reporte, config, params)
+            etapa.anotar(filas=len(df))
+        return df
+
+    def cerrar(self) -> None:
+        self.backend.cerrar()
@@ -1,12 +1,28 @@
-from google.oauth2.service_account import Credentials
+from functools import lru_cache
+from typing import TYPE_CHECKING
 import pandas as pd
 import logging
-import gspread
-from gspread.exceptions import SpreadsheetNotFound
+
+if TYPE_CHECKING:
+    import gspread
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=4)
+def obtener_cliente_gspread(GOOGLE_SHEET_CREDENTIALS: str) -> "gspread.Client":
+    """
+    Cliente autenticado de Google Sheets, creado una vez por archivo de credenciales
+    y reutilizado entre lecturas (google-auth renueva el token cuando expira).
+    gspread y google-auth se importan aquí, en la primera lectura, y no al arrancar.
+    """
+    import gspread
+    from google.oauth2.service_account import Credentials
+    logger.info("🔐 Autenticando con la API de Google Sheets...")
+    scopes = ["https://www.googleapis.com/auth/spreadsheets"]
+    creds = Credentials.from_service_account_file(GOOGLE_SHEET_CREDENTIALS, scopes=scopes)
+    return gspread.authorize(creds)
+
 def get_excel_stock_und(form: str, GOOGLE_SHEET_CREDENTIALS: str, ACCESOS_SHEET_GOOGLE: dict) -> pd.DataFrame:
     """
     Obtiene los datos del formulario de Google Sheets de forma segura,
@@ -24,12 +40,11 @@ def get_excel_stock_und(form: str, GOOGLE_SHEET_CREDENTIALS: str, ACCESOS_SHEET_
         logger.error(f"❌ No se encontró 'SHEET_ID' en la configuración para el formulario '{form}'.")
         return pd.DataFrame()
 
+    from gspread.exceptions import SpreadsheetNotFound
+
     try:
         # --- Bloque Crítico: Interacción con la API de Google ---
-        logger.info("🔐 Autenticando con la API de Google Sheets...")
-        scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-        creds = Credentials.from_service_account_file(GOOGLE_SHEET_CREDENTIALS, scopes=scopes)
-        client = gspread.authorize(creds)
+        client = obtener_cliente_gspread(GOOGLE_SHEET_CREDENTIALS)
 
         logger.info(f"📄 Abriendo la hoja de cálculo con ID: {SHEET_ID}")
         spreadsheet = client.open_by_key(SHEET_ID)
@@ -0,0 +1,102 @@
+# Consultas SQLite equivalentes a los SP de REPORTES_CONFIG (backend local, ver BackendSQLite)
+#
+# Tablas locales:
+#   ventas(fecha TEXT ISO, hora TEXT 'HH:MM', ticket TEXT, categoria TEXT, producto TEXT, cantidad REAL, venta_soles REAL)
+#   presupuesto_semanal(anio INTEGER, semana INTEGER, importe_proyectado REAL)
+#
+# Funciones registradas por el backend: iso_anio(fecha), iso_semana(fecha), lunes_iso(fecha).
+# Los nombres de columna replican los de la salida de cada SP.
+
+CONSULTAS_SQLITE = {
+    'ventas_semanal_vs_ppto': """
+        WITH semanas AS (
+            SELECT iso_anio(fecha) AS anio, iso_semana(fecha) AS semana, SUM(venta_soles) AS venta
+            FROM ventas
+            GROUP BY 1, 2
+        )
+        SELECT p.anio AS idPeriodo,
+               p.semana AS numSemana,
+               p.importe_proyectado AS ImporteProyectadoSemana,
+               COALESCE(s.venta, 0) AS VentaReal,
+               CASE WHEN p.importe_proyectado > 0
+                    THEN 100.0 * COALESCE(s.venta, 0) / p.importe_proyectado END AS PorcCumplimientoVenta
+        FROM presupuesto_semanal p
+        LEFT JOIN semanas s ON s.anio = p.anio AND s.semana = p.semana
+        ORDER BY p.anio, p.semana
+    """,
+    'ventas_x_sku': """
+        WITH detalle AS (
+            SELECT categoria, producto,
+                   SUM(venta_soles) AS venta, SUM(cantidad) AS cantidad,
+                   COUNT(DISTINCT ticket) AS tickets, MAX(hora) AS ultima_hora
+            FROM ventas
+            WHERE fecha = :fecha
+            GROUP BY categoria, producto
+        )
+        SELECT categoria AS Categoria,
+               producto AS ProductoNombre,
+               venta / NULLIF(cantidad, 0) AS PrecioPonderado,
+               venta AS VentaSoles,
+               cantidad AS Cantidad,
+               venta / NULLIF(tickets, 0) AS TicketProm,
+               ultima_hora AS AsientoCreadoEl_Hora,
+               100.0 * venta / NULLIF((SELECT SUM(venta) FROM detalle), 0) AS partic
+        FROM detalle
+        ORDER BY venta DESC
+    """,
+    'ventas_x_categoria': """
+        WITH dia AS (
+            SELECT * FROM ventas WHERE fecha = :fecha
+        ),
+        categorias AS (
+            SELECT categoria, SUM(venta_soles) AS venta, SUM(cantidad) AS cantidad,
+                   COUNT(DISTINCT ticket) AS tickets
+            FROM dia
+            GROUP BY categoria
+        ),
+        total AS (
+            SELECT SUM(venta_soles) AS venta, SUM(cantidad) AS cantidad, COUNT(DISTINCT ticket) AS tickets
+            FROM dia
+        )
+        SELECT categoria AS Categoria,
+               venta / NULLIF(cantidad, 0) AS PrecioPonderado,
+               venta AS VentaSoles,
+               cantidad AS Cantidad,
+               venta / NULLIF(tickets, 0) AS TicketProm,
+               100.0 * venta / NULLIF((SELECT venta FROM total), 0) AS partic
+        FROM categorias
+        UNION ALL
+        SELECT 'Total', venta / NULLIF(cantidad, 0), venta, cantidad, venta / NULLIF(tickets, 0), 100.0
+        FROM total
+        WHERE venta IS NOT NULL
+    """,
+    'ventas_comparativo_x_semana_x_dia': """
+        WITH params AS (
+            SELECT lunes_iso(:fecha) AS lunes
+        ),
+        dias(n, Dia) AS (
+            VALUES (0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'),
+                   (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')
+        ),
+        diario AS (
+            SELECT fecha, SUM(venta_soles) AS venta
+            FROM ventas, params
+            WHERE fecha >= date(params.lunes, '-7 days') AND fecha < date(params.lunes, '+7 days')
+            GROUP BY fecha
+        ),
+        comparativo AS (
+            SELECT dias.n, dias.Dia,
+                   COALESCE((SELECT venta FROM diario
+                             WHERE diario.fecha = date(params.lunes, '-7 days', '+' || dias.n || ' days')), 0) AS anterior,
+                   COALESCE((SELECT venta FROM diario
+                             WHERE diario.fecha = date(params.lunes, '+' || dias.n || ' days')), 0) AS actual
+            FROM dias, params
+        )
+        SELECT Dia,
+               anterior AS VentaSemanaAnterior,
+               actual AS VentaSemanaActual,
+               CASE WHEN anterior > 0 THEN 100.0 * (actual - anterior) / anterior ELSE 0 END AS DiferenciaPorcentaje
+        FROM comparativo
+        ORDER BY n
+    """,
+}
@@ -1,12 +1,398 @@
+import base64
+import mimetypes
+import os
+import queue
+import random
 import smtplib
+import socket
+import threading
+import time
+from collections import deque
+from email.message import Message
+from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
+from email.mime.nonmultipart import MIMENonMultipart
 from email.mime.text import MIMEText
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 import logging
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+PREFIJO_ASUNTO = "Reporte Diario de Ventas Mi Casero"
+
+# Errores que no se arreglan reintentando (credenciales, direcciones, política del servidor)
+_ERRORES_PERMANENTES = (smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused, smtplib.SMTPNotSupportedError)
+
+def construir_asunto(fecha_asunto: str, subject_prefix: str = PREFIJO_ASUNTO) -> str:
+    return f"{subject_prefix} - {fecha_asunto}"
+
+def _parte_html(cuerpo_mensaje: bytes) -> MIMENonMultipart:
+    """ Parte text/html desde el cuerpo ya codificado en UTF-8, sin decodificarlo a str y volver a codificarlo """
+    parte = MIMENonMultipart("text", "html", charset="utf-8")
+    parte["Content-Transfer-Encoding"] = "base64"
+    parte.set_payload(base64.encodebytes(cuerpo_mensaje).decode("ascii"))
+    return parte
+
+def construir_mensaje(
+    cuerpo_mensaje: Union[str, bytes],
+    destinatarios: List[str],
+    asunto: str,
+    sender_email: str,
+    adjuntos: Optional[List[str]] = None
+) -> MIMEMultipart:
+    """
+    Construye el mensaje MIME (HTML) del reporte, con los archivos de `adjuntos` (rutas) adjuntos.
+    `cuerpo_mensaje` puede venir ya en UTF-8 (bytes), como lo arma la plantilla del correo.
+    """
+    msg = MIMEMultipart()
+    msg["From"] = sender_email
+    msg["To"] = ", ".join(destinatarios)
+    msg["Subject"] = asunto
+    # utf-8 explícito: base64 con líneas cortas aunque el HTML sea solo ASCII (RFC 5321 limita a 998 caracteres)
+    msg.attach(_parte_html(cuerpo_mensaje) if isinstance(cuerpo_mensaje, bytes) else MIMEText(cuerpo_mensaje, "html", "utf-8"))
+    for ruta in adjuntos or []:
+        with open(ruta, "rb") as f:
+            tipo = mimetypes.guess_type(ruta)[0] or "application/octet-stream"
+            parte = MIMEApplication(f.read(), tipo.split("/", 1)[1], Name=os.path.basename(ruta))
+        parte["Content-Disposition"] = f'attachment; filename="{os.path.basename(ruta)}"'
+        msg.attach(parte)
+    return msg
+
+def es_error_transitorio(error: Exception) -> bool:
+    """
+    True si reintentar puede funcionar: desconexiones, timeouts, errores de red y
+    respuestas 4xx del servidor. Autenticación y respuestas 5xx son permanentes; los
+    destinatarios rechazados también, salvo que todos lo fueran con 4xx (p. ej. greylisting 450/451).
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codigos = [codigo for codigo, _ in error.recipients.values()]
+        return bool(codigos) and all(400 <= codigo < 500 for codigo in codigos)
+    if isinstance(error, _ERRORES_PERMANENTES):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPException, socket.timeout, OSError))
+
+def _registrar_error(error: Exception) -> None:
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        logger.error(f"❌ Error de autenticación SMTP: {error}")
+        logger.error("Verifica las credenciales del email")
+    elif isinstance(error, smtplib.SMTPRecipientsRefused):
+        logger.error(f"❌ Destinatarios rechazados: {error}")
+        logger.error("Verifica que las direcciones de email sean válidas")
+    elif isinstance(error, smtplib.SMTPServerDisconnected):
+        logger.error(f"❌ Servidor SMTP desconectado: {error}")
+    elif isinstance(error, smtplib.SMTPException):
+        logger.error(f"❌ Error SMTP: {error}")
+    elif isinstance(error, OSError):
+        logger.error(f"❌ Error de conexión: {error}")
+        logger.error("Verifica la conectividad a internet y configuración del servidor")
+    else:
+        logger.error(f"❌ Error inesperado al enviar email: {error}")
+        logger.exception("Detalles completos del error:")
+
+class ClienteSMTP:
+    """
+    Sesión SMTP autenticada que se reutiliza entre envíos.
+
+    Conecta (STARTTLS + login) en el primer envío y mantiene la sesión abierta; solo
+    reconecta si el servidor la cerró. Sin `password` no se hace login (relays sin
+    autenticación o un sumidero SMTP local). Los errores transitorios se reintentan con backoff
+    exponencial con jitter (`espera_base * 2^n`, tope `espera_max`); los permanentes
+    (credenciales, destinatarios rechazados con 5xx, 5xx) fallan al primer intento.
+
+        with ClienteSMTP(SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, PASSWORD) as cliente:
+            for msg, destinatarios in mensajes:
+                cliente.enviar(msg, destinatarios)
+    """
+
+    def __init__(self, smtp_server: str, smtp_port: int, sender_email: str, password: str,
+                 max_reintentos: int = 3, espera_base: float = 2.0, espera_max: float = 30.0,
+                 timeout: float = 60.0, usar_tls: bool = True):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.password = password
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.timeout = timeout
+        self.usar_tls = usar_tls
+        self.conexiones = 0
+        self.ultimo_error: Optional[str] = None
+        self.rechazados: Dict[str, Any] = {}  # Destinatarios rechazados en el último envío aceptado
+        self._smtp: Optional[smtplib.SMTP] = None
+
+    def __enter__(self) -> "ClienteSMTP":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.cerrar()
+
+    def _conectar(self) -> smtplib.SMTP:
+        logger.info(f"Conectando al servidor SMTP {self.smtp_server}:{self.smtp_port}")
+        smtp = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            if self.usar_tls:
+                smtp.starttls()
+                logger.debug("TLS activado")
+            if self.password:
+                smtp.login(self.sender_email, self.password)
+                logger.debug(f"Autenticación exitosa para {self.sender_email}")
+        except Exception:
+            smtp.close()
+            raise
+        self.conexiones += 1
+        return smtp
+
+    def _descartar(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.close()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _espera(self, intento: int) -> float:
+        return random.uniform(0, min(self.espera_max, self.espera_base * 2 ** (intento - 1)))
+
+    def enviar(self, msg: Message, destinatarios: List[str]) -> bool:
+        """ Envía un mensaje ya construido; True si el servidor lo aceptó """
+        # Se serializa una sola vez para todos los intentos
+        return self.enviar_serializado(msg.as_string(), destinatarios, msg["Subject"])
+
+    def enviar_serializado(self, datos: str, destinatarios: List[str], asunto: str = "") -> bool:
+        """ Como `enviar`, con el mensaje ya serializado (`msg.as_string()`) """
+        logger.info(f"Iniciando envío de email: '{asunto}' a {len(destinatarios)} destinatarios")
+        logger.debug(f"Destinatarios: {', '.join(destinatarios)}")
+        self.ultimo_error = None
+        self.rechazados = {}
+        if not destinatarios:
+            logger.error("Lista de destinatarios está vacía")
+            self.ultimo_error = "Lista de destinatarios vacía"
+            return False
+        intento = 0
+        while True:
+            intento += 1
+            reutilizada = self._smtp is not None
+            try:
+                if self._smtp is None:
+                    self._smtp = self._conectar()
+                rechazados = self._smtp.sendmail(self.sender_email, destinatarios, datos)
+                if rechazados:
+                    logger.warning(f"⚠️ Destinatarios rechazados por el servidor: {', '.join(rechazados)}")
+                    self.rechazados = rechazados
+                logger.info(f"✅ Email enviado exitosamente a {len(destinatarios) - len(rechazados)} destinatarios")
+                return True
+            except Exception as e:
+                if not isinstance(e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                    # Tras una respuesta de error smtplib hace RSET y la sesión sigue sirviendo
+                    self._descartar()
+                if reutilizada and isinstance(e, smtplib.SMTPServerDisconnected):
+                    # El servidor cerró la sesión inactiva: se reconecta sin gastar un intento
+                    logger.info("🔌 La sesión SMTP expiró; reconectando")
+                    intento -= 1
+                    continue
+                _registrar_error(e)
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+                if not es_error_transitorio(e):
+                    logger.error("❌ Error permanente: no se reintenta")
+                    return False
+                if intento >= self.max_reintentos:
+                    logger.error(f"❌ Falló el envío después de {self.max_reintentos} intentos")
+                    return False
+                espera = self._espera(intento)
+                logger.warning(f"Intento {intento}/{self.max_reintentos} fallido; reintentando en {espera:.1f} segundos...")
+                time.sleep(espera)
+
+    def cerrar(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+class LimitadorTasa:
+    """
+    Ventana deslizante de 60 s: como mucho `por_minuto` envíos por minuto entre todas las
+    sesiones. Los lotes chicos salen sin demora; los grandes esperan a que se libere la ventana.
+    """
+
+    def __init__(self, por_minuto: Optional[int] = None, ventana: float = 60.0):
+        self.por_minuto = por_minuto
+        self.ventana = ventana
+        self._envios: deque = deque()
+        self._lock = threading.Lock()
+
+    def esperar(self) -> None:
+        if not self.por_minuto:
+            return
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                while self._envios and ahora - self._envios[0] >= self.ventana:
+                    self._envios.popleft()
+                if len(self._envios) < self.por_minuto:
+                    self._envios.append(ahora)
+                    return
+                espera = self.ventana - (ahora - self._envios[0])
+            time.sleep(espera)
+
+class ResultadoEnvio:
+    """ Resultado de un mensaje encolado (todas sus partes si se dividieron los destinatarios) """
+
+    def __init__(self, indice: int, etiqueta: str, destinatarios: List[str], partes: int):
+        self.indice = indice
+        self.etiqueta = etiqueta
+        self.destinatarios = destinatarios
+        self.partes = partes
+        self.partes_ok = 0
+        self.entregados: List[str] = []  # Destinatarios de las partes aceptadas por el servidor
+        self.errores: List[str] = []
+        self.espera: Optional[float] = None  # Segundos en cola hasta el inicio del primer envío
+        self.latencia = 0.0  # Segundos de SMTP sumando todas las partes
+        self._lock = threading.Lock()
+
+    @property
+    def ok(self) -> bool:
+        return self.partes_ok == self.partes
+
+    @property
+    def pendientes(self) -> List[str]:
+        """ Destinatarios que todavía no recibieron el mensaje """
+        entregados = set(self.entregados)
+        return [d for d in self.destinatarios if d not in entregados]
+
+    def registrar(self, parte: List[str], ok: bool, espera: float, latencia: float, error: Optional[str],
+                  rechazados: Optional[Dict[str, Any]] = None) -> None:
+        rechazados = rechazados or {}
+        with self._lock:
+            self.espera = espera if self.espera is None else min(self.espera, espera)
+            self.latencia += latencia
+            if ok:
+                self.partes_ok += 1
+                self.entregados.extend(d for d in parte if d not in rechazados)
+                self.errores.extend(f"{d} rechazado ({codigo})" for d, (codigo, _) in rechazados.items())
+            elif error:
+                self.errores.append(error)
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "etiqueta": self.etiqueta,
+            "estado": "ok" if self.ok else "error",
+            "destinatarios": len(self.destinatarios),
+            "partes": self.partes,
+            "partes_ok": self.partes_ok,
+            "espera": round(self.espera or 0.0, 3),
+            "latencia": round(self.latencia, 3),
+            "detalle": "; ".join(self.errores),
+        }
+
+class ColaEnvios:
+    """
+    Cola de envío masivo: drena los mensajes pendientes por un pool pequeño de sesiones
+    SMTP concurrentes (`sesiones` hilos, cada uno con su `ClienteSMTP`), respetando el
+    límite de mensajes por minuto del servidor y el máximo de destinatarios por mensaje
+    (los mensajes con más destinatarios se envían en varias partes, cada una con solo sus
+    destinatarios en el encabezado To:). Cada parte se serializa una sola vez, antes de
+    repartir el trabajo entre las sesiones; `ResultadoEnvio.entregados` dice qué
+    destinatarios ya recibieron el mensaje si alguna parte falla.
+
+        cola = ColaEnvios(SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, PASSWORD, **SMTP_ENVIO_CONFIG)
+        cola.agregar(msg, destinatarios, etiqueta="tienda_01")
+        resultados = cola.enviar()
+    """
+
+    def __init__(self, smtp_server: str, smtp_port: int, sender_email: str, password: str,
+                 sesiones: int = 2, mensajes_por_minuto: Optional[int] = None,
+                 max_destinatarios: Optional[int] = None, max_reintentos: int = 3, usar_tls: bool = True):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.password = password
+        self.sesiones = max(1, sesiones)
+        self.limitador = LimitadorTasa(mensajes_por_minuto)
+        self.max_destinatarios = max_destinatarios
+        self.max_reintentos = max_reintentos
+        self.usar_tls = usar_tls
+        self._pendientes: List[Tuple[Message, List[str], str]] = []
+
+    def agregar(self, msg: Message, destinatarios: List[str], etiqueta: Optional[str] = None) -> int:
+        """ Encola un mensaje; devuelve su índice en los resultados de `enviar` """
+        self._pendientes.append((msg, list(destinatarios), etiqueta or str(msg["Subject"])))
+        return len(self._pendientes) - 1
+
+    def _partes(self, destinatarios: List[str]) -> List[List[str]]:
+        if not destinatarios:
+            return [[]]  # ClienteSMTP lo reporta como error
+        tamanio = self.max_destinatarios or len(destinatarios)
+        return [destinatarios[i:i + tamanio] for i in range(0, len(destinatarios), tamanio)]
+
+    @staticmethod
+    def _serializar(msg: Message, parte: List[str]) -> str:
+        """ El mensaje con el encabezado To: de la parte; el mensaje encolado queda como estaba """
+        original = msg["To"]
+        if original is None:
+            msg["To"] = ", ".join(parte)
+        else:
+            msg.replace_header("To", ", ".join(parte))
+        try:
+            return msg.as_string()
+        finally:
+            if original is None:
+                del msg["To"]
+            else:
+                msg.replace_header("To", original)
+
+    def enviar(self) -> List[ResultadoEnvio]:
+        """ Envía todos los mensajes pendientes y vacía la cola; un resultado por mensaje, en orden """
+        pendientes, self._pendientes = self._pendientes, []
+        resultados: List[ResultadoEnvio] = []
+        trabajos: "queue.Queue[Tuple[ResultadoEnvio, str, List[str], str]]" = queue.Queue()
+        for indice, (msg, destinatarios, etiqueta) in enumerate(pendientes):
+            partes = self._partes(destinatarios)
+            resultado = ResultadoEnvio(indice, etiqueta, destinatarios, len(partes))
+            resultados.append(resultado)
+            for parte in partes:
+                trabajos.put((resultado, self._serializar(msg, parte), parte, str(msg["Subject"])))
+        if not resultados:
+            return resultados
+
+        inicio = time.perf_counter()
+
+        def trabajador() -> None:
+            with ClienteSMTP(self.smtp_server, self.smtp_port, self.sender_email, self.password,
+                             max_reintentos=self.max_reintentos, usar_tls=self.usar_tls) as cliente:
+                while True:
+                    try:
+                        resultado, datos, parte, asunto = trabajos.get_nowait()
+                    except queue.Empty:
+                        return
+                    self.limitador.esperar()
+                    inicio_envio = time.perf_counter()
+                    ok = cliente.enviar_serializado(datos, parte, asunto)
+                    resultado.registrar(parte, ok, inicio_envio - inicio, time.perf_counter() - inicio_envio,
+                                        cliente.ultimo_error, cliente.rechazados)
+
+        hilos = [threading.Thread(target=trabajador, name=f"smtp-{i}")
+                 for i in range(min(self.sesiones, trabajos.qsize()))]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        latencias = sorted(r.latencia for r in resultados)
+        p95 = latencias[min(len(latencias) - 1, int(round(0.95 * (len(latencias) - 1))))]
+        enviados = sum(r.ok for r in resultados)
+        logger.info(f"📬 {enviados}/{len(resultados)} mensajes enviados en {time.perf_counter() - inicio:.1f}s "
+                    f"con {len(hilos)} sesiones (latencia p50 {latencias[len(latencias) // 2]:.2f}s, p95 {p95:.2f}s)")
+        for resultado in resultados:
+            if not resultado.ok:
+                logger.error(f"❌ '{resultado.etiqueta}': {resultado.partes_ok}/{resultado.partes} partes enviadas ({'; '.join(resultado.errores)})")
+        return resultados
+
 def enviar_email(
     cuerpo_mensaje: str,
     destinatarios: List[str],
@@ -15,10 +401,10 @@ def enviar_email(
     password: str,
     smtp_server: str = "smtp.office365.com",
     smtp_port: int = 587,
-    subject_prefix: str = "Reporte Diario de Ventas Mi Casero"
+    subject_prefix: str = PREFIJO_ASUNTO
 ) -> bool:
     """
-    Envía un email HTML a una lista de destinatarios.
+    Envía un email HTML a una lista de destinatarios (un solo intento).
     
     Args:
         cuerpo_mensaje: Contenido HTML del email
@@ -33,79 +419,26 @@ def enviar_email(
     Returns:
         True si se envió correctamente, False si hubo error
     """
-    asunto = f"{subject_prefix} - {fecha_asunto}"
-    
-    logger.info(f"Iniciando envío de email: '{asunto}' a {len(destinatarios)} destinatarios")
-    logger.debug(f"Destinatarios: {', '.join(destinatarios)}")
-    logger.debug(f"Servidor SMTP: {smtp_server}:{smtp_port}")
-    
-    # Validaciones básicas
-    if not destinatarios:
-        logger.error("Lista de destinatarios está vacía")
-        return False
-    
-    if not cuerpo_mensaje.strip():
-        logger.error("El cuerpo del mensaje está vacío")
-        return False
+    return enviar_email_con_reintentos(cuerpo_mensaje, destinatarios, fecha_asunto, sender_email, password,
+                                       max_reintentos=1, smtp_server=smtp_server, smtp_port=smtp_port,
+                                       subject_prefix=subject_prefix)
+
+def enviar_mensaje(
+    msg: Message,
+    destinatarios: List[str],
+    sender_email: str,
+    password: str,
+    smtp_server: str = "smtp.office365.com",
+    smtp_port: int = 587
+) -> bool:
+    """
+    Envía un mensaje MIME ya construido (p. ej. el guardado en un checkpoint al reenviar), un solo intento.
     
-    try:
-        # Construir mensaje
-        msg = MIMEMultipart()
-        msg["From"] = sender_email
-        msg["To"] = ", ".join(destinatarios)
-        msg["Subject"] = asunto
-        msg.attach(MIMEText(cuerpo_mensaje, "html"))
-        
-        logger.debug("Mensaje construido correctamente")
-        
-        # Conectar y enviar
-        logger.info(f"Conectando al servidor SMTP {smtp_server}:{smtp_port}")
-        
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            logger.debug("Conexión SMTP establecida")
-            
-            # Activar TLS
-            server.starttls()
-            logger.debug("TLS activado")
-            
-            # Autenticación
-            server.login(sender_email, password)
-            logger.debug(f"Autenticación exitosa para {sender_email}")
-            
-            # Enviar email
-            server.sendmail(sender_email, destinatarios, msg.as_string())
-            logger.info(f"✅ Email enviado exitosamente a {len(destinatarios)} destinatarios")
-            
-        return True
-        
-    except smtplib.SMTPAuthenticationError as e:
-        logger.error(f"❌ Error de autenticación SMTP: {e}")
-        logger.error("Verifica las credenciales del email")
-        return False
-        
-    except smtplib.SMTPRecipientsRefused as e:
-        logger.error(f"❌ Destinatarios rechazados: {e}")
-        logger.error("Verifica que las direcciones de email sean válidas")
-        return False
-        
-    except smtplib.SMTPServerDisconnected as e:
-        logger.error(f"❌ Servidor SMTP desconectado: {e}")
-        logger.error("Problema de conectividad con el servidor de email")
-        return False
-        
-    except smtplib.SMTPException as e:
-        logger.error(f"❌ Error SMTP general: {e}")
-        return False
-        
-    except ConnectionError as e:
-        logger.error(f"❌ Error de conexión: {e}")
-        logger.error("Verifica la conectividad a internet y configuración del servidor")
-        return False
-        
-    except Exception as e:
-        logger.error(f"❌ Error inesperado al enviar email: {e}")
-        logger.exception("Detalles completos del error:")
-        return False
+    Returns:
+        True si se envió correctamente, False si hubo error
+    """
+    return enviar_mensaje_con_reintentos(msg, destinatarios, sender_email, password, max_reintentos=1,
+                                         smtp_server=smtp_server, smtp_port=smtp_port)
 
 def enviar_email_con_reintentos(
     cuerpo_mensaje: str,
@@ -114,29 +447,39 @@ def enviar_email_con_reintentos(
     sender_email: str,
     password: str,
     max_reintentos: int = 3,
-    **kwargs
+    smtp_server: str = "smtp.office365.com",
+    smtp_port: int = 587,
+    subject_prefix: str = PREFIJO_ASUNTO
 ) -> bool:
     """
-    Versión con reintentos automáticos del envío de email.
+    Versión con reintentos automáticos del envío de email. El mensaje se construye una vez
+    y solo los errores transitorios se reintentan (ver `ClienteSMTP`).
     
     Args:
         max_reintentos: Número máximo de intentos
-        **kwargs: Argumentos adicionales para enviar_email
     
     Returns:
         True si se envió correctamente, False si falló después de todos los reintentos
     """
-    for intento in range(1, max_reintentos + 1):
-        logger.info(f"Intento {intento}/{max_reintentos} de envío de email")
-        
-        if enviar_email(cuerpo_mensaje, destinatarios, fecha_asunto, sender_email, password, **kwargs):
-            return True
-        
-        if intento < max_reintentos:
-            import time
-            tiempo_espera = intento * 2  # Backoff exponencial simple
-            logger.warning(f"Reintentando en {tiempo_espera} segundos...")
-            time.sleep(tiempo_espera)
-    
-    logger.error(f"❌ Falló el envío después de {max_reintentos} intentos")
-    return False
\ No newline at end of file
+    if not cuerpo_mensaje.strip():
+        logger.error("El cuerpo del mensaje está vacío")
+        return False
+    msg = construir_mensaje(cuerpo_mensaje, destinatarios, construir_asunto(fecha_asunto, subject_prefix), sender_email)
+    return enviar_mensaje_con_reintentos(msg, destinatarios, sender_email, password, max_reintentos=max_reintentos,
+                                         smtp_server=smtp_server, smtp_port=smtp_port)
+
+def enviar_mensaje_con_reintentos(
+    msg: Message,
+    destinatarios: List[str],
+    sender_email: str,
+    password: str,
+    max_reintentos: int = 3,
+    smtp_server: str = "smtp.office365.com",
+    smtp_port: int = 587
+) -> bool:
+    """
+    Versión con reintentos automáticos de `enviar_mensaje`, en una sesión SMTP propia.
+    Para varios mensajes seguidos conviene un único `ClienteSMTP`.
+    """
+    with ClienteSMTP(smtp_server, smtp_port, sender_email, password, max_reintentos=max_reintentos) as cliente:
+        return cliente.enviar(msg, destinatarios)
@@ -0,0 +1,174 @@
+# Fuentes de datos del reporte: producción (SQL Server + Google Sheets), grabación y reproducción offline
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+import pandas as pd
+import logging
+
+from service.conect_db import ReporteExecutor
+from service.conect_google_sheet import get_excel_stock_und
+from utils.fechas import normalizar_fecha
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+ARCHIVO_MANIFIESTO = "manifest.json"
+
+
+def _clave_snapshot(nombre: str, **params) -> str:
+    """ Nombre de archivo estable para una fuente y sus parámetros """
+    partes = [nombre] + [f"{k}={v}" for k, v in sorted(params.items())]
+    return re.sub(r"[^0-9A-Za-z_=.-]+", "-", "__".join(partes))
+
+
+class FuenteDatos(ABC):
+    """
+    Interfaz de las fuentes del reporte. `main` obtiene todos los DataFrames de origen
+    a través de esta interfaz, por lo que producción, grabación y reproducción son intercambiables.
+    """
+    fecha: Optional[date] = None  # Fecha fija de la fuente (solo en reproducción)
+
+    @abstractmethod
+    def obtener_reporte(self, nombre_reporte: str, **kwargs) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def obtener_sheet(self, form: str) -> pd.DataFrame:
+        ...
+
+    def cerrar(self) -> None:
+        pass
+
+
+class FuenteProduccion(FuenteDatos):
+    """ SQL Server (vía `ReporteExecutor`) y Google Sheets (vía `get_excel_stock_und`) """
+
+    def __init__(self, executor: ReporteExecutor, google_sheet_credentials: str, accesos_sheet_google: dict):
+        self.executor = executor
+        self.google_sheet_credentials = google_sheet_credentials
+        self.accesos_sheet_google = accesos_sheet_google
+
+    def obtener_reporte(self, nombre_reporte: str, **kwargs) -> pd.DataFrame:
+        return self.executor.ejecutar_reporte(nombre_reporte, **kwargs)
+
+    def obtener_sheet(self, form: str) -> pd.DataFrame:
+        return get_excel_stock_und(
+            form=form,
+            GOOGLE_SHEET_CREDENTIALS=self.google_sheet_credentials,
+            ACCESOS_SHEET_GOOGLE=self.accesos_sheet_google
+        )
+
+    def cerrar(self) -> None:
+        self.executor.cerrar()
+
+
+class BundleSnapshots:
+    """
+    Bundle de snapshots de una ejecución: un Parquet comprimido por DataFrame de origen
+    más un `manifest.json` con la fecha del reporte y los parámetros de cada fuente.
+
+        <directorio>/<run_id>/manifest.json
+        <directorio>/<run_id>/ventas_x_sku__fecha=01-08-2025.parquet
+        ...
+    """
+
+    def __init__(self, directorio: str, run_id: str, compresion: str = "zstd"):
+        self.ruta = os.path.join(directorio, run_id)
+        self.run_id = run_id
+        self.compresion = compresion
+        self._manifiesto: Optional[Dict[str, Any]] = None
+
+    @property
+    def manifiesto(self) -> Dict[str, Any]:
+        if self._manifiesto is None:
+            ruta = os.path.join(self.ruta, ARCHIVO_MANIFIESTO)
+            if os.path.exists(ruta):
+                with open(ruta, encoding="utf-8") as f:
+                    self._manifiesto = json.load(f)
+            else:
+                self._manifiesto = {"run_id": self.run_id, "fecha": None, "fuentes": {}}
+        return self._manifiesto
+
+    def guardar(self, df: pd.DataFrame, tipo: str, nombre: str, **params) -> str:
+        os.makedirs(self.ruta, exist_ok=True)
+        clave = _clave_snapshot(nombre, **params)
+        archivo = f"{clave}.parquet"
+        # Parquet requiere nombres de columna string
+        df.rename(columns=str).to_parquet(os.path.join(self.ruta, archivo), compression=self.compresion, index=False)
+        self.manifiesto["fuentes"][clave] = {
+            "tipo": tipo,
+            "nombre": nombre,
+            "params": {k: str(v) for k, v in params.items()},
+            "archivo": archivo,
+            "filas": len(df),
+            "columnas": list(map(str, df.columns)),
+            "grabado": datetime.now().isoformat(timespec="seconds"),
+        }
+        self._escribir_manifiesto()
+        logger.info(f"💾 Snapshot '{clave}' grabado ({len(df)} filas)")
+        return clave
+
+    def cargar(self, tipo: str, nombre: str, **params) -> pd.DataFrame:
+        fuentes = self.manifiesto["fuentes"]
+        clave = _clave_snapshot(nombre, **params)
+        if clave not in fuentes:
+            # Se permite reproducir con otros parámetros si la fuente se grabó una sola vez
+            candidatas = [c for c, meta in fuentes.items() if meta["tipo"] == tipo and meta["nombre"] == nombre]
+            if len(candidatas) != 1:
+                raise KeyError(f"El bundle '{self.run_id}' no tiene un snapshot para {tipo} '{nombre}' {params}")
+            logger.warning(f"⚠️ Snapshot exacto '{clave}' no encontrado, se usa '{candidatas[0]}'")
+            clave = candidatas[0]
+        df = pd.read_parquet(os.path.join(self.ruta, fuentes[clave]["archivo"]))
+        logger.info(f"📂 Snapshot '{clave}' cargado ({len(df)} filas)")
+        return df
+
+    def registrar_fecha(self, fecha: date) -> None:
+        self.manifiesto["fecha"] = normalizar_fecha(fecha).isoformat()
+        self._escribir_manifiesto()
+
+    def _escribir_manifiesto(self) -> None:
+        os.makedirs(self.ruta, exist_ok=True)
+        with open(os.path.join(self.ruta, ARCHIVO_MANIFIESTO), "w", encoding="utf-8") as f:
+            json.dump(self.manifiesto, f, ensure_ascii=False, indent=2)
+
+
+class FuenteGrabadora(FuenteDatos):
+    """ Envuelve otra fuente y graba cada DataFrame que devuelve en un bundle de snapshots """
+
+    def __init__(self, fuente: FuenteDatos, bundle: BundleSnapshots, fecha: date):
+        self.fuente = fuente
+        self.bundle = bundle
+        self.bundle.registrar_fecha(fecha)
+
+    def obtener_reporte(self, nombre_reporte: str, **kwargs) -> pd.DataFrame:
+        df = self.fuente.obtener_reporte(nombre_reporte, **kwargs)
+        self.bundle.guardar(df, "reporte", nombre_reporte, **kwargs)
+        return df
+
+    def obtener_sheet(self, form: str) -> pd.DataFrame:
+        df = self.fuente.obtener_sheet(form)
+        self.bundle.guardar(df, "sheet", form)
+        return df
+
+    def cerrar(self) -> None:
+        self.fuente.cerrar()
+
+
+class FuenteReproduccion(FuenteDatos):
+    """ Devuelve los DataFrames grabados en un bundle, sin acceso a SQL Server ni a Google Sheets """
+
+    def __init__(self, bundle: BundleSnapshots):
+        self.bundle = bundle
+        if not os.path.exists(os.path.join(bundle.ruta, ARCHIVO_MANIFIESTO)):
+            raise FileNotFoundError(f"No existe el bundle de snapshots '{bundle.ruta}'")
+        fecha = bundle.manifiesto.get("fecha")
+        self.fecha = date.fromisoformat(fecha) if fecha else None
+
+    def obtener_reporte(self, nombre_reporte: str, **kwargs) -> pd.DataFrame:
+        return self.bundle.cargar("reporte", nombre_reporte, **kwargs)
+
+    def obtener_sheet(self, form: str) -> pd.DataFrame:
+        return self.bundle.cargar("sheet", form)
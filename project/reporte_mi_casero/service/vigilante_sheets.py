@@ -0,0 +1,189 @@
+# Vigilancia del formulario de movimientos: espera a que el día tenga todos sus tipos de movimiento
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+import pandas as pd
+import logging
+
+from utils.fechas import normalizar_fecha, formatear_fecha, parsear_fechas
+from utils.metricas import medir_etapa
+from validators.validator_data import DatosInvalidosError
+
+if TYPE_CHECKING:
+    import requests
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+URL_BASE_SHEETS = "https://sheets.googleapis.com"
+MOVIMIENTOS_REQUERIDOS = {"Stock inicial", "Ingreso", "Salida"}
+
+
+def _letra_columna(indice: int) -> str:
+    """ 0 -> 'A', 25 -> 'Z', 26 -> 'AA' """
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord("A") + resto) + letras
+    return letras
+
+
+def _normalizar_movimiento(valor: str) -> str:
+    # Misma normalización que validar_movimientos_diarios_completos
+    return " ".join(str(valor).split()).lower()
+
+
+class HojaSheetsAPI:
+    """
+    Lectura de rangos A1 de la primera hoja con la API REST v4 de Google Sheets (`values.get`),
+    que devuelve solo las celdas pedidas. `sesion` es una `AuthorizedSession` en producción o
+    una `requests.Session` contra el servidor local de pruebas (`benchmarks/sheets_local.py`).
+    """
+
+    def __init__(self, sheet_id: str, sesion: "requests.Session", url_base: str = URL_BASE_SHEETS, timeout: float = 30.0):
+        self.sheet_id = sheet_id
+        self.sesion = sesion
+        self.url_base = url_base.rstrip("/")
+        self.timeout = timeout
+
+    def valores(self, rango: str) -> List[List[str]]:
+        url = f"{self.url_base}/v4/spreadsheets/{self.sheet_id}/values/{quote(rango)}"
+        respuesta = self.sesion.get(url, params={"majorDimension": "ROWS"}, timeout=self.timeout)
+        respuesta.raise_for_status()
+        return respuesta.json().get("values", [])
+
+
+def crear_hoja_sheets_api(form: str, GOOGLE_SHEET_CREDENTIALS: str, ACCESOS_SHEET_GOOGLE: dict,
+                          url_base: Optional[str] = None) -> HojaSheetsAPI:
+    """ Hoja del formulario `form`; con `url_base` se usa un servidor local sin autenticación """
+    import requests
+    sheet_id = ACCESOS_SHEET_GOOGLE[form]["SHEET_ID"]
+    if url_base:
+        return HojaSheetsAPI(sheet_id, requests.Session(), url_base=url_base)
+    from google.auth.transport.requests import AuthorizedSession
+    from google.oauth2.service_account import Credentials
+    scopes = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+    creds = Credentials.from_service_account_file(GOOGLE_SHEET_CREDENTIALS, scopes=scopes)
+    return HojaSheetsAPI(sheet_id, AuthorizedSession(creds))
+
+
+class VigilanteMovimientos:
+    """
+    Lee de forma incremental solo las columnas de fecha y tipo de movimiento del formulario.
+
+    Cada sondeo pide las filas desde la última leída (menos `solapamiento` filas, para ver
+    correcciones recientes) hasta el final, en lugar de descargar toda la hoja. Si la hoja tiene
+    menos filas que las ya leídas (se borraron filas), la foto se reconstruye leyéndola completa.
+    """
+
+    def __init__(self, hoja: HojaSheetsAPI, columna_fecha: str = "Fecha",
+                 columna_movimiento: str = "Tipo de movimiento",
+                 movimientos_requeridos: Optional[Set[str]] = None, solapamiento: int = 20):
+        self.hoja = hoja
+        self.columna_fecha = columna_fecha
+        self.columna_movimiento = columna_movimiento
+        self.movimientos_requeridos = {_normalizar_movimiento(m) for m in (movimientos_requeridos or MOVIMIENTOS_REQUERIDOS)}
+        self.solapamiento = solapamiento
+        self.siguiente_fila = 2  # La fila 1 son los encabezados
+        self._columnas: Optional[Tuple[str, str, int, int]] = None
+        self._filas: Dict[int, Tuple[Optional[date], str]] = {}
+
+    def _ubicar_columnas(self) -> Tuple[str, str, int, int]:
+        if self._columnas is None:
+            encabezados = (self.hoja.valores("1:1") or [[]])[0]
+            for columna in (self.columna_fecha, self.columna_movimiento):
+                if columna not in encabezados:
+                    raise DatosInvalidosError(f"Falta la columna obligatoria: '{columna}'.")
+            i_fecha = encabezados.index(self.columna_fecha)
+            i_mov = encabezados.index(self.columna_movimiento)
+            desde, hasta = min(i_fecha, i_mov), max(i_fecha, i_mov)
+            self._columnas = (_letra_columna(desde), _letra_columna(hasta), i_fecha - desde, i_mov - desde)
+        return self._columnas
+
+    def sondear(self) -> int:
+        """ Lee las filas nuevas; devuelve cuántas filas no vistas había """
+        col_desde, col_hasta, i_fecha, i_mov = self._ubicar_columnas()
+        fila_desde = max(2, self.siguiente_fila - self.solapamiento)
+        valores = self.hoja.valores(f"{col_desde}{fila_desde}:{col_hasta}")
+        if fila_desde + len(valores) < self.siguiente_fila:
+            # Se borraron filas: las filas guardadas ya no corresponden a la hoja
+            logger.info(f"♻️ La hoja tiene menos filas que las leídas ({self.siguiente_fila - 2}); se vuelve a leer completa")
+            self._filas = {}
+            self.siguiente_fila = 2
+            return self.sondear()
+        if not valores:
+            return 0
+        ancho = max(i_fecha, i_mov) + 1
+        valores = [fila + [""] * (ancho - len(fila)) for fila in valores]
+        fechas = parsear_fechas(pd.Series([fila[i_fecha] for fila in valores]))
+        for desplazamiento, (fila, fecha) in enumerate(zip(valores, fechas)):
+            self._filas[fila_desde + desplazamiento] = (None if pd.isna(fecha) else fecha.date(),
+                                                       _normalizar_movimiento(fila[i_mov]))
+        ultima = fila_desde + len(valores)
+        nuevas = max(0, ultima - self.siguiente_fila)
+        self.siguiente_fila = max(self.siguiente_fila, ultima)
+        return nuevas
+
+    def faltantes(self, fecha: date) -> Set[str]:
+        encontrados = {mov for f, mov in self._filas.values() if f == fecha}
+        return self.movimientos_requeridos - encontrados
+
+
+def esperar_movimientos_completos(
+    vigilante: VigilanteMovimientos,
+    fecha,
+    intervalo_min: float = 30.0,
+    intervalo_max: float = 600.0,
+    factor: float = 1.5,
+    limite: Optional[datetime] = None,
+    dormir: Callable[[float], None] = time.sleep,
+    reloj: Callable[[], datetime] = datetime.now
+) -> bool:
+    """
+    Sondea la hoja hasta que `fecha` tenga todos los movimientos requeridos (True) o se
+    alcance `limite` (False). Backoff adaptativo: si un sondeo no trae filas nuevas el
+    intervalo crece por `factor` hasta `intervalo_max`; si trae filas (la tienda está
+    cargando el formulario) vuelve a `intervalo_min`. Los errores de red y las cuotas
+    (429) también alargan la espera; los demás errores 4xx y una hoja sin las columnas
+    requeridas terminan la espera con False.
+    """
+    import requests
+    fecha = normalizar_fecha(fecha)
+    intervalo = intervalo_min
+    sondeos = 0
+    while True:
+        sondeos += 1
+        try:
+            with medir_etapa("watch.sondeo") as etapa:
+                nuevas = vigilante.sondear()
+                etapa.anotar(filas=nuevas)
+            faltantes = vigilante.faltantes(fecha)
+            if not faltantes:
+                logger.info(f"✅ Movimientos del {formatear_fecha(fecha)} completos tras {sondeos} sondeos")
+                return True
+            intervalo = intervalo_min if nuevas else min(intervalo * factor, intervalo_max)
+            detalle = f"faltan {', '.join(sorted(m.title() for m in faltantes))}"
+        except requests.HTTPError as e:
+            codigo = e.response.status_code if e.response is not None else None
+            if codigo is not None and 400 <= codigo < 500 and codigo not in (408, 429):
+                # Permisos, SHEET_ID o rango inválidos: reintentar no lo arregla
+                logger.error(f"❌ La hoja rechazó la lectura ({codigo}): {e}")
+                return False
+            intervalo = min(intervalo * factor, intervalo_max)
+            detalle = f"error al leer la hoja ({e})"
+        except requests.RequestException as e:
+            intervalo = min(intervalo * factor, intervalo_max)
+            detalle = f"error al leer la hoja ({e})"
+        except DatosInvalidosError as e:
+            # Faltan las columnas de fecha o de movimiento en los encabezados: reintentar no lo arregla
+            logger.error(f"❌ El formulario no tiene el formato esperado: {e}")
+            return False
+        espera = intervalo * random.uniform(0.9, 1.1)
+        if limite is not None and reloj() + timedelta(seconds=espera) > limite:
+            logger.error(f"❌ Límite {limite.isoformat(timespec='minutes')} alcanzado: {detalle} para el {formatear_fecha(fecha)}")
+            return False
+        logger.info(f"⏳ {formatear_fecha(fecha)}: {detalle}; próximo sondeo en {espera:.0f}s")
+        dormir(espera)
@@ -0,0 +1,145 @@
+"""
+Pruebas de la cola de envío (`ColaEnvios`) contra un sumidero SMTP local (aiosmtpd).
+
+Uso (desde project/reporte_mi_casero, con las dependencias de desarrollo: `pip install -r requirements-dev.txt`):
+
+    python -m pytest tests
+"""
+import email
+import socket
+import time
+
+import pytest
+# Sin aiosmtpd la colección falla en lugar de saltar las pruebas en silencio
+from aiosmtpd.controller import Controller
+
+from service.email_service import ColaEnvios, LimitadorTasa, construir_mensaje
+
+REMITENTE = "reportes@local"
+
+
+class SumideroSMTP:
+    """ Guarda cada sobre recibido; rechaza con 550 los destinatarios que empiezan con 'rechazado' y los de `caidos` """
+
+    def __init__(self):
+        self.sobres = []
+        self.caidos = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("rechazado") or address in self.caidos:
+            return "550 5.1.1 Buzón inexistente"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sobres.append((time.monotonic(), list(envelope.rcpt_tos), email.message_from_bytes(envelope.content)))
+        return "250 OK"
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def sumidero():
+    handler = SumideroSMTP()
+    controlador = Controller(handler, hostname="127.0.0.1", port=_puerto_libre())
+    controlador.start()
+    try:
+        yield handler, controlador.port
+    finally:
+        controlador.stop()
+
+
+def _cola(puerto: int, **kwargs) -> ColaEnvios:
+    return ColaEnvios("127.0.0.1", puerto, REMITENTE, "", usar_tls=False, max_reintentos=1, **kwargs)
+
+
+def _mensaje(destinatarios, asunto="Reporte"):
+    return construir_mensaje("<p>📊 Reporte</p>", destinatarios, asunto, REMITENTE)
+
+
+def test_divide_destinatarios_con_to_por_parte(sumidero):
+    handler, puerto = sumidero
+    destinatarios = [f"usuario{i}@local" for i in range(5)]
+    mensaje = _mensaje(destinatarios)
+    cola = _cola(puerto, sesiones=2, max_destinatarios=2)
+    cola.agregar(mensaje, destinatarios, etiqueta="perfil")
+
+    [resultado] = cola.enviar()
+
+    assert resultado.ok and resultado.partes == 3 and resultado.partes_ok == 3
+    assert sorted(resultado.entregados) == sorted(destinatarios)
+    assert sorted(len(rcpt) for _, rcpt, _ in handler.sobres) == [1, 2, 2]
+    for _, rcpt, recibido in handler.sobres:
+        # Cada parte lleva en To: solo a sus destinatarios
+        assert [d.strip() for d in recibido["To"].split(",")] == rcpt
+    # El mensaje encolado queda intacto
+    assert mensaje["To"] == ", ".join(destinatarios)
+
+
+def test_resultado_por_destinatario(sumidero):
+    handler, puerto = sumidero
+    destinatarios = ["usuario0@local", "usuario1@local", "rechazado0@local", "rechazado1@local", "usuario2@local"]
+    cola = _cola(puerto, sesiones=1, max_destinatarios=2)
+    cola.agregar(_mensaje(destinatarios), destinatarios, etiqueta="perfil")
+
+    [resultado] = cola.enviar()
+
+    # Parte 2 (ambos rechazados) falla; las otras llegan
+    assert not resultado.ok
+    assert resultado.partes == 3 and resultado.partes_ok == 2
+    assert sorted(resultado.entregados) == ["usuario0@local", "usuario1@local", "usuario2@local"]
+    assert resultado.pendientes == ["rechazado0@local", "rechazado1@local"]
+    assert resultado.errores and "SMTPRecipientsRefused" in resultado.errores[0]
+    assert resultado.a_dict()["estado"] == "error"
+
+    # Un rechazo dentro de una parte aceptada no cuenta como entregado
+    handler.sobres.clear()
+    parcial = ["usuario3@local", "rechazado2@local"]
+    cola.agregar(_mensaje(parcial), parcial, etiqueta="mixto")
+    [resultado] = cola.enviar()
+    assert resultado.ok and resultado.entregados == ["usuario3@local"]
+    assert resultado.pendientes == ["rechazado2@local"]
+    assert resultado.errores == ["rechazado2@local rechazado (550)"]
+
+
+def test_reenvio_solo_a_pendientes(sumidero):
+    handler, puerto = sumidero
+    destinatarios = ["usuario0@local", "usuario1@local", "usuario2@local"]
+    handler.caidos = {"usuario1@local"}
+    cola = _cola(puerto, sesiones=1, max_destinatarios=1)
+    cola.agregar(_mensaje(destinatarios), destinatarios, etiqueta="perfil")
+    [primero] = cola.enviar()
+    assert primero.pendientes == ["usuario1@local"]
+
+    # El buzón vuelve: el reintento (como --resume) solo manda la parte que faltaba
+    handler.caidos.clear()
+    handler.sobres.clear()
+    cola.agregar(_mensaje(destinatarios), primero.pendientes, etiqueta="perfil")
+    [segundo] = cola.enviar()
+
+    assert segundo.ok and segundo.entregados == ["usuario1@local"]
+    assert [rcpt for _, rcpt, _ in handler.sobres] == [["usuario1@local"]]
+    assert handler.sobres[0][2]["To"] == "usuario1@local"
+
+
+def test_limite_de_mensajes_por_ventana(sumidero):
+    handler, puerto = sumidero
+    cola = _cola(puerto, sesiones=3)
+    cola.limitador = LimitadorTasa(2, ventana=0.5)
+    for i in range(5):
+        cola.agregar(_mensaje([f"usuario{i}@local"]), [f"usuario{i}@local"], etiqueta=f"reporte_{i}")
+
+    inicio = time.monotonic()
+    resultados = cola.enviar()
+
+    assert [r.ok for r in resultados] == [True] * 5
+    assert [r.etiqueta for r in resultados] == [f"reporte_{i}" for i in range(5)]
+    # 5 mensajes con 2 por ventana: hacen falta al menos dos ventanas completas
+    assert time.monotonic() - inicio >= 1.0
+    llegadas = sorted(t for t, _, _ in handler.sobres)
+    for i in range(len(llegadas) - 2):
+        assert llegadas[i + 2] - llegadas[i] >= 0.4
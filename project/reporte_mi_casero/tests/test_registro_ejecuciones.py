@@ -0,0 +1,60 @@
+"""
+Pruebas del registro de envíos (`RegistroEjecuciones`) sobre una base SQLite temporal.
+
+Uso (desde project/reporte_mi_casero, con las dependencias de desarrollo: `pip install -r requirements-dev.txt`):
+
+    python -m pytest tests
+"""
+from datetime import date
+
+import pytest
+
+from utils.registro_ejecuciones import RegistroEjecuciones
+
+REPORTE = "reporte_diario"
+FECHA = date(2025, 8, 1)
+DESTINATARIOS = ["a@local", "b@local", "c@local"]
+
+
+@pytest.fixture
+def ruta(tmp_path):
+    return str(tmp_path / "registro.db")
+
+
+def test_reserva_por_proceso_no_por_run_id(ruta):
+    primero, segundo = RegistroEjecuciones(ruta), RegistroEjecuciones(ruta)
+
+    assert primero.reservar(REPORTE, FECHA, DESTINATARIOS, "h1", "run")
+    # Otra instancia con el mismo run_id no se lleva la reserva viva
+    assert not segundo.reservar(REPORTE, FECHA, DESTINATARIOS, "h1", "run")
+    assert primero.reservar(REPORTE, FECHA, DESTINATARIOS, "h1", "run")
+
+
+def test_envio_a_medias_guarda_entregados(ruta):
+    registro = RegistroEjecuciones(ruta)
+    assert registro.reservar(REPORTE, FECHA, DESTINATARIOS, "h1", "run1")
+    registro.registrar_envio(REPORTE, FECHA, DESTINATARIOS, False, 1.0, "caído", entregados=["a@local"])
+
+    # Una ejecución nueva (sin --resume) sabe a quiénes ya les llegó
+    nuevo = RegistroEjecuciones(ruta)
+    assert nuevo.reservar(REPORTE, FECHA, DESTINATARIOS, "h1", "run2")
+    assert nuevo.entregados(REPORTE, FECHA, DESTINATARIOS, "h1") == ["a@local"]
+
+    # Los entregados se acumulan entre intentos
+    nuevo.registrar_envio(REPORTE, FECHA, DESTINATARIOS, False, 1.0, "caído", entregados=["b@local"])
+    assert nuevo.entregados(REPORTE, FECHA, DESTINATARIOS, "h1") == ["a@local", "b@local"]
+
+    nuevo.registrar_envio(REPORTE, FECHA, DESTINATARIOS, True, 1.0, entregados=["c@local"])
+    assert nuevo.entregados(REPORTE, FECHA, DESTINATARIOS, "h1") == []
+    assert nuevo.consultar(REPORTE, FECHA, DESTINATARIOS, "h1") == {"accion": "omitir"}
+
+
+def test_fuentes_nuevas_descartan_entregados(ruta):
+    registro = RegistroEjecuciones(ruta)
+    assert registro.reservar(REPORTE, FECHA, DESTINATARIOS, "h1", "run1")
+    registro.registrar_envio(REPORTE, FECHA, DESTINATARIOS, False, 1.0, "caído", entregados=["a@local"])
+
+    # Con otras fuentes todos deben recibir el reporte nuevo
+    assert registro.reservar(REPORTE, FECHA, DESTINATARIOS, "h2", "run2")
+    assert registro.entregados(REPORTE, FECHA, DESTINATARIOS, "h2") == []
+    assert registro.entregados(REPORTE, FECHA, DESTINATARIOS, "h1") == []
@@ -0,0 +1,138 @@
+"""
+Pruebas de la vigilancia del formulario (`VigilanteMovimientos`, `esperar_movimientos_completos`)
+contra el servidor local que imita la API v4 de Google Sheets (`benchmarks/sheets_local.py`).
+
+Uso (desde project/reporte_mi_casero, con las dependencias de desarrollo: `pip install -r requirements-dev.txt`):
+
+    python -m pytest tests
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+import requests
+
+from benchmarks.sheets_local import ServidorSheetsLocal, formulario_sin_salidas_de_hoy
+from service.vigilante_sheets import HojaSheetsAPI, VigilanteMovimientos, esperar_movimientos_completos
+
+SHEET_ID = "form_mov_pollos"
+FECHA = date(2025, 8, 1)
+
+
+@pytest.fixture
+def servidor():
+    servidor = ServidorSheetsLocal().iniciar()
+    try:
+        yield servidor
+    finally:
+        servidor.detener()
+
+
+@pytest.fixture
+def formulario():
+    """ (hoja sin las salidas de FECHA, salidas pendientes) """
+    return formulario_sin_salidas_de_hoy(FECHA, n_fechas=10, n_skus=3)
+
+
+def _rango(url: str) -> str:
+    return requests.utils.unquote(url.split("/values/")[1].split("?")[0])
+
+
+def _vigilante(servidor, rangos=None, sheet_id=SHEET_ID, solapamiento=5):
+    sesion = requests.Session()
+    if rangos is not None:
+        # Rango A1 de cada lectura, para ver qué filas se pidieron
+        sesion.hooks["response"].append(lambda r, *a, **k: rangos.append(_rango(r.url)))
+    return VigilanteMovimientos(HojaSheetsAPI(sheet_id, sesion, url_base=servidor.url_base), solapamiento=solapamiento)
+
+
+class RelojFalso:
+    """ `reloj` y `dormir` de `esperar_movimientos_completos` sin esperas reales """
+
+    def __init__(self, inicio: datetime, al_dormir=None):
+        self.ahora = inicio
+        self.esperas = []
+        self.al_dormir = al_dormir
+
+    def reloj(self) -> datetime:
+        return self.ahora
+
+    def dormir(self, segundos: float) -> None:
+        self.esperas.append(segundos)
+        self.ahora += timedelta(seconds=segundos)
+        if self.al_dormir:
+            self.al_dormir(len(self.esperas))
+
+
+def test_lectura_de_la_cola_con_solapamiento(servidor, formulario):
+    hoja, salidas = formulario
+    servidor.cargar(SHEET_ID, hoja)
+    rangos = []
+    vigilante = _vigilante(servidor, rangos, solapamiento=5)
+
+    assert vigilante.sondear() == len(hoja) - 1
+    assert vigilante.siguiente_fila == len(hoja) + 1
+    assert vigilante.faltantes(FECHA) == {"salida"}
+
+    # Solo se piden las filas nuevas y las `solapamiento` anteriores, y solo las columnas de fecha y movimiento
+    servidor.agregar_filas(SHEET_ID, salidas)
+    assert vigilante.sondear() == len(salidas)
+    assert rangos == ["1:1", "B2:C", f"B{len(hoja) + 1 - 5}:C"]
+    assert vigilante.faltantes(FECHA) == set()
+
+    # Sin filas nuevas vuelve a leer solo el solapamiento
+    assert vigilante.sondear() == 0
+    assert rangos[-1] == f"B{len(hoja) + len(salidas) + 1 - 5}:C"
+
+
+def test_reconstruye_si_la_hoja_se_achica(servidor, formulario):
+    hoja, salidas = formulario
+    servidor.cargar(SHEET_ID, hoja + salidas)
+    vigilante = _vigilante(servidor, solapamiento=2)
+    vigilante.sondear()
+    assert vigilante.faltantes(FECHA) == set()
+
+    # Se borran las salidas y más filas de las que cubre el solapamiento: la foto se lee de nuevo completa
+    servidor.cargar(SHEET_ID, hoja)
+    vigilante.sondear()
+    assert vigilante.siguiente_fila == len(hoja) + 1
+    assert vigilante.faltantes(FECHA) == {"salida"}
+
+
+def test_error_4xx_termina_la_espera(servidor):
+    reloj = RelojFalso(datetime(2025, 8, 1, 18, 0))
+    vigilante = _vigilante(servidor, sheet_id="no_existe")
+
+    assert not esperar_movimientos_completos(vigilante, FECHA, dormir=reloj.dormir, reloj=reloj.reloj)
+    # 404: reintentar no lo arregla, no se espera
+    assert reloj.esperas == []
+
+
+def test_limite_de_tiempo(servidor, formulario):
+    hoja, _ = formulario
+    servidor.cargar(SHEET_ID, hoja)
+    inicio = datetime(2025, 8, 1, 18, 0)
+    reloj = RelojFalso(inicio)
+    limite = inicio + timedelta(minutes=10)
+
+    assert not esperar_movimientos_completos(_vigilante(servidor), FECHA, intervalo_min=60, intervalo_max=240,
+                                             limite=limite, dormir=reloj.dormir, reloj=reloj.reloj)
+    # Backoff hasta el máximo, sin dormir más allá del límite
+    assert len(reloj.esperas) >= 2
+    assert reloj.esperas[1] > reloj.esperas[0]
+    assert max(reloj.esperas) <= 240 * 1.1
+    assert reloj.ahora <= limite
+
+
+def test_completa_cuando_llegan_todos_los_movimientos(servidor, formulario):
+    hoja, salidas = formulario
+    servidor.cargar(SHEET_ID, hoja)
+    # La tienda termina de cargar el formulario durante la segunda espera
+    reloj = RelojFalso(datetime(2025, 8, 1, 18, 0),
+                       al_dormir=lambda n: servidor.agregar_filas(SHEET_ID, salidas) if n == 2 else None)
+    vigilante = _vigilante(servidor)
+
+    assert esperar_movimientos_completos(vigilante, FECHA, intervalo_min=30, limite=datetime(2025, 8, 1, 23, 0),
+                                         dormir=reloj.dormir, reloj=reloj.reloj)
+    assert len(reloj.esperas) == 2
+    # La segunda espera ya creció (sin filas nuevas en el segundo sondeo)
+    assert reloj.esperas[1] > reloj.esperas[0] * 1.2
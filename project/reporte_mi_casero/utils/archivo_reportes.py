@@ -0,0 +1,338 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from email.message import Message
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+import logging
+
+from utils.fechas import normalizar_fecha
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS ejecuciones (
+    run_id  TEXT NOT NULL,
+    reporte TEXT NOT NULL,
+    fecha   TEXT NOT NULL,
+    creado  TEXT NOT NULL,
+    datos   TEXT NOT NULL,
+    PRIMARY KEY (run_id, reporte)
+);
+CREATE INDEX IF NOT EXISTS ejecuciones_fecha ON ejecuciones (fecha);
+CREATE TABLE IF NOT EXISTS contenido (
+    run_id  TEXT NOT NULL,
+    reporte TEXT NOT NULL,
+    nombre  TEXT NOT NULL,
+    huella  TEXT NOT NULL,
+    PRIMARY KEY (run_id, reporte, nombre)
+);
+CREATE INDEX IF NOT EXISTS contenido_huella ON contenido (huella);
+CREATE TABLE IF NOT EXISTS objetos (
+    huella          TEXT PRIMARY KEY,
+    bytes           INTEGER NOT NULL,
+    bytes_guardados INTEGER NOT NULL
+);
+"""
+
+# Imágenes embebidas en el HTML del correo: se guardan aparte (una vez) y el HTML las referencia
+_IMAGEN_EMBEBIDA = re.compile(rb'data:image/png;base64,([A-Za-z0-9+/=]+)')
+_REFERENCIA = re.compile(rb'archivo:([0-9a-f]{64})')
+
+# Caracteres permitidos en el nombre de una partición de fuente (el resto se reemplaza por '-')
+_SEGMENTO = re.compile(r"[^0-9A-Za-z_.-]+")
+
+# Prefijo de cada objeto en disco: comprimido (zlib) o tal cual (PNG, Parquet, zip ya vienen comprimidos)
+_COMPRIMIDO, _CRUDO = b"z", b"r"
+
+
+def _huella(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def _parquet(df: pd.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    df.rename(columns=str).to_parquet(buffer, compression="zstd")
+    return buffer.getvalue()
+
+
+def partes_mensaje(mensaje: Message) -> Tuple[Dict[str, bytes], Dict[str, Any]]:
+    """ Cuerpo HTML y adjuntos de un mensaje MIME como archivos, y sus encabezados como datos """
+    archivos: Dict[str, bytes] = {}
+    for parte in mensaje.walk():
+        if parte.is_multipart():
+            continue
+        nombre = parte.get_filename()
+        if nombre:
+            archivos[f"adjuntos/{nombre}"] = parte.get_payload(decode=True)
+        elif parte.get_content_type() == "text/html":
+            archivos["cuerpo.html"] = parte.get_payload(decode=True)
+    datos = {"asunto": str(mensaje["Subject"] or ""), "remitente": str(mensaje["From"] or ""),
+             "destinatarios": [d.strip() for d in str(mensaje["To"] or "").split(",") if d.strip()]}
+    return archivos, datos
+
+
+class ArchivoReportes:
+    """
+    Archivo histórico de lo generado y enviado, direccionado por contenido:
+
+        <directorio>/indice.sqlite                  ejecuciones por fecha, archivos de cada una y objetos
+        <directorio>/objetos/<ab>/<sha256>          contenido de cada archivo, una sola vez (zlib si reduce)
+
+    Cada ejecución (run_id, reporte) guarda un conjunto de archivos con nombre (HTML del correo,
+    gráficos PNG, fuentes en Parquet, adjuntos); el índice asocia cada nombre a la huella SHA-256
+    de su contenido. Un gráfico o una tabla que no cambió entre días o perfiles no ocupa disco de
+    nuevo, y las imágenes embebidas en el HTML se separan para que el cuerpo de cada perfil
+    reutilice el mismo PNG. El disco crece con lo que cambia, no con la cantidad de ejecuciones.
+
+    Las fuentes con historial (`particiones`: nombre -> columna, p. ej. el formulario por 'Fecha')
+    se guardan como un Parquet por valor de la columna (`fuentes/<nombre>/<nnnnn>_<valor>.parquet`):
+    los días pasados no cambian entre ejecuciones, así cada día solo agrega la partición nueva en
+    lugar de otra copia del historial completo. `leer_dataframe` las vuelve a unir (filas agrupadas
+    por valor, en el orden en que aparecen, con índice nuevo).
+
+    `podar` borra las ejecuciones más antiguas que la retención y los objetos que quedan sin uso.
+    """
+
+    def __init__(self, directorio: str, nivel_compresion: int = 6, particiones: Optional[Dict[str, str]] = None):
+        self.directorio = directorio
+        self.nivel_compresion = nivel_compresion
+        self.particiones = particiones or {}
+        self.ruta_indice = os.path.join(directorio, "indice.sqlite")
+        os.makedirs(os.path.join(directorio, "objetos"), exist_ok=True)
+        conexion = sqlite3.connect(self.ruta_indice, timeout=30)
+        try:
+            conexion.executescript(ESQUEMA)
+        finally:
+            conexion.close()
+
+    @contextmanager
+    def _transaccion(self):
+        conexion = sqlite3.connect(self.ruta_indice, timeout=30, isolation_level=None)
+        conexion.row_factory = sqlite3.Row
+        try:
+            conexion.execute("BEGIN IMMEDIATE")
+            yield conexion
+            conexion.execute("COMMIT")
+        except Exception:
+            if conexion.in_transaction:
+                conexion.execute("ROLLBACK")
+            raise
+        finally:
+            conexion.close()
+
+    def _ruta_objeto(self, huella: str) -> str:
+        return os.path.join(self.directorio, "objetos", huella[:2], huella)
+
+    # --- Objetos ---
+
+    def _guardar_objeto(self, conexion: sqlite3.Connection, contenido: bytes) -> Tuple[str, int]:
+        """ Huella del contenido y bytes escritos (0 si ya estaba guardado) """
+        huella = _huella(contenido)
+        if conexion.execute("SELECT 1 FROM objetos WHERE huella = ?", (huella,)).fetchone():
+            return huella, 0
+        comprimido = zlib.compress(contenido, self.nivel_compresion)
+        datos = _COMPRIMIDO + comprimido if len(comprimido) < len(contenido) else _CRUDO + contenido
+        ruta = self._ruta_objeto(huella)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(datos)
+        os.replace(temporal, ruta)
+        conexion.execute("INSERT INTO objetos (huella, bytes, bytes_guardados) VALUES (?, ?, ?)",
+                         (huella, len(contenido), len(datos)))
+        return huella, len(datos)
+
+    def leer_objeto(self, huella: str) -> bytes:
+        with open(self._ruta_objeto(huella), "rb") as f:
+            datos = f.read()
+        contenido = zlib.decompress(datos[1:]) if datos[:1] == _COMPRIMIDO else datos[1:]
+        if _huella(contenido) != huella:
+            raise ValueError(f"Objeto {huella[:12]} del archivo dañado (la huella no coincide)")
+        return contenido
+
+    # --- Ejecuciones ---
+
+    def guardar(self, run_id: str, fecha: date, reporte: str, archivos: Dict[str, Any],
+                dataframes: Optional[Dict[str, pd.DataFrame]] = None,
+                datos: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        """
+        Archiva los `archivos` (nombre -> str o bytes) y `dataframes` (como fuentes/<nombre>.parquet,
+        o una partición por valor si la fuente está en `particiones`) de una ejecución. Reemplaza lo
+        archivado antes con el mismo (run_id, reporte). Devuelve archivos, objetos nuevos y bytes escritos.
+        """
+        contenidos: Dict[str, bytes] = {n: c.encode("utf-8") if isinstance(c, str) else c for n, c in archivos.items()}
+        for nombre, df in (dataframes or {}).items():
+            columna = self.particiones.get(nombre)
+            if columna not in df.columns:
+                contenidos[f"fuentes/{nombre}.parquet"] = _parquet(df)
+                continue
+            for i, (valor, parte) in enumerate(df.groupby(columna, sort=False, dropna=False)):
+                # Índice nuevo: las filas de un día dan los mismos bytes aunque el historial crezca
+                contenidos[f"fuentes/{nombre}/{i:05d}_{_SEGMENTO.sub('-', str(valor))}.parquet"] = \
+                    _parquet(parte.reset_index(drop=True))
+
+        estadisticas = {"archivos": 0, "objetos_nuevos": 0, "bytes_escritos": 0, "bytes": 0}
+        with self._transaccion() as conexion:
+            conexion.execute("DELETE FROM contenido WHERE run_id = ? AND reporte = ?", (run_id, reporte))
+            filas = []
+            for nombre, contenido in contenidos.items():
+                if nombre.endswith(".html"):
+                    contenido, imagenes = self._separar_imagenes(conexion, contenido, estadisticas)
+                    # Las imágenes separadas se registran como archivos del HTML (para la poda)
+                    filas += [(run_id, reporte, f"{nombre}#imagen{i}", h) for i, h in enumerate(imagenes)]
+                huella, escritos = self._guardar_objeto(conexion, contenido)
+                filas.append((run_id, reporte, nombre, huella))
+                estadisticas["archivos"] += 1
+                estadisticas["objetos_nuevos"] += escritos > 0
+                estadisticas["bytes_escritos"] += escritos
+                estadisticas["bytes"] += len(contenido)
+            conexion.executemany("INSERT INTO contenido (run_id, reporte, nombre, huella) VALUES (?, ?, ?, ?)", filas)
+            conexion.execute(
+                "INSERT OR REPLACE INTO ejecuciones (run_id, reporte, fecha, creado, datos) VALUES (?, ?, ?, ?, ?)",
+                (run_id, reporte, normalizar_fecha(fecha).isoformat(), datetime.now().isoformat(timespec="seconds"),
+                 json.dumps(datos or {}, ensure_ascii=False, default=str)))
+        logger.info(f"🗄️ Archivo: '{reporte}' ({run_id}) {estadisticas['archivos']} archivos, "
+                    f"{estadisticas['objetos_nuevos']} nuevos, {estadisticas['bytes_escritos'] / 1e3:,.1f} KB escritos")
+        return estadisticas
+
+    def _separar_imagenes(self, conexion: sqlite3.Connection, html: bytes,
+                          estadisticas: Dict[str, int]) -> Tuple[bytes, List[str]]:
+        """ Reemplaza cada imagen base64 del HTML por `archivo:<huella>` y la guarda como objeto """
+        imagenes: List[str] = []
+
+        def _reemplazar(coincidencia: "re.Match[bytes]") -> bytes:
+            huella, escritos = self._guardar_objeto(conexion, base64.b64decode(coincidencia.group(1)))
+            estadisticas["objetos_nuevos"] += escritos > 0
+            estadisticas["bytes_escritos"] += escritos
+            imagenes.append(huella)
+            return b"archivo:" + huella.encode()
+        return _IMAGEN_EMBEBIDA.sub(_reemplazar, html), imagenes
+
+    def _restaurar_imagenes(self, html: bytes) -> bytes:
+        return _REFERENCIA.sub(lambda m: b"data:image/png;base64," + base64.b64encode(self.leer_objeto(m.group(1).decode())), html)
+
+    def leer(self, run_id: str, reporte: str, nombre: str) -> bytes:
+        """ Contenido de un archivo archivado (el HTML con sus imágenes embebidas de nuevo) """
+        with self._transaccion() as conexion:
+            fila = conexion.execute("SELECT huella FROM contenido WHERE run_id = ? AND reporte = ? AND nombre = ?",
+                                    (run_id, reporte, nombre)).fetchone()
+        if fila is None:
+            raise FileNotFoundError(f"'{nombre}' no está archivado para '{reporte}' ({run_id})")
+        contenido = self.leer_objeto(fila["huella"])
+        return self._restaurar_imagenes(contenido) if nombre.endswith(".html") else contenido
+
+    def leer_dataframe(self, run_id: str, reporte: str, nombre: str) -> pd.DataFrame:
+        """ Fuente archivada; una particionada se une de nuevo en el orden de sus particiones """
+        particiones = [n for n in self.archivos(run_id, reporte) if n.startswith(f"fuentes/{nombre}/")]
+        if not particiones:
+            return pd.read_parquet(io.BytesIO(self.leer(run_id, reporte, f"fuentes/{nombre}.parquet")))
+        return pd.concat([pd.read_parquet(io.BytesIO(self.leer(run_id, reporte, n))) for n in particiones],
+                         ignore_index=True)
+
+    def archivos(self, run_id: str, reporte: str) -> Dict[str, str]:
+        """ Nombre -> huella de los archivos de una ejecución (sin las imágenes separadas de los HTML) """
+        with self._transaccion() as conexion:
+            filas = conexion.execute("SELECT nombre, huella FROM contenido WHERE run_id = ? AND reporte = ? "
+                                     "AND nombre NOT LIKE '%#imagen%' ORDER BY nombre",
+                                     (run_id, reporte)).fetchall()
+        return {f["nombre"]: f["huella"] for f in filas}
+
+    def datos(self, run_id: str, reporte: str) -> Dict[str, Any]:
+        with self._transaccion() as conexion:
+            fila = conexion.execute("SELECT datos FROM ejecuciones WHERE run_id = ? AND reporte = ?",
+                                    (run_id, reporte)).fetchone()
+        if fila is None:
+            raise FileNotFoundError(f"No hay ejecución archivada '{reporte}' ({run_id})")
+        return json.loads(fila["datos"])
+
+    def reconstruir_mensaje(self, run_id: str, reporte: str) -> Message:
+        """ El mensaje archivado (cuerpo y adjuntos) listo para reenviar; los destinatarios se cambian con `replace_header` """
+        from email.mime.application import MIMEApplication
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+
+        datos = self.datos(run_id, reporte)
+        mensaje = MIMEMultipart()
+        mensaje["From"] = datos.get("remitente", "")
+        mensaje["To"] = ", ".join(datos.get("destinatarios", []))
+        mensaje["Subject"] = datos.get("asunto", "")
+        mensaje.attach(MIMEText(self.leer(run_id, reporte, "cuerpo.html").decode("utf-8"), "html", "utf-8"))
+        for nombre in self.archivos(run_id, reporte):
+            if nombre.startswith("adjuntos/"):
+                archivo = nombre.split("/", 1)[1]
+                parte = MIMEApplication(self.leer(run_id, reporte, nombre), Name=archivo)
+                parte["Content-Disposition"] = f'attachment; filename="{archivo}"'
+                mensaje.attach(parte)
+        return mensaje
+
+    # --- Índice por fecha ---
+
+    def buscar(self, desde: Optional[date] = None, hasta: Optional[date] = None, reporte: Optional[str] = None) -> pd.DataFrame:
+        """ Ejecuciones archivadas en el rango de fechas (por el índice de fecha), con su tamaño """
+        condiciones, params = [], []
+        if desde is not None:
+            condiciones.append("e.fecha >= ?")
+            params.append(normalizar_fecha(desde).isoformat())
+        if hasta is not None:
+            condiciones.append("e.fecha <= ?")
+            params.append(normalizar_fecha(hasta).isoformat())
+        if reporte is not None:
+            condiciones.append("e.reporte LIKE ?")
+            params.append(f"{reporte}%")
+        consulta = ("SELECT e.fecha, e.run_id, e.reporte, e.creado, COUNT(c.nombre) AS archivos, "
+                    "COALESCE(SUM(o.bytes), 0) AS bytes, e.datos FROM ejecuciones e "
+                    "LEFT JOIN contenido c ON c.run_id = e.run_id AND c.reporte = e.reporte "
+                    "LEFT JOIN objetos o ON o.huella = c.huella "
+                    + (f"WHERE {' AND '.join(condiciones)} " if condiciones else "")
+                    + "GROUP BY e.run_id, e.reporte ORDER BY e.fecha DESC, e.creado DESC")
+        conexion = sqlite3.connect(self.ruta_indice, timeout=30)
+        try:
+            return pd.read_sql_query(consulta, conexion, params=params)
+        finally:
+            conexion.close()
+
+    def estadisticas(self) -> Dict[str, int]:
+        """ Bytes referenciados por todas las ejecuciones frente a los guardados en disco """
+        with self._transaccion() as conexion:
+            ejecuciones = conexion.execute("SELECT COUNT(*) FROM ejecuciones").fetchone()[0]
+            referenciados = conexion.execute(
+                "SELECT COALESCE(SUM(o.bytes), 0) FROM contenido c JOIN objetos o ON o.huella = c.huella").fetchone()[0]
+            objetos, bytes_disco = conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes_guardados), 0) FROM objetos").fetchone()
+        return {"ejecuciones": ejecuciones, "objetos": objetos, "bytes_referenciados": referenciados,
+                "bytes_en_disco": bytes_disco}
+
+    # --- Retención ---
+
+    def podar(self, retencion_dias: int, hoy: Optional[date] = None) -> Dict[str, int]:
+        """ Borra las ejecuciones con fecha anterior a `hoy - retencion_dias` y los objetos que nadie referencia """
+        limite = (normalizar_fecha(hoy or date.today()) - timedelta(days=retencion_dias)).isoformat()
+        with self._transaccion() as conexion:
+            borradas = conexion.execute(
+                "DELETE FROM ejecuciones WHERE fecha < ?", (limite,)).rowcount
+            conexion.execute("DELETE FROM contenido WHERE NOT EXISTS (SELECT 1 FROM ejecuciones e "
+                             "WHERE e.run_id = contenido.run_id AND e.reporte = contenido.reporte)")
+            vigentes = {f["huella"] for f in conexion.execute("SELECT DISTINCT huella FROM contenido")}
+            huerfanos = [(f["huella"], f["bytes_guardados"]) for f in conexion.execute("SELECT huella, bytes_guardados FROM objetos")
+                         if f["huella"] not in vigentes]
+            conexion.executemany("DELETE FROM objetos WHERE huella = ?", [(h,) for h, _ in huerfanos])
+            # Dentro de la transacción: ninguna otra ejecución puede volver a registrar el objeto mientras se borra
+            for huella, _ in huerfanos:
+                try:
+                    os.remove(self._ruta_objeto(huella))
+                except FileNotFoundError:
+                    pass
+        liberados = sum(b for _, b in huerfanos)
+        if borradas or huerfanos:
+            logger.info(f"🧹 Archivo: {borradas} ejecuciones anteriores al {limite} y {len(huerfanos)} objetos "
+                        f"borrados ({liberados / 1e6:,.2f} MB liberados)")
+        return {"ejecuciones": borradas, "objetos": len(huerfanos), "bytes_liberados": liberados}
@@ -0,0 +1,134 @@
+import hashlib
+import inspect
+import os
+import time
+from collections import OrderedDict
+from importlib import metadata
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+import pandas as pd
+import logging
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def huella_dataframe(df: pd.DataFrame) -> str:
+    """ Hash estable del contenido de un DataFrame (columnas, índice y valores) """
+    h = hashlib.sha1()
+    h.update(repr(list(df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def huella_codigo(*funciones: Callable, paquetes: Iterable[str] = ()) -> str:
+    """
+    Hash de los módulos que definen `funciones` y de la versión instalada de `paquetes`: cambia al
+    editar el código (o actualizar la librería) que genera un fragmento, sin tener que importarla.
+    """
+    h = hashlib.sha1()
+    for ruta in sorted({inspect.getsourcefile(f) for f in funciones}):
+        with open(ruta, "rb") as f:
+            h.update(f.read())
+    for paquete in paquetes:
+        try:
+            h.update(f"{paquete}=={metadata.version(paquete)}".encode())
+        except metadata.PackageNotFoundError:
+            h.update(f"{paquete}==".encode())
+    return h.hexdigest()
+
+
+class CacheRender:
+    """
+    Cache en memoria de resultados de render (tablas HTML, KPIs, gráficos) por huella de sus datos
+    de entrada: dos perfiles que filtran a los mismos datos reutilizan el mismo resultado.
+    Con `max_entradas` es un LRU acotado, para las caches que viven más que una ejecución (daemon).
+    """
+
+    def __init__(self, max_entradas: Optional[int] = None):
+        self.max_entradas = max_entradas
+        self._resultados: "OrderedDict[Tuple[str, Tuple[str, ...]], Any]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, nombre: str, dataframes: Iterable[pd.DataFrame], generar: Callable[[], Any]) -> Any:
+        clave = (nombre, tuple(huella_dataframe(df) for df in dataframes))
+        if clave in self._resultados:
+            self.aciertos += 1
+            self._resultados.move_to_end(clave)
+            logger.info(f"♻️ '{nombre}' reutilizado de la cache de render")
+            return self._resultados[clave]
+        self.fallos += 1
+        resultado = generar()
+        self._resultados[clave] = resultado
+        if self.max_entradas and len(self._resultados) > self.max_entradas:
+            self._resultados.popitem(last=False)
+        return resultado
+
+
+class CacheFragmentos:
+    """
+    Cache de fragmentos del correo que cambian poco (p. ej. el gráfico semanal vs presupuesto, que
+    solo cambia con la semana): en memoria (LRU de `max_entradas`) y, con `directorio`, en disco
+    para que también lo aprovechen las ejecuciones siguientes:
+
+        <directorio>/<seccion>/<clave>.txt      una entrada por sección y huella de sus datos
+
+    La clave debe incluir también la versión de lo que genera el fragmento (`huella_codigo`): si
+    solo fuera la huella de los datos, un cambio de plantilla o de diseño reutilizaría lo viejo.
+
+    Las entradas en disco con más de `max_dias` sin usarse se borran al crear la cache.
+    """
+
+    def __init__(self, directorio: Optional[str] = None, max_entradas: int = 64, max_dias: int = 14):
+        self.directorio = directorio
+        self.max_entradas = max_entradas
+        self._memoria: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        if directorio:
+            self._podar(max_dias)
+
+    def _ruta(self, seccion: str, clave: str) -> str:
+        return os.path.join(self.directorio, seccion, f"{clave}.txt")
+
+    def _podar(self, max_dias: int) -> None:
+        limite = time.time() - max_dias * 86_400
+        for raiz, _, archivos in os.walk(self.directorio):
+            for archivo in archivos:
+                ruta = os.path.join(raiz, archivo)
+                if os.path.getmtime(ruta) < limite:
+                    os.remove(ruta)
+
+    def _recordar(self, llave: Tuple[str, str], valor: str) -> None:
+        self._memoria[llave] = valor
+        self._memoria.move_to_end(llave)
+        if len(self._memoria) > self.max_entradas:
+            self._memoria.popitem(last=False)
+
+    def obtener(self, seccion: str, clave: str, generar: Callable[[], str]) -> str:
+        """ Fragmento de `seccion` para la huella `clave`; `generar()` solo si no está en memoria ni en disco """
+        llave = (seccion, clave)
+        if llave in self._memoria:
+            self.aciertos += 1
+            self._memoria.move_to_end(llave)
+            return self._memoria[llave]
+        if self.directorio and os.path.exists(self._ruta(seccion, clave)):
+            ruta = self._ruta(seccion, clave)
+            with open(ruta, encoding="utf-8") as f:
+                valor = f.read()
+            os.utime(ruta)
+            self.aciertos += 1
+            logger.info(f"♻️ Fragmento '{seccion}' reutilizado de la cache en disco")
+            self._recordar(llave, valor)
+            return valor
+        self.fallos += 1
+        valor = generar()
+        self._recordar(llave, valor)
+        if self.directorio:
+            ruta = self._ruta(seccion, clave)
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            # Escritura atómica: varios procesos (backfill, multi-tienda) pueden generar la misma entrada
+            temporal = f"{ruta}.{os.getpid()}.tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                f.write(valor)
+            os.replace(temporal, ruta)
+        return valor
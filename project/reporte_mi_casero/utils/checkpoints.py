@@ -0,0 +1,174 @@
+import email
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from email.message import Message
+from typing import Any, Dict, List, Optional
+import pandas as pd
+import logging
+
+from utils.fechas import normalizar_fecha
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+ARCHIVO_ESTADO = "estado.json"
+
+
+class CheckpointEjecucion:
+    """
+    Salidas de cada etapa de una ejecución de main, para retomarla con `--resume <run_id>`
+    desde la primera etapa incompleta:
+
+        <directorio>/<run_id>/estado.json                       fecha, modo y etapas completas
+        <directorio>/<run_id>/fuentes/<nombre>.parquet          DataFrames de origen
+        <directorio>/<run_id>/validacion/form_mov_pollos.parquet formulario preparado
+        <directorio>/<run_id>/transformacion/*.html             tabla de stock (el comentario va en estado.json)
+        <directorio>/<run_id>/graficos/*.png
+        <directorio>/<run_id>/mensajes/<perfil>.eml             mensaje MIME final por perfil
+
+    Una etapa se marca completa recién después de escribir sus archivos. Con `habilitado=False`
+    no se escribe nada (la ejecución no se puede retomar).
+
+    `modo` (`{'dry_run': bool, 'replay': run_id | None}`) queda en estado.json: al retomar, main
+    conserva el modo original para que un `--dry-run` o un `--replay` no terminen enviando.
+
+    `finalizar` marca la etapa 'fin' al terminar main; `podar` conserva las últimas ejecuciones
+    terminadas con éxito y las incompletas (retomables) por unos días.
+    """
+
+    def __init__(self, directorio: str, run_id: str, habilitado: bool = True, compresion: str = "zstd",
+                 modo: Optional[Dict[str, Any]] = None):
+        self.ruta = os.path.join(directorio, run_id)
+        self.run_id = run_id
+        self.habilitado = habilitado
+        self.compresion = compresion
+        self._estado: Dict[str, Any] = {"run_id": run_id, "fecha": None, "modo": modo, "etapas": {}}
+
+    @classmethod
+    def retomar(cls, directorio: str, run_id: str, compresion: str = "zstd") -> "CheckpointEjecucion":
+        checkpoint = cls(directorio, run_id, compresion=compresion)
+        ruta = os.path.join(checkpoint.ruta, ARCHIVO_ESTADO)
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(f"No hay checkpoint para la ejecución '{run_id}' en {directorio}")
+        with open(ruta, encoding="utf-8") as f:
+            checkpoint._estado = json.load(f)
+        completas = ", ".join(checkpoint._estado["etapas"]) or "ninguna"
+        logger.info(f"⏯️ Checkpoint '{run_id}' cargado (etapas completas: {completas})")
+        return checkpoint
+
+    @property
+    def fecha(self) -> Optional[date]:
+        return date.fromisoformat(self._estado["fecha"]) if self._estado["fecha"] else None
+
+    @fecha.setter
+    def fecha(self, valor) -> None:
+        self._estado["fecha"] = normalizar_fecha(valor).isoformat()
+
+    @property
+    def modo(self) -> Optional[Dict[str, Any]]:
+        """ Modo de la ejecución original; None en checkpoints anteriores a que se registrara """
+        return self._estado.get("modo")
+
+    def completa(self, etapa: str) -> bool:
+        return etapa in self._estado["etapas"]
+
+    def datos(self, etapa: str) -> Dict[str, Any]:
+        return self._estado["etapas"][etapa]
+
+    def marcar(self, etapa: str, **datos) -> None:
+        if not self.habilitado:
+            return
+        self._estado["etapas"][etapa] = {"completada": datetime.now().isoformat(timespec="seconds"), **datos}
+        os.makedirs(self.ruta, exist_ok=True)
+        # Escritura atómica: un corte a mitad no deja un estado.json ilegible
+        temporal = os.path.join(self.ruta, f"{ARCHIVO_ESTADO}.tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self._estado, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, os.path.join(self.ruta, ARCHIVO_ESTADO))
+
+    def finalizar(self, exito: bool) -> None:
+        """ Marca el fin de la ejecución; solo las terminadas con éxito ya no necesitan retomarse """
+        self.marcar("fin", exito=bool(exito))
+
+    @staticmethod
+    def podar(directorio: str, conservar: int, retencion_dias: int, excluir: Optional[str] = None) -> int:
+        """
+        Borra los checkpoints terminados con éxito salvo los `conservar` más recientes, y los
+        incompletos sin cambios en los últimos `retencion_dias` días. `excluir`: run_id en curso.
+        Devuelve cuántas ejecuciones se borraron.
+        """
+        if not os.path.isdir(directorio):
+            return 0
+        terminadas, borrar = [], []
+        limite = datetime.now() - timedelta(days=retencion_dias)
+        for run_id in os.listdir(directorio):
+            ruta_estado = os.path.join(directorio, run_id, ARCHIVO_ESTADO)
+            if run_id == excluir or not os.path.exists(ruta_estado):
+                continue
+            modificado = datetime.fromtimestamp(os.path.getmtime(ruta_estado))
+            try:
+                with open(ruta_estado, encoding="utf-8") as f:
+                    fin = json.load(f)["etapas"].get("fin", {})
+            except (OSError, ValueError, KeyError):
+                fin = {}
+            if fin.get("exito"):
+                terminadas.append((modificado, run_id))
+            elif modificado < limite:
+                borrar.append(run_id)
+        borrar += [run_id for _, run_id in sorted(terminadas, reverse=True)[conservar:]]
+        for run_id in borrar:
+            shutil.rmtree(os.path.join(directorio, run_id), ignore_errors=True)
+        if borrar:
+            logger.info(f"🧹 {len(borrar)} checkpoints borrados de {directorio}")
+        return len(borrar)
+
+    def _archivo(self, etapa: str, nombre: str) -> str:
+        return os.path.join(self.ruta, etapa, nombre)
+
+    # --- DataFrames ---
+
+    def guardar_dataframes(self, etapa: str, dataframes: Dict[str, pd.DataFrame]) -> None:
+        if not self.habilitado:
+            return
+        os.makedirs(os.path.join(self.ruta, etapa), exist_ok=True)
+        for nombre, df in dataframes.items():
+            # Parquet requiere nombres de columna string; el índice (p. ej. el de fechas) se conserva
+            df.rename(columns=str).to_parquet(self._archivo(etapa, f"{nombre}.parquet"), compression=self.compresion)
+        self.marcar(etapa, archivos=sorted(dataframes))
+
+    def cargar_dataframes(self, etapa: str) -> Dict[str, pd.DataFrame]:
+        dataframes = {nombre: pd.read_parquet(self._archivo(etapa, f"{nombre}.parquet"))
+                      for nombre in self.datos(etapa)["archivos"]}
+        logger.info(f"📂 Etapa '{etapa}' retomada del checkpoint ({len(dataframes)} DataFrames)")
+        return dataframes
+
+    # --- Textos e imágenes ---
+
+    def guardar_archivos(self, etapa: str, archivos: Dict[str, Any], **datos) -> None:
+        """ `archivos`: nombre -> str (UTF-8) o bytes; `datos` (valores JSON) quedan en estado.json """
+        if not self.habilitado:
+            return
+        os.makedirs(os.path.join(self.ruta, etapa), exist_ok=True)
+        for nombre, contenido in archivos.items():
+            with open(self._archivo(etapa, nombre), "wb") as f:
+                f.write(contenido.encode("utf-8") if isinstance(contenido, str) else contenido)
+        self.marcar(etapa, archivos=sorted(archivos), **datos)
+
+    def leer_archivo(self, etapa: str, nombre: str) -> bytes:
+        with open(self._archivo(etapa, nombre), "rb") as f:
+            return f.read()
+
+    # --- Mensajes ---
+
+    def guardar_mensaje(self, etapa: str, perfil: str, mensaje: Message, destinatarios: List[str]) -> None:
+        if not self.habilitado:
+            return
+        os.makedirs(os.path.join(self.ruta, "mensajes"), exist_ok=True)
+        with open(self._archivo("mensajes", f"{perfil}.eml"), "wb") as f:
+            f.write(mensaje.as_bytes())
+        self.marcar(etapa, destinatarios=destinatarios)
+
+    def cargar_mensaje(self, perfil: str) -> Message:
+        return email.message_from_bytes(self.leer_archivo("mensajes", f"{perfil}.eml"))
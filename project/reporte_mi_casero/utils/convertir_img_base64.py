@@ -1,12 +1,23 @@
 import io
 import base64
 import logging
+from utils.metricas import medir_etapa
 # Configurar logging
 logger = logging.getLogger(__name__)
 
 def generar_imagen_base64(fig):
     """ Convierte el gráfico en imagen base64 """
-    img_buffer = io.BytesIO()
-    fig.write_image(img_buffer, format="png")
-    img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-    return img_base64 
\ No newline at end of file
+    with medir_etapa("render.kaleido") as etapa:
+        img_buffer = io.BytesIO()
+        fig.write_image(img_buffer, format="png")
+        img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+        etapa.anotar(bytes_salida=img_buffer.tell())
+    return img_base64 
+
+def calentar_kaleido():
+    """ Inicia Kaleido con un render mínimo: el primer write_image de cada proceso tarda varios segundos """
+    try:
+        import plotly.graph_objects as go
+        go.Figure().to_image(format="png", width=10, height=10)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo inicializar Kaleido: {e}")
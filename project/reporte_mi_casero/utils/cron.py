@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+from typing import List, Set
+import logging
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# (mínimo, máximo) de cada campo: minuto, hora, día del mes, mes, día de la semana (0 o 7 = domingo)
+_RANGOS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _parsear_campo(campo: str, minimo: int, maximo: int) -> Set[int]:
+    """ Soporta '*', valores, listas 'a,b', rangos 'a-b' y pasos '*/n' o 'a-b/n' """
+    valores: Set[int] = set()
+    for parte in campo.split(","):
+        rango, _, paso = parte.partition("/")
+        paso = int(paso) if paso else 1
+        if rango == "*":
+            desde, hasta = minimo, maximo
+        elif "-" in rango:
+            desde, hasta = (int(v) for v in rango.split("-", 1))
+        else:
+            desde = hasta = int(rango)
+        if desde < minimo or hasta > maximo or desde > hasta or paso < 1:
+            raise ValueError(f"Campo cron fuera de rango: '{parte}' (permitido {minimo}-{maximo})")
+        valores.update(range(desde, hasta + 1, paso))
+    return valores
+
+
+class ExpresionCron:
+    """
+    Expresión cron de 5 campos ('minuto hora día mes día_semana'), p. ej. '0 8 * * 1-6'.
+    Como en cron, si se restringen día del mes y día de la semana basta con que coincida uno.
+    """
+
+    def __init__(self, expresion: str):
+        campos = expresion.split()
+        if len(campos) != 5:
+            raise ValueError(f"La expresión cron debe tener 5 campos: '{expresion}'")
+        self.expresion = expresion
+        self.minutos, self.horas, self.dias, self.meses, dias_semana = (
+            _parsear_campo(c, *r) for c, r in zip(campos, _RANGOS)
+        )
+        # cron usa 0 (o 7) = domingo; datetime.weekday() usa 0 = lunes
+        self.dias_semana = {(d - 1) % 7 for d in dias_semana}
+        self._dia_libre = campos[2] == "*"
+        self._dia_semana_libre = campos[4] == "*"
+
+    def _coincide_dia(self, momento: datetime) -> bool:
+        dia = momento.day in self.dias
+        dia_semana = momento.weekday() in self.dias_semana
+        if self._dia_libre or self._dia_semana_libre:
+            return dia and dia_semana
+        return dia or dia_semana
+
+    def siguiente(self, desde: datetime) -> datetime:
+        """ Primer minuto estrictamente posterior a `desde` que cumple la expresión """
+        momento = desde.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = momento + timedelta(days=366 * 5)
+        while momento < limite:
+            if momento.month not in self.meses:
+                anio, mes = (momento.year + 1, 1) if momento.month == 12 else (momento.year, momento.month + 1)
+                momento = momento.replace(year=anio, month=mes, day=1, hour=0, minute=0)
+            elif not self._coincide_dia(momento):
+                momento = (momento + timedelta(days=1)).replace(hour=0, minute=0)
+            elif momento.hour not in self.horas:
+                momento = (momento + timedelta(hours=1)).replace(minute=0)
+            elif momento.minute not in self.minutos:
+                momento += timedelta(minutes=1)
+            else:
+                return momento
+        raise ValueError(f"La expresión cron '{self.expresion}' no tiene próximas ejecuciones")
+
+
+def proxima_ejecucion(expresiones: List[ExpresionCron], desde: datetime) -> datetime:
+    return min(e.siguiente(desde) for e in expresiones)
@@ -0,0 +1,87 @@
+import pandas as pd
+from datetime import datetime, date
+from typing import Union
+import logging
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+FORMATO_FECHA = "%d/%m/%Y"
+
+def normalizar_fecha(fecha: Union[str, datetime, date]) -> date:
+    """
+    Convierte la fecha objetivo a un objeto `date`.
+
+    Acepta `date`, `datetime` o un string con el formato 'dd/mm/YYYY' (o ISO 'YYYY-MM-DD').
+    Lanza ValueError si el formato o el tipo no son válidos.
+    """
+    if isinstance(fecha, datetime):
+        return fecha.date()
+    if isinstance(fecha, date):
+        return fecha
+    if isinstance(fecha, str):
+        try:
+            return datetime.strptime(fecha.strip(), FORMATO_FECHA).date()
+        except ValueError:
+            return date.fromisoformat(fecha.strip())
+    raise ValueError(f"Tipo de fecha no soportado: {type(fecha)}")
+
+def formatear_fecha(fecha: Union[str, datetime, date]) -> str:
+    """ Devuelve la fecha como string 'dd/mm/YYYY' (asunto del correo, parámetros de los SP) """
+    return normalizar_fecha(fecha).strftime(FORMATO_FECHA)
+
+def parsear_fechas(s: pd.Series) -> pd.DatetimeIndex:
+    """
+    Parsea una columna de fechas a un DatetimeIndex sin zona horaria y normalizado a medianoche.
+
+    Soporta seriales de Excel (columnas numéricas) y strings con día primero.
+    Los valores inválidos quedan como NaT.
+    """
+    # Si hay números (posible serial Excel), conviértelo
+    if pd.api.types.is_numeric_dtype(s):
+        # Excel base 1899-12-30 (considera 1900 leap bug)
+        dt = pd.to_datetime(s, origin="1899-12-30", unit="D", errors="coerce")
+    else:
+        dt = pd.to_datetime(s, dayfirst=True, errors="coerce", utc=True)
+        # Remover tz si quedó con tz
+        dt = dt.dt.tz_convert(None)
+    return pd.DatetimeIndex(dt).normalize()
+
+def indexar_por_fecha(df: pd.DataFrame, columna_fecha: str = 'Fecha') -> pd.DataFrame:
+    """
+    Parsea `columna_fecha` una sola vez y la convierte en un DatetimeIndex ordenado.
+
+    Las filas con fecha inválida se descartan. El orden es estable, por lo que se
+    conserva el orden original de las filas dentro de un mismo día.
+    """
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.name == columna_fecha:
+        return df if df.index.is_monotonic_increasing else df.sort_index(kind="stable")
+
+    indice = parsear_fechas(df[columna_fecha])
+    df_indexado = df.drop(columns=[columna_fecha])
+    df_indexado.index = pd.DatetimeIndex(indice, name=columna_fecha)
+
+    invalidas = int(df_indexado.index.isna().sum())
+    if invalidas:
+        logger.warning(f"{invalidas} fila(s) contenían un formato de fecha inválido y fueron descartadas.")
+        df_indexado = df_indexado[df_indexado.index.notna()]
+
+    return df_indexado.sort_index(kind="stable")
+
+def filtrar_por_fecha(df: pd.DataFrame, fecha: Union[str, datetime, date]) -> pd.DataFrame:
+    """
+    Devuelve las filas de un DataFrame indexado por fecha que corresponden al día indicado.
+
+    El índice debe ser un DatetimeIndex ordenado (ver `indexar_por_fecha`); el corte se
+    resuelve con búsqueda binaria sobre el índice, sin volver a parsear ni comparar strings.
+    """
+    inicio = pd.Timestamp(normalizar_fecha(fecha))
+    fin = inicio + pd.Timedelta(days=1)
+    i, j = df.index.searchsorted([inicio, fin], side="left")
+    return df.iloc[i:j]
+
+def filtrar_rango_fechas(df: pd.DataFrame, desde: Union[str, datetime, date], hasta: Union[str, datetime, date]) -> pd.DataFrame:
+    """ Igual que `filtrar_por_fecha` pero para el rango cerrado [desde, hasta] """
+    inicio = pd.Timestamp(normalizar_fecha(desde))
+    fin = pd.Timestamp(normalizar_fecha(hasta)) + pd.Timedelta(days=1)
+    i, j = df.index.searchsorted([inicio, fin], side="left")
+    return df.iloc[i:j]
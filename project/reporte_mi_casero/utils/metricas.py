@@ -0,0 +1,268 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource  # No existe en Windows
+except ImportError:  # pragma: no cover
+    resource = None
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class MetricaEtapa:
+    """ Métricas de una etapa del pipeline (una entrada del registro de la ejecución) """
+    __slots__ = ("nombre", "inicio", "tiempo_s", "cpu_s", "pico_memoria_bytes", "rss_max_bytes",
+                 "filas", "bytes_salida", "estado")
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.inicio = datetime.now().isoformat(timespec="seconds")
+        self.tiempo_s = 0.0
+        self.cpu_s = 0.0
+        self.pico_memoria_bytes = 0
+        self.rss_max_bytes = 0
+        self.filas: Optional[int] = None
+        self.bytes_salida: Optional[int] = None
+        self.estado = "ok"
+
+    def anotar(self, filas: Optional[int] = None, bytes_salida: Optional[int] = None) -> None:
+        """ Suma filas y/o bytes producidos por la etapa """
+        if filas is not None:
+            self.filas = (self.filas or 0) + int(filas)
+        if bytes_salida is not None:
+            self.bytes_salida = (self.bytes_salida or 0) + int(bytes_salida)
+
+    def marcar_error(self) -> None:
+        """ Registra la etapa como fallida aunque termine sin excepción (p. ej. un `return` temprano) """
+        self.estado = "error"
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "etapa": self.nombre,
+            "inicio": self.inicio,
+            "tiempo_s": round(self.tiempo_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+            "pico_memoria_bytes": self.pico_memoria_bytes,
+            "rss_max_bytes": self.rss_max_bytes,
+            "filas": self.filas,
+            "bytes_salida": self.bytes_salida,
+            "estado": self.estado,
+        }
+
+
+class _EtapaNula:
+    """ Se devuelve cuando la instrumentación está deshabilitada: no mide nada """
+    __slots__ = ()
+
+    def anotar(self, filas: Optional[int] = None, bytes_salida: Optional[int] = None) -> None:
+        pass
+
+    def marcar_error(self) -> None:
+        pass
+
+
+class _ContextoNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return _ETAPA_NULA
+
+    def __exit__(self, *exc):
+        return False
+
+
+_ETAPA_NULA = _EtapaNula()
+_CONTEXTO_NULO = _ContextoNulo()
+
+
+def _rss_max_bytes() -> int:
+    """ RSS máximo del proceso hasta el momento (0 si la plataforma no lo soporta) """
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return int(rss if sys.platform == "darwin" else rss * 1024)
+
+
+class RegistroMetricas:
+    """
+    Registro de métricas por etapa de una ejecución del reporte.
+
+    Mide tiempo real, tiempo de CPU, pico de memoria (tracemalloc) y RSS máximo de cada
+    etapa, más las filas y bytes que la etapa anota. Las etapas pueden anidarse
+    (p. ej. cada SP dentro de la extracción de la base de datos).
+    Deshabilitado, `etapa()` devuelve un contexto nulo compartido y el costo es despreciable.
+    """
+
+    def __init__(self):
+        self.habilitado = False
+        self.usar_tracemalloc = False
+        self.run_id: Optional[str] = None
+        self.etapas: List[MetricaEtapa] = []
+        self.observadores: List[Callable[[str, str], None]] = []
+        self._pila: List[MetricaEtapa] = []
+        self._inicio_ejecucion: Optional[float] = None
+
+    def configurar(self, habilitado: bool = True, usar_tracemalloc: bool = True, run_id: Optional[str] = None) -> None:
+        """ Habilita (o deshabilita) la instrumentación y reinicia el registro """
+        self.habilitado = habilitado
+        self.usar_tracemalloc = usar_tracemalloc
+        # Con sufijo aleatorio: dos ejecuciones lanzadas en el mismo segundo no comparten checkpoint ni adjuntos
+        self.run_id = run_id or f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+        self.etapas = []
+        self._pila = []
+        self._inicio_ejecucion = time.perf_counter()
+        if habilitado and usar_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        logger.info(f"📏 Instrumentación {'habilitada' if habilitado else 'deshabilitada'} (run_id={self.run_id})")
+
+    def etapa(self, nombre: str):
+        """ Context manager que mide la etapa `nombre`; devuelve un objeto con `anotar()` """
+        if not self.habilitado:
+            return _CONTEXTO_NULO
+        return self._medir(nombre)
+
+    @contextmanager
+    def _medir(self, nombre: str):
+        metrica = MetricaEtapa(nombre)
+        trazando = self.usar_tracemalloc and tracemalloc.is_tracing()
+        if trazando:
+            # El pico acumulado hasta aquí pertenece a la etapa padre
+            if self._pila:
+                padre = self._pila[-1]
+                padre.pico_memoria_bytes = max(padre.pico_memoria_bytes, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        for observador in self.observadores:
+            observador("inicio", nombre)
+
+        self._pila.append(metrica)
+        t0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield metrica
+        except BaseException:
+            metrica.estado = "error"
+            raise
+        finally:
+            metrica.tiempo_s = time.perf_counter() - t0
+            metrica.cpu_s = time.process_time() - cpu0
+            if trazando:
+                metrica.pico_memoria_bytes = max(metrica.pico_memoria_bytes, tracemalloc.get_traced_memory()[1])
+            metrica.rss_max_bytes = _rss_max_bytes()
+            self._pila.pop()
+            if self._pila:
+                padre = self._pila[-1]
+                padre.pico_memoria_bytes = max(padre.pico_memoria_bytes, metrica.pico_memoria_bytes)
+            self.etapas.append(metrica)
+            for observador in self.observadores:
+                observador("fin", nombre)
+            logger.info(
+                f"⏱️ Etapa '{nombre}': {metrica.tiempo_s:.3f}s (CPU {metrica.cpu_s:.3f}s), "
+                f"pico {metrica.pico_memoria_bytes / 1e6:.1f} MB, filas={metrica.filas}, bytes={metrica.bytes_salida}"
+            )
+
+    def resumen(self) -> Dict[str, Any]:
+        total = time.perf_counter() - self._inicio_ejecucion if self._inicio_ejecucion else 0.0
+        return {
+            "run_id": self.run_id,
+            "fecha_registro": datetime.now().isoformat(timespec="seconds"),
+            "tiempo_total_s": round(total, 6),
+            "rss_max_bytes": _rss_max_bytes(),
+            "etapas": [m.a_dict() for m in self.etapas],
+        }
+
+    def exportar_json(self, directorio: str) -> str:
+        """ Escribe el registro de la ejecución como `<directorio>/ejecucion_<run_id>.json` """
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, f"ejecucion_{self.run_id}.json")
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(self.resumen(), f, ensure_ascii=False, indent=2)
+        logger.info(f"📝 Registro de métricas escrito en {ruta}")
+        return ruta
+
+    def exportar_prometheus(self, directorio: str, nombre_archivo: str = "reporte_mi_casero.prom") -> str:
+        """
+        Escribe las métricas de la última ejecución en formato textfile de Prometheus
+        (para el textfile collector de node_exporter). La escritura es atómica.
+        """
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, nombre_archivo)
+        series = {
+            "reporte_etapa_tiempo_segundos": ("gauge", "Tiempo real de la etapa", "tiempo_s"),
+            "reporte_etapa_cpu_segundos": ("gauge", "Tiempo de CPU de la etapa", "cpu_s"),
+            "reporte_etapa_pico_memoria_bytes": ("gauge", "Pico de memoria (tracemalloc) de la etapa", "pico_memoria_bytes"),
+            "reporte_etapa_filas": ("gauge", "Filas procesadas por la etapa", "filas"),
+            "reporte_etapa_bytes_salida": ("gauge", "Bytes producidos por la etapa", "bytes_salida"),
+            "reporte_etapa_error": ("gauge", "1 si la etapa terminó con error", "estado"),
+        }
+        # Una serie por etapa: las etapas repetidas (p. ej. varios renders) se agregan
+        agregadas: Dict[str, Dict[str, Any]] = {}
+        for m in self.etapas:
+            acumulado = agregadas.setdefault(m.nombre, {"tiempo_s": 0.0, "cpu_s": 0.0, "pico_memoria_bytes": 0,
+                                                         "filas": None, "bytes_salida": None, "estado": 0})
+            acumulado["tiempo_s"] += m.tiempo_s
+            acumulado["cpu_s"] += m.cpu_s
+            acumulado["pico_memoria_bytes"] = max(acumulado["pico_memoria_bytes"], m.pico_memoria_bytes)
+            for campo in ("filas", "bytes_salida"):
+                valor = getattr(m, campo)
+                if valor is not None:
+                    acumulado[campo] = (acumulado[campo] or 0) + valor
+            acumulado["estado"] = max(acumulado["estado"], int(m.estado == "error"))
+
+        lineas = []
+        for metrica, (tipo, ayuda, campo) in series.items():
+            lineas.append(f"# HELP {metrica} {ayuda}")
+            lineas.append(f"# TYPE {metrica} {tipo}")
+            for nombre, acumulado in agregadas.items():
+                valor = acumulado[campo]
+                if valor is None:
+                    continue
+                lineas.append(f'{metrica}{{etapa="{nombre}"}} {valor}')
+        resumen = self.resumen()
+        lineas += [
+            "# HELP reporte_tiempo_total_segundos Tiempo total de la ejecución",
+            "# TYPE reporte_tiempo_total_segundos gauge",
+            f"reporte_tiempo_total_segundos {resumen['tiempo_total_s']}",
+            "# HELP reporte_rss_max_bytes RSS máximo del proceso",
+            "# TYPE reporte_rss_max_bytes gauge",
+            f"reporte_rss_max_bytes {resumen['rss_max_bytes']}",
+            "# HELP reporte_ultima_ejecucion_timestamp Momento de la última ejecución (epoch)",
+            "# TYPE reporte_ultima_ejecucion_timestamp gauge",
+            f"reporte_ultima_ejecucion_timestamp {int(time.time())}",
+        ]
+        ruta_tmp = ruta + ".tmp"
+        with open(ruta_tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lineas) + "\n")
+        os.replace(ruta_tmp, ruta)
+        logger.info(f"📝 Métricas Prometheus escritas en {ruta}")
+        return ruta
+
+    def exportar(self, directorio: str) -> None:
+        """ Exporta el registro JSON y el textfile de Prometheus """
+        if not self.habilitado:
+            return
+        self.exportar_json(directorio)
+        self.exportar_prometheus(directorio)
+
+
+# Registro global de la ejecución (deshabilitado por defecto)
+metricas = RegistroMetricas()
+
+
+def medir_etapa(nombre: str):
+    """
+    Mide una etapa en el registro global:
+
+        with medir_etapa("fetch_db") as etapa:
+            df = ...
+            etapa.anotar(filas=len(df))
+    """
+    return metricas.etapa(nombre)
@@ -0,0 +1,140 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import logging
+from collections import Counter
+from typing import Any, Callable, List, Tuple
+
+from utils.metricas import metricas
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class _MuestreadorPilas(threading.Thread):
+    """
+    Profiler de muestreo: cada `intervalo` segundos captura la pila del hilo objetivo
+    y acumula las pilas en formato colapsado (compatible con flamegraph.pl y speedscope).
+    """
+
+    def __init__(self, id_hilo: int, intervalo: float):
+        super().__init__(name="muestreador-pilas", daemon=True)
+        self.id_hilo = id_hilo
+        self.intervalo = intervalo
+        self.pilas: Counter = Counter()
+        self._detener = threading.Event()
+
+    @staticmethod
+    def _etiqueta(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def run(self) -> None:
+        while not self._detener.is_set():
+            frame = sys._current_frames().get(self.id_hilo)
+            if frame is not None:
+                pila = []
+                while frame is not None:
+                    pila.append(self._etiqueta(frame))
+                    frame = frame.f_back
+                self.pilas[";".join(reversed(pila))] += 1
+            self._detener.wait(self.intervalo)
+
+    def detener(self) -> None:
+        self._detener.set()
+        self.join()
+
+
+class PerfiladorEjecucion:
+    """
+    Perfila una ejecución completa del reporte.
+
+    - cProfile sobre todo el flujo (`perfil.prof` + `perfil_top.txt`).
+    - Muestreo de pilas del hilo principal (`pilas_colapsadas.txt`, para flamegraph).
+    - Snapshots de tracemalloc en los límites de cada etapa registrada con
+      `medir_etapa` y reporte de las N líneas que más memoria asignaron por etapa
+      (`asignaciones_por_etapa.txt`).
+    """
+
+    def __init__(self, directorio: str = "./perfiles", top_n: int = 20, intervalo_muestreo: float = 0.005,
+                 frames_tracemalloc: int = 10):
+        self.directorio = directorio
+        self.top_n = top_n
+        self.intervalo_muestreo = intervalo_muestreo
+        self.frames_tracemalloc = frames_tracemalloc
+        self._snapshots_inicio: List[Tuple[str, tracemalloc.Snapshot]] = []
+        self._asignaciones: List[Tuple[str, List[tracemalloc.StatisticDiff]]] = []
+
+    def _observar_etapa(self, evento: str, nombre: str) -> None:
+        if not tracemalloc.is_tracing():
+            return
+        if evento == "inicio":
+            self._snapshots_inicio.append((nombre, tracemalloc.take_snapshot()))
+            return
+        nombre_inicio, snapshot_inicio = self._snapshots_inicio.pop()
+        snapshot_fin = tracemalloc.take_snapshot()
+        filtros = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ]
+        diferencias = snapshot_fin.filter_traces(filtros).compare_to(snapshot_inicio.filter_traces(filtros), "lineno")
+        self._asignaciones.append((nombre_inicio, diferencias[:self.top_n]))
+
+    def ejecutar(self, funcion: Callable[..., Any], *args, **kwargs) -> Any:
+        """ Ejecuta `funcion` bajo el perfilador y escribe los reportes en `<directorio>/<run_id>` """
+        # metricas.configurar ya pudo iniciar tracemalloc con 1 frame: se reinicia con la profundidad pedida
+        if tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() < self.frames_tracemalloc:
+            tracemalloc.stop()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames_tracemalloc)
+        metricas.observadores.append(self._observar_etapa)
+
+        perfil = cProfile.Profile()
+        muestreador = _MuestreadorPilas(threading.get_ident(), self.intervalo_muestreo)
+        logger.info("🔬 Iniciando ejecución perfilada...")
+        t0 = time.perf_counter()
+        muestreador.start()
+        try:
+            return perfil.runcall(funcion, *args, **kwargs)
+        finally:
+            muestreador.detener()
+            metricas.observadores.remove(self._observar_etapa)
+            logger.info(f"🔬 Ejecución perfilada finalizada en {time.perf_counter() - t0:.2f}s")
+            self._escribir_reportes(perfil, muestreador)
+
+    def _escribir_reportes(self, perfil: cProfile.Profile, muestreador: _MuestreadorPilas) -> None:
+        directorio = os.path.join(self.directorio, metricas.run_id or time.strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(directorio, exist_ok=True)
+
+        # 1. cProfile: binario para snakeviz/pstats + resumen legible
+        perfil.dump_stats(os.path.join(directorio, "perfil.prof"))
+        buffer = io.StringIO()
+        estadisticas = pstats.Stats(perfil, stream=buffer)
+        estadisticas.sort_stats("cumulative").print_stats(self.top_n)
+        estadisticas.sort_stats("tottime").print_stats(self.top_n)
+        with open(os.path.join(directorio, "perfil_top.txt"), "w", encoding="utf-8") as f:
+            f.write(buffer.getvalue())
+
+        # 2. Pilas colapsadas (flamegraph.pl pilas_colapsadas.txt > flamegraph.svg)
+        with open(os.path.join(directorio, "pilas_colapsadas.txt"), "w", encoding="utf-8") as f:
+            for pila, muestras in muestreador.pilas.most_common():
+                f.write(f"{pila} {muestras}\n")
+
+        # 3. Top-N de asignaciones de memoria por etapa
+        with open(os.path.join(directorio, "asignaciones_por_etapa.txt"), "w", encoding="utf-8") as f:
+            for nombre, diferencias in self._asignaciones:
+                total = sum(d.size_diff for d in diferencias)
+                f.write(f"=== Etapa '{nombre}' (top {self.top_n}: {total / 1e6:+.2f} MB) ===\n")
+                for d in diferencias:
+                    f.write(f"{d}\n")
+                f.write("\n")
+
+        logger.info(f"🔬 Reportes de perfilado escritos en {directorio} "
+                    f"({sum(muestreador.pilas.values())} muestras, {len(self._asignaciones)} etapas)")
@@ -0,0 +1,261 @@
+import email
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from email.message import Message
+from typing import Any, Dict, Iterable, List, Optional
+import pandas as pd
+import logging
+
+from utils.cache_render import huella_dataframe
+from utils.fechas import normalizar_fecha
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS envios (
+    reporte             TEXT NOT NULL,
+    fecha               TEXT NOT NULL,
+    destinatarios       TEXT NOT NULL,
+    lista_destinatarios TEXT NOT NULL,
+    huella_entradas     TEXT NOT NULL,
+    huella_salida       TEXT,
+    ruta_salida         TEXT,
+    estado              TEXT NOT NULL,
+    run_id              TEXT,
+    token               TEXT,
+    entregados          TEXT,
+    segundos_generacion REAL,
+    segundos_envio      REAL,
+    error               TEXT,
+    actualizado         TEXT NOT NULL,
+    PRIMARY KEY (reporte, fecha, destinatarios)
+);
+CREATE INDEX IF NOT EXISTS envios_entradas ON envios (reporte, fecha, huella_entradas);
+"""
+
+# Columnas agregadas después de la primera versión del esquema (se agregan a los registros existentes)
+COLUMNAS_NUEVAS = {"token": "TEXT", "entregados": "TEXT"}
+
+
+def huella_entradas(dataframes: Dict[str, pd.DataFrame]) -> str:
+    """ Hash del contenido de todas las fuentes de una ejecución (por nombre, independiente del orden) """
+    h = hashlib.sha1()
+    for nombre in sorted(dataframes):
+        h.update(f"{nombre}:{huella_dataframe(dataframes[nombre])};".encode())
+    return h.hexdigest()
+
+
+def huella_destinatarios(destinatarios: Iterable[str]) -> str:
+    """ Hash del conjunto de destinatarios: no depende del orden, mayúsculas ni repetidos """
+    return hashlib.sha1(",".join(sorted({d.strip().lower() for d in destinatarios})).encode()).hexdigest()
+
+
+class RegistroEjecuciones:
+    """
+    Registro local (SQLite) de los reportes generados y enviados, para que main sea idempotente:
+
+        <ruta>                                   tabla `envios`, una fila por (reporte, fecha, destinatarios)
+        <directorio de ruta>/salidas/<huella>.eml mensaje MIME generado, direccionado por contenido
+
+    Por fila guarda la huella de las fuentes, la del mensaje generado, el estado
+    ('generado', 'enviando', 'enviado', 'error') y los tiempos de generación y envío. Antes de
+    generar, main consulta el registro: si el reporte ya se envió a esos destinatarios con las
+    mismas fuentes se omite, y si solo cambiaron los destinatarios se reutiliza el mensaje guardado.
+    Un envío dividido en partes que falla a medias guarda quiénes ya lo recibieron (`entregados`):
+    el siguiente intento con las mismas fuentes, sea `--resume` o una ejecución nueva, solo envía al resto.
+
+    `reservar` marca 'enviando' en una transacción exclusiva con el `token` de esta instancia
+    (host:pid:aleatorio, no el run_id): si dos ejecuciones del scheduler se solapan, solo una envía.
+    Una reserva de más de `ttl_minutos`, o de un proceso de este host que ya terminó, se considera
+    abandonada.
+    """
+
+    def __init__(self, ruta: str, ttl_minutos: int = 30):
+        self.ruta = ruta
+        self.directorio_salidas = os.path.join(os.path.dirname(os.path.abspath(ruta)), "salidas")
+        self.ttl = timedelta(minutes=ttl_minutos)
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        os.makedirs(self.directorio_salidas, exist_ok=True)
+        conexion = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            conexion.executescript(ESQUEMA)
+            existentes = {fila[1] for fila in conexion.execute("PRAGMA table_info(envios)")}
+            for columna, tipo in COLUMNAS_NUEVAS.items():
+                if columna not in existentes:
+                    conexion.execute(f"ALTER TABLE envios ADD COLUMN {columna} {tipo}")
+        finally:
+            conexion.close()
+
+    @staticmethod
+    def _reserva_abandonada(token: Optional[str]) -> bool:
+        """ True si `token` es de un proceso de este host que ya no existe """
+        host, _, resto = (token or "").partition(":")
+        pid = resto.partition(":")[0]
+        if host != socket.gethostname() or not pid.isdigit():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    @contextmanager
+    def _transaccion(self, inmediata: bool = False):
+        # Una conexión por operación: el registro se comparte entre procesos (scheduler, cron, manual)
+        conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        conexion.row_factory = sqlite3.Row
+        try:
+            conexion.execute("BEGIN IMMEDIATE" if inmediata else "BEGIN")
+            yield conexion
+            conexion.execute("COMMIT")
+        except Exception:
+            if conexion.in_transaction:
+                conexion.execute("ROLLBACK")
+            raise
+        finally:
+            conexion.close()
+
+    @staticmethod
+    def _clave(reporte: str, fecha: date, destinatarios: List[str]) -> tuple:
+        return reporte, normalizar_fecha(fecha).isoformat(), huella_destinatarios(destinatarios)
+
+    @staticmethod
+    def _ahora() -> str:
+        return datetime.now().isoformat(timespec="seconds")
+
+    def _upsert(self, conexion: sqlite3.Connection, clave: tuple, destinatarios: List[str], **campos) -> None:
+        columnas = ["reporte", "fecha", "destinatarios", "lista_destinatarios", "actualizado", *campos]
+        valores = [*clave, json.dumps(sorted(destinatarios)), self._ahora(), *campos.values()]
+        actualizar = ", ".join(f"{c} = excluded.{c}" for c in columnas[3:])
+        conexion.execute(
+            f"INSERT INTO envios ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))}) "
+            f"ON CONFLICT (reporte, fecha, destinatarios) DO UPDATE SET {actualizar}", valores)
+
+    # --- Consulta ---
+
+    def consultar(self, reporte: str, fecha: date, destinatarios: List[str], huella: str) -> Dict[str, Any]:
+        """
+        Qué hacer con el reporte antes de generarlo:
+            {'accion': 'omitir'}                      ya enviado a estos destinatarios con las mismas fuentes
+            {'accion': 'reutilizar', 'ruta': <eml>,   mismas fuentes, otro envío: el mensaje ya está generado
+             'huella_salida': <huella>}
+            {'accion': 'generar'}                     fuentes nuevas o distintas
+        """
+        clave = self._clave(reporte, fecha, destinatarios)
+        with self._transaccion() as conexion:
+            fila = conexion.execute(
+                "SELECT estado, huella_entradas FROM envios WHERE reporte = ? AND fecha = ? AND destinatarios = ?",
+                clave).fetchone()
+            if fila is not None and fila["estado"] == "enviado" and fila["huella_entradas"] == huella:
+                return {"accion": "omitir"}
+            salida = conexion.execute(
+                "SELECT huella_salida, ruta_salida FROM envios WHERE reporte = ? AND fecha = ? AND huella_entradas = ? "
+                "AND ruta_salida IS NOT NULL ORDER BY actualizado DESC LIMIT 1", (*clave[:2], huella)).fetchone()
+        if salida is not None and os.path.exists(salida["ruta_salida"]):
+            return {"accion": "reutilizar", "ruta": salida["ruta_salida"], "huella_salida": salida["huella_salida"]}
+        return {"accion": "generar"}
+
+    def cargar_mensaje(self, ruta: str, destinatarios: List[str]) -> Message:
+        """ Mensaje guardado, dirigido a `destinatarios` """
+        with open(ruta, "rb") as f:
+            mensaje = email.message_from_bytes(f.read())
+        mensaje.replace_header("To", ", ".join(destinatarios))
+        return mensaje
+
+    # --- Registro ---
+
+    def registrar_generado(self, reporte: str, fecha: date, destinatarios: List[str], huella: str,
+                           mensaje: Message, huella_salida: str, segundos: float, run_id: str) -> str:
+        """ Guarda el mensaje por su huella de salida y deja la fila en 'generado' (si no estaba enviada) """
+        ruta_salida = os.path.join(self.directorio_salidas, f"{huella_salida}.eml")
+        if not os.path.exists(ruta_salida):
+            temporal = f"{ruta_salida}.{os.getpid()}.tmp"
+            with open(temporal, "wb") as f:
+                f.write(mensaje.as_bytes())
+            os.replace(temporal, ruta_salida)
+        clave = self._clave(reporte, fecha, destinatarios)
+        with self._transaccion(inmediata=True) as conexion:
+            fila = conexion.execute(
+                "SELECT estado, huella_entradas FROM envios WHERE reporte = ? AND fecha = ? AND destinatarios = ?",
+                clave).fetchone()
+            # Una fila enviada con otras fuentes vuelve a 'generado': las fuentes cambiaron y corresponde reenviar
+            if fila is None or fila["estado"] != "enviado" or fila["huella_entradas"] != huella:
+                # Los entregados de un envío a medias solo valen mientras las fuentes sean las mismas
+                previos = {} if fila is not None and fila["huella_entradas"] == huella else {"entregados": None}
+                self._upsert(conexion, clave, destinatarios, huella_entradas=huella, huella_salida=huella_salida,
+                             ruta_salida=ruta_salida, estado="generado", run_id=run_id,
+                             segundos_generacion=round(segundos, 4), segundos_envio=None, error=None, **previos)
+        return ruta_salida
+
+    def reservar(self, reporte: str, fecha: date, destinatarios: List[str], huella: str, run_id: str) -> bool:
+        """ Marca el envío 'enviando' para esta instancia; False si ya se envió o otra ejecución lo está enviando """
+        clave = self._clave(reporte, fecha, destinatarios)
+        with self._transaccion(inmediata=True) as conexion:
+            fila = conexion.execute(
+                "SELECT estado, huella_entradas, run_id, token, actualizado FROM envios "
+                "WHERE reporte = ? AND fecha = ? AND destinatarios = ?", clave).fetchone()
+            if fila is not None and fila["token"] != self.token:
+                if fila["estado"] == "enviado" and fila["huella_entradas"] == huella:
+                    return False
+                if fila["estado"] == "enviando" and not self._reserva_abandonada(fila["token"]) and \
+                        datetime.now() - datetime.fromisoformat(fila["actualizado"]) < self.ttl:
+                    logger.warning(f"⚠️ '{reporte}' lo está enviando la ejecución {fila['run_id']}; se omite.")
+                    return False
+            if fila is None:
+                self._upsert(conexion, clave, destinatarios, huella_entradas=huella, estado="enviando",
+                             run_id=run_id, token=self.token)
+            else:
+                # Con otras fuentes lo entregado antes ya no cuenta: todos deben recibir el reporte nuevo
+                entregados = "entregados" if fila["huella_entradas"] == huella else "NULL"
+                conexion.execute(
+                    f"UPDATE envios SET estado = 'enviando', huella_entradas = ?, run_id = ?, token = ?, error = NULL, "
+                    f"entregados = {entregados}, actualizado = ? WHERE reporte = ? AND fecha = ? AND destinatarios = ?",
+                    (huella, run_id, self.token, self._ahora(), *clave))
+        return True
+
+    def registrar_envio(self, reporte: str, fecha: date, destinatarios: List[str], ok: bool,
+                        segundos: float, error: Optional[str] = None, entregados: Iterable[str] = ()) -> None:
+        """ Resultado del envío; `entregados` se suma a los de intentos anteriores con las mismas fuentes """
+        clave = self._clave(reporte, fecha, destinatarios)
+        with self._transaccion(inmediata=True) as conexion:
+            fila = conexion.execute(
+                "SELECT entregados FROM envios WHERE reporte = ? AND fecha = ? AND destinatarios = ?", clave).fetchone()
+            previos = json.loads(fila["entregados"]) if fila is not None and fila["entregados"] else []
+            total = list(dict.fromkeys([*previos, *entregados]))
+            conexion.execute(
+                "UPDATE envios SET estado = ?, segundos_envio = ?, error = ?, entregados = ?, actualizado = ? "
+                "WHERE reporte = ? AND fecha = ? AND destinatarios = ?",
+                ("enviado" if ok else "error", round(segundos, 4), error, json.dumps(total) if total else None,
+                 self._ahora(), *clave))
+
+    def entregados(self, reporte: str, fecha: date, destinatarios: List[str], huella: str) -> List[str]:
+        """ Destinatarios que ya recibieron el reporte con estas fuentes en un envío que quedó incompleto """
+        with self._transaccion() as conexion:
+            fila = conexion.execute(
+                "SELECT estado, huella_entradas, entregados FROM envios WHERE reporte = ? AND fecha = ? AND destinatarios = ?",
+                self._clave(reporte, fecha, destinatarios)).fetchone()
+        if fila is None or fila["estado"] == "enviado" or fila["huella_entradas"] != huella or not fila["entregados"]:
+            return []
+        return json.loads(fila["entregados"])
+
+    def historial(self, fecha: Optional[date] = None) -> pd.DataFrame:
+        """ Filas del registro (de una fecha, o todas), las más recientes primero """
+        consulta = "SELECT * FROM envios"
+        params: tuple = ()
+        if fecha is not None:
+            consulta += " WHERE fecha = ?"
+            params = (normalizar_fecha(fecha).isoformat(),)
+        conexion = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            return pd.read_sql_query(consulta + " ORDER BY actualizado DESC", conexion, params=params)
+        finally:
+            conexion.close()
@@ -2,6 +2,7 @@ import pandas as pd
 from datetime import datetime, date
 import logging
 from typing import Optional, Set, Union
+from utils.fechas import normalizar_fecha, indexar_por_fecha, filtrar_por_fecha
 
 logger = logging.getLogger(__name__)
 
@@ -9,31 +10,10 @@ class DatosInvalidosError(Exception):
     pass
 
 def _normalizar_fecha_obj(fecha: Union[str, datetime, date]) -> date:
-    if isinstance(fecha, date) and not isinstance(fecha, datetime):
-        return fecha
-    if isinstance(fecha, datetime):
-        return fecha.date()
-    if isinstance(fecha, str):
-        # Ajusta el formato si usas otro
-        return datetime.strptime(fecha.strip(), "%d/%m/%Y").date()
-    raise DatosInvalidosError(f"Tipo de fecha no soportado: {type(fecha)}")
-
-def _serie_a_date(s: pd.Series) -> pd.Series:
-    # Si hay números (posible serial Excel), conviértelo
-    if pd.api.types.is_numeric_dtype(s):
-        # Excel base 1899-12-30 (considera 1900 leap bug)
-        dt = pd.to_datetime(s, origin="1899-12-30", unit="D", errors="coerce")
-    else:
-        dt = pd.to_datetime(s, dayfirst=True, errors="coerce", utc=True)
-        # Remover tz si quedó con tz
-        try:
-            dt = dt.tz_convert(None)
-        except Exception:
-            try:
-                dt = dt.tz_localize(None)
-            except Exception:
-                pass
-    return dt.dt.date
+    try:
+        return normalizar_fecha(fecha)
+    except ValueError as e:
+        raise DatosInvalidosError(f"Fecha objetivo inválida ({fecha!r}): {e}") from e
 
 def validar_movimientos_diarios_completos(
     df: pd.DataFrame,
@@ -44,6 +24,9 @@ def validar_movimientos_diarios_completos(
 ) -> None:
     """
     Verifica que para la 'fecha' indicada existan todos los movimientos requeridos.
+
+    Si el DataFrame ya viene preparado (índice de fechas, ver `preparar_df_sheet_google`)
+    se reutiliza el índice; si no, la columna de fechas se parsea aquí.
     """
     logger.info("Iniciando validación de movimientos diarios completos...")
 
@@ -52,20 +35,23 @@ def validar_movimientos_diarios_completos(
     # 1) Validaciones básicas
     if df.empty:
         raise DatosInvalidosError("El DataFrame está vacío. No hay datos para validar.")
-    for col in (nombre_columna_fecha, columna_movimiento):
+    indexado = isinstance(df.index, pd.DatetimeIndex) and df.index.name == nombre_columna_fecha
+    columnas_obligatorias = (columna_movimiento,) if indexado else (nombre_columna_fecha, columna_movimiento)
+    for col in columnas_obligatorias:
         if col not in df.columns:
             raise DatosInvalidosError(f"Falta la columna obligatoria: '{col}'.")
 
-    # 2) Normalizar fecha objetivo y columna de fechas
+    # 2) Normalizar fecha objetivo y dejar las fechas como índice ordenado
     fecha_obj = _normalizar_fecha_obj(fecha)
-    fechas = _serie_a_date(df[nombre_columna_fecha])
+    if not indexado:
+        df = indexar_por_fecha(df, columna_fecha=nombre_columna_fecha)
 
-    # 3) Filtrar por fecha
-    df_dia = df.loc[fechas == fecha_obj]
+    # 3) Filtrar por fecha (búsqueda binaria sobre el índice)
+    df_dia = filtrar_por_fecha(df, fecha_obj)
     if df_dia.empty:
         # Ayuda de debug: muestra algunas fechas únicas que sí existen
-        fechas_unicas = pd.Series(fechas.unique()).dropna()
-        ejemplo = ", ".join(str(x) for x in fechas_unicas.sort_values().astype(str).head(5))
+        fechas_unicas = pd.Series(df.index.unique())
+        ejemplo = ", ".join(str(x.date()) for x in fechas_unicas.head(5))
         raise DatosInvalidosError(
             f"No se encontró ningún registro para la fecha ({fecha_obj.strftime('%d/%m/%Y')}). "
             f"Ejemplos de fechas presentes: {ejemplo if not fechas_unicas.empty else 'ninguna'}"